@@ -0,0 +1,47 @@
+"""
+Authentication backend that caches the logged-in user.
+
+AuthenticationMiddleware loads request.user on every request. With
+USER_CACHE_TIMEOUT set, CachedModelBackend keeps the user row in the cache
+for that many seconds. account.signals drops the entry after a user is
+saved or deleted (profile edits, the admin, logins); code that changes
+users with QuerySet.update() calls forget_users() itself.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+
+def user_cache_key(user_id):
+    return f'user:{user_id}'
+
+
+def forget_users(*user_ids):
+    """
+    Drop cached users once the current transaction commits, so that no
+    request caches the old row again in between.
+    """
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
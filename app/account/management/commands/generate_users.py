@@ -1,15 +1,22 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from account.models import CustomUser
-import requests
-import os
-import hashlib
+from django.contrib.auth.hashers import make_password
+from faker import Faker
+from account.models import CustomUser, user_avatar_path
+from blog import datagen
 import random
+import time
 
 User = get_user_model()
 
 class Command(BaseCommand):
-    help = 'Generate 10 test users with different usernames, bios, and avatars'
+    help = (
+        'Generate 10 test users with different usernames, bios, and avatars, '
+        'or with --count any number of users with Faker bios; avatars are drawn locally'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -18,123 +25,127 @@ class Command(BaseCommand):
             default=0.8,
             help='Probability of generating avatar for each user (0.0 to 1.0, default: 0.8)'
         )
+        parser.add_argument(
+            '--count',
+            type=int,
+            help='Generate this many users with Faker names and bios instead of the 10 sample users'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='With --count: seed of the generated users (default: 0)'
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Insert users in batches with bulk_create, hashing the shared password once '
+                 '(needs BULK_TEST_DATA, on by default with DEBUG)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='With --bulk: users inserted together (default: 1000)'
+        )
 
-    def get_avatar_image(self, username, width=200, height=200):
-        """Get random avatar image from Picsum Photos based on username"""
-        try:
-            # Create a hash from username to get consistent image for each user
-            username_hash = hashlib.md5(username.lower().encode()).hexdigest()
-            # Convert first 8 characters of hash to integer for image ID
-            image_id = int(username_hash[:8], 16) % 1000 + 1  # IDs from 1 to 1000
-            
-            url = f"https://picsum.photos/id/{image_id}/{width}/{height}"
-            
-            self.stdout.write(f'    Requesting avatar from: {url}')
-            
-            # Test if the image exists
-            response = requests.head(url, timeout=10)
-            
-            if response.status_code == 200:
-                self.stdout.write(f'    Avatar URL resolved: {url}')
-                return url
-            else:
-                # If specific ID doesn't exist, use random image
-                random_url = f"https://picsum.photos/{width}/{height}"
-                self.stdout.write(f'    Using random avatar: {random_url}')
-                return random_url
-                
-        except requests.exceptions.Timeout:
-            self.stdout.write(
-                self.style.WARNING(f'Timeout getting avatar image for {username}')
-            )
-            return None
-        except requests.exceptions.RequestException as e:
-            self.stdout.write(
-                self.style.WARNING(f'Request failed for avatar image {username}: {e}')
-            )
-            return None
-        except Exception as e:
-            self.stdout.write(
-                self.style.WARNING(f'Unexpected error getting avatar image for {username}: {e}')
-            )
-            return None
+    def generated_users(self, count, seed):
+        """Usernames and bios of --count users; the same seed gives the same users"""
+        fake = Faker('en_US')
+        fake.seed_instance(seed)
+        return [
+            {
+                'username': f'{fake.user_name()}{n}',
+                'first_name': fake.first_name(),
+                'last_name': fake.last_name(),
+                'bio': fake.paragraph(nb_sentences=3)[:500],
+            }
+            for n in range(count)
+        ]
 
-    def download_and_save_avatar(self, image_url, username, user_id):
-        """Download avatar image and save to media directory"""
-        try:
-            if not image_url:
-                self.stdout.write(
-                    self.style.WARNING(f'No avatar URL provided for {username}')
-                )
-                return None
-            
-            # Create media directory if it doesn't exist
-            from django.conf import settings
-            media_dir = os.path.join(settings.MEDIA_ROOT, f'user_{user_id}', 'avatar')
+    def draw_avatar(self, user, rng):
+        """Avatar with the user's initials, as JPEG content"""
+        initials = user.first_name[:1] + user.last_name[:1]
+        if not initials:
+            initials = ''.join(part[0] for part in user.username.split('_') if part)[:2]
+        return ContentFile(datagen.draw_avatar(rng, initials))
+
+    def save_avatar(self, user, rng):
+        """Draw an avatar and attach it to the user"""
+        user.avatar.save(f"avatar_{user.username}.jpg", self.draw_avatar(user, rng))
+        return user.avatar.name
+
+    def create_bulk(self, users_data, avatar_chance, rng, batch_size):
+        """
+        Insert users in batches. The password is hashed once and shared; ids
+        are reserved beforehand so that avatars are stored at their final
+        path and saved with the row.
+        """
+        password = make_password('test')
+        started = time.perf_counter()
+        created_count = 0
+        for start in range(0, len(users_data), batch_size):
+            batch = users_data[start:start + batch_size]
+            existing = set(CustomUser.objects.filter(
+                username__in=[user_data['username'] for user_data in batch]
+            ).values_list('username', flat=True))
+            batch = [user_data for user_data in batch if user_data['username'] not in existing]
+            if not batch:
+                continue
+
+            users = []
+            for user_data, pk in zip(batch, datagen.reserve_ids(CustomUser, len(batch))):
+                user = CustomUser(id=pk, password=password, **user_data)
+                if rng.random() < avatar_chance:
+                    path = user_avatar_path(user, f"avatar_{user.username}.jpg")
+                    user.avatar = default_storage.save(path, self.draw_avatar(user, rng))
+                users.append(user)
+            CustomUser.objects.bulk_create(users)
+            created_count += len(users)
+            self.stdout.write(f'  Created {created_count} users, {created_count / (time.perf_counter() - started):.0f} users/s')
+        return created_count
+
+    def create_one_by_one(self, users_data, avatar_chance, rng, verbose):
+        """Create users with create_user, each with its own password hash"""
+        created_count = 0
+        for user_data in users_data:
+            username = user_data['username']
+            bio = user_data['bio']
             
-            # Ensure the directory exists
-            try:
-                os.makedirs(media_dir, exist_ok=True)
-                self.stdout.write(f'    Directory created/verified: {media_dir}')
-            except Exception as e:
+            # Check if user already exists
+            if CustomUser.objects.filter(username=username).exists():
+                if not verbose:
+                    continue
                 self.stdout.write(
-                    self.style.ERROR(f'Failed to create directory {media_dir}: {e}')
+                    self.style.WARNING(f'User {username} already exists, skipping...')
                 )
-                return None
+                continue
             
-            # Download image with better error handling
-            try:
-                response = requests.get(image_url, timeout=15, stream=True)
-                response.raise_for_status()  # Raise exception for bad status codes
-                
-                # Check content type to ensure it's an image
-                content_type = response.headers.get('content-type', '')
-                if not content_type.startswith('image/'):
-                    self.stdout.write(
-                        self.style.WARNING(f'URL does not point to an image: {content_type}')
-                    )
-                    return None
-                
-            except requests.exceptions.RequestException as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Failed to download avatar from {image_url}: {e}')
-                )
-                return None
+            # Create user first to get the ID
+            user = CustomUser.objects.create_user(
+                username=username,
+                password='test',
+                bio=bio,
+                first_name=user_data.get('first_name', ''),
+                last_name=user_data.get('last_name', ''),
+            )
             
-            # Generate filename
-            filename = f"avatar_{username}.jpg"
-            filepath = os.path.join(media_dir, filename)
+            # Draw an avatar based on avatar_chance parameter
+            if rng.random() < avatar_chance:
+                avatar_path = self.save_avatar(user, rng)
+                if verbose:
+                    self.stdout.write(f'    ✓ Avatar added: {avatar_path}')
+            elif verbose:
+                self.stdout.write(f'  Skipping avatar generation for user: {username} (chance: {avatar_chance})')
             
-            # Save image
-            try:
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                
-                # Verify file was created and has content
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-                    self.stdout.write(f'    Avatar saved: {filename} ({os.path.getsize(filepath)} bytes)')
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f'Avatar file was not created or is empty: {filepath}')
-                    )
-                    return None
-                
-            except IOError as e:
+            created_count += 1
+            if verbose:
                 self.stdout.write(
-                    self.style.ERROR(f'Failed to save avatar to {filepath}: {e}')
+                    self.style.SUCCESS(f'Successfully created user: {username}')
                 )
-                return None
-            
-            # Return relative path for Django model
-            return f"user_{user_id}/avatar/{filename}"
-            
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Unexpected error downloading avatar for {username}: {e}')
-            )
-            return None
+            elif created_count % 100 == 0:
+                self.stdout.write(f'  Created {created_count} users...')
+        return created_count
 
     def handle(self, *args, **options):
         avatar_chance = options['avatar_chance']
@@ -145,6 +156,11 @@ class Command(BaseCommand):
                 self.style.ERROR('Avatar chance must be between 0.0 and 1.0')
             )
             return
+        # Shared password hashes are for test databases only
+        if options['bulk'] and not settings.BULK_TEST_DATA:
+            raise CommandError('Bulk test data is disabled in these settings; set BULK_TEST_DATA=true to allow it')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
 
         users_data = [
             {
@@ -189,47 +205,18 @@ class Command(BaseCommand):
             }
         ]
 
-        created_count = 0
-        for user_data in users_data:
-            username = user_data['username']
-            bio = user_data['bio']
-            
-            # Check if user already exists
-            if CustomUser.objects.filter(username=username).exists():
-                self.stdout.write(
-                    self.style.WARNING(f'User {username} already exists, skipping...')
-                )
-                continue
-            
-            # Create user first to get the ID
-            user = CustomUser.objects.create_user(
-                username=username,
-                password='test',
-                bio=bio
-            )
-            
-            # Generate and download avatar based on avatar_chance parameter
-            if random.random() < avatar_chance:
-                self.stdout.write(f'  Generating avatar for user: {username}...')
-                avatar_path = self.download_and_save_avatar(
-                    self.get_avatar_image(username), 
-                    username, 
-                    user.id
-                )
-                
-                if avatar_path:
-                    user.avatar = avatar_path
-                    user.save()
-                    self.stdout.write(f'    ✓ Avatar added: {avatar_path}')
-                else:
-                    self.stdout.write(f'    ⚠ No avatar generated')
-            else:
-                self.stdout.write(f'  Skipping avatar generation for user: {username} (chance: {avatar_chance})')
-            
-            created_count += 1
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully created user: {username}')
-            )
+        if options['count'] is not None:
+            if options['count'] < 1:
+                raise CommandError('--count must be positive')
+            users_data = self.generated_users(options['count'], options['seed'])
+        # Sample users are announced one by one, generated ones in hundreds
+        verbose = options['count'] is None
+        rng = random.Random(options['seed'])
+
+        if options['bulk']:
+            created_count = self.create_bulk(users_data, avatar_chance, rng, options['batch_size'])
+        else:
+            created_count = self.create_one_by_one(users_data, avatar_chance, rng, verbose)
 
         self.stdout.write(
             self.style.SUCCESS(f'\nTotal users created: {created_count}')
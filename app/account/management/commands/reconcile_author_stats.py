@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from account.models import CustomUser
+
+class Command(BaseCommand):
+    help = 'Recompute published post counts and last publication dates of all authors'
+
+    def handle(self, *args, **options):
+        repaired = CustomUser.reconcile_post_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired post statistics of {repaired} authors')
+        )
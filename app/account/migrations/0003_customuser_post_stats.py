@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_post_stats(apps, schema_editor):
+    CustomUser = apps.get_model('account', 'CustomUser')
+    Post = apps.get_model('blog', 'Post')
+    published = Post.objects.filter(author=OuterRef('pk'), status='published').order_by()
+    CustomUser.objects.update(
+        published_post_count=Coalesce(Subquery(
+            published.values('author').annotate(n=Count('pk')).values('n')
+        ), 0),
+        last_published_at=Subquery(published.order_by('-created_at').values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_customuser_updated_at'),
+        ('blog', '0008_dailypostcount'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='last_published_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last published at'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='published posts'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('published_post_count__gt', 0)), fields=['-published_post_count', 'id'], name='account_user_published_posts'),
+        ),
+        migrations.RunPython(fill_post_stats, migrations.RunPython.noop),
+    ]
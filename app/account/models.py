@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils.translation import gettext_lazy as _
 
 def user_avatar_path(instance, filename):
@@ -9,6 +11,12 @@ def user_avatar_path(instance, filename):
 class CustomUser(AbstractUser):
     bio = models.TextField(_('bio'), max_length=500, blank=True)
     avatar = models.ImageField(_('avatar'), upload_to=user_avatar_path, null=True, blank=True)
+    # Resized square copies of avatar, see blog.images
+    avatar_variants = models.JSONField(_('avatar variants'), default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True, db_index=True)
+    # Maintained from blog.signals; repaired by `manage.py reconcile_author_stats`
+    published_post_count = models.PositiveIntegerField(_('published posts'), default=0, editable=False)
+    last_published_at = models.DateTimeField(_('last published at'), null=True, blank=True, editable=False)
 
     # Add related_name to resolve reverse accessor clashes
     groups = models.ManyToManyField(
@@ -32,6 +40,89 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Serves the authors directory: WHERE count > 0 ORDER BY count DESC, id
+            models.Index(
+                fields=['-published_post_count', 'id'],
+                name='account_user_published_posts',
+                condition=Q(published_post_count__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return self.username
+
+    def refresh_avatar_variants(self):
+        """
+        Generate the resized copies of the avatar, replacing those of any
+        previous avatar.
+        """
+        from blog.images import AVATAR_WIDTHS, delete_variants, generate_variants
+
+        old = self.avatar_variants or {}
+        new = generate_variants(self.avatar.name, AVATAR_WIDTHS, square=True) if self.avatar else {}
+        self.avatar_variants = new
+        self.save(update_fields=['avatar_variants', 'updated_at'])
+        delete_variants(old, keep=new)
+
+    @staticmethod
+    def _latest_published():
+        from blog.models import Post
+
+        return Subquery(
+            Post.objects.filter(author=OuterRef('pk'), status='published')
+            .order_by('-created_at').values('created_at')[:1]
+        )
+
+    @classmethod
+    def record_published_change(cls, before, after):
+        """
+        Update the post statistics of the authors of a post that was
+        published as `before` and is now published as `after`: each an
+        (author_id, created_at) pair, or None when the post was not
+        published. Counts are adjusted in place, so concurrent writers
+        never overwrite each other.
+        """
+        if before == after:
+            return
+        from .backends import forget_users
+
+        forget_users(*{state[0] for state in (before, after) if state})
+        if before and after and before[0] == after[0]:
+            # Same author, the publication date moved
+            cls.objects.filter(pk=after[0]).update(last_published_at=cls._latest_published())
+            return
+        if before:
+            cls.objects.filter(pk=before[0]).update(
+                published_post_count=Greatest(F('published_post_count') - 1, 0),
+                last_published_at=cls._latest_published(),
+            )
+        if after:
+            cls.objects.filter(pk=after[0]).update(
+                published_post_count=F('published_post_count') + 1,
+                last_published_at=Greatest(F('last_published_at'), Value(after[1])),
+            )
+
+    @classmethod
+    def reconcile_post_stats(cls):
+        """
+        Recompute the post statistics of every author from their posts.
+        Returns the number of authors whose statistics had drifted.
+        """
+        from blog.models import Post
+
+        count = Coalesce(Subquery(
+            Post.objects.filter(author=OuterRef('pk'), status='published')
+            .order_by().values('author').annotate(n=models.Count('pk')).values('n')
+        ), 0)
+        latest = cls._latest_published()
+        drifted = cls.objects.annotate(actual_count=count, actual_latest=latest).filter(
+            ~Q(published_post_count=F('actual_count'))
+            | Q(last_published_at__lt=F('actual_latest'))
+            | Q(last_published_at__gt=F('actual_latest'))
+            | Q(last_published_at__isnull=True, actual_latest__isnull=False)
+            | Q(last_published_at__isnull=False, actual_latest__isnull=True)
+        )
+        return cls.objects.filter(pk__in=drifted.values('pk')).update(
+            published_post_count=count, last_published_at=latest
+        )
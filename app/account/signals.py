@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from blog.images import current_variants
+from jobs.queue import enqueue
+
+from .backends import forget_users
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    forget_users(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def avatar_saved(sender, instance, update_fields, **kwargs):
+    # A new avatar, whether from the site, the admin or a script
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if instance.avatar and not current_variants(instance.avatar, instance.avatar_variants):
+        enqueue('account.avatar_variants', {'user_id': instance.pk}, key=f'image-variants:user:{instance.pk}')
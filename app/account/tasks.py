@@ -0,0 +1,16 @@
+"""
+Background job handlers of accounts (see jobs.queue).
+"""
+from blog.images import current_variants
+from jobs.queue import handler
+
+from .models import CustomUser
+
+
+@handler('account.avatar_variants')
+def avatar_variants(user_id):
+    user = CustomUser.objects.filter(pk=user_id).first()
+    # Already done by an earlier attempt or the backfill command
+    if user is None or current_variants(user.avatar, user.avatar_variants):
+        return
+    user.refresh_avatar_variants()
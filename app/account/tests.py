@@ -1,3 +1,158 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Post
+from blog.tests import QueryBudgetMixin
+from jobs.models import Job
+from .models import CustomUser
+
+
+class BulkUserGenerationTests(TestCase):
+    def generate(self, *args):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command('generate_users', *args, stdout=StringIO())
+            return [
+                (user, user.avatar and user.avatar.storage.exists(user.avatar.name))
+                for user in CustomUser.objects.order_by('id')
+            ]
+
+    @override_settings(BULK_TEST_DATA=True)
+    def test_bulk_users_share_one_password_hash(self):
+        users = self.generate('--count', '30', '--bulk', '--batch-size', '8', '--avatar-chance', '0.5')
+        self.assertEqual(len(users), 30)
+        self.assertEqual(len({user.password for user, _ in users}), 1)
+        self.assertTrue(users[0][0].check_password('test'))
+        avatars = [user for user, stored in users if user.avatar]
+        self.assertTrue(avatars)
+        for user, stored in users:
+            if user.avatar:
+                self.assertTrue(stored)
+                self.assertEqual(user.avatar.name, f'user_{user.pk}/avatar/avatar_{user.username}.jpg')
+        # The same seed gives the same users, which exist already
+        self.assertEqual(len(self.generate('--count', '30', '--bulk')), 30)
+
+    @override_settings(BULK_TEST_DATA=False)
+    def test_bulk_modes_refused_without_bulk_test_data(self):
+        with self.assertRaisesMessage(CommandError, 'BULK_TEST_DATA'):
+            call_command('generate_users', '--count', '5', '--bulk', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'BULK_TEST_DATA'):
+            call_command('generate_posts', '--count', '5', stdout=StringIO())
+        self.assertFalse(CustomUser.objects.exists())
+
+
+class ProfileListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='owner', password='test')
+        Post.objects.create(title='Draft', content='Draft body text. ' * 200, author=cls.user)
+
+    def test_own_posts_list_never_selects_bodies(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('account:profile') + '?status=draft')
+        self.assertContains(response, 'Draft body text.')
+        for query in queries.captured_queries:
+            self.assertNotIn('"blog_post"."content"', query['sql'])
+
+
+class AvatarVariantJobTests(TestCase):
+    def queued(self, user):
+        return Job.objects.filter(key=f'image-variants:user:{user.pk}', status='queued').exists()
+
+    def test_avatar_saved_outside_the_views_is_queued(self):
+        # As the admin or generate_users saves it
+        user = CustomUser.objects.create_user(username='pictured', password='test')
+        self.assertFalse(self.queued(user))
+        user.avatar = 'user_1/avatar/pictured.jpg'
+        user.save()
+        self.assertTrue(self.queued(user))
+
+    def test_current_variants_or_other_fields_are_not_queued(self):
+        user = CustomUser.objects.create_user(
+            username='pictured', password='test', avatar='user_1/avatar/pictured.jpg',
+            avatar_variants={'source': 'user_1/avatar/pictured.jpg', 'webp': [], 'jpeg': []},
+        )
+        self.assertFalse(self.queued(user))
+        user.avatar = 'user_1/avatar/replaced.jpg'
+        user.save(update_fields=['last_login'])
+        self.assertFalse(self.queued(user))
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db', USER_CACHE_TIMEOUT=300,
+)
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='cached', password='test', bio='Old bio')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_logged_in_page_needs_no_session_or_user_query(self):
+        self.client.get(reverse('blog:contact'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog:contact'))
+        self.assertContains(response, 'cached')
+
+    def test_profile_edit_refreshes_cached_user(self):
+        self.client.get(reverse('account:edit_profile'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('account:edit_profile'), {'bio': 'New bio'})
+        response = self.client.get(reverse('account:edit_profile'))
+        self.assertContains(response, 'New bio')
+
+    def test_admin_change_is_seen_on_next_request(self):
+        self.client.get(reverse('blog:contact'))
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+            CustomUser.objects.get(pk=self.user.pk).save()
+        response = self.client.get(reverse('account:edit_profile'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_session_from_model_backend_stays_logged_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('account:edit_profile'))
+        self.assertEqual(response.status_code, 200)
+
+
+class AccountQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, *_ = cls.seed(authors=3, posts_per_author=9)
+        cls.post = Post.objects.filter(author=cls.author, status='published').earliest('id')
+
+    def test_anonymous_budgets(self):
+        self.assertBudgetsHold([
+            (reverse('account:register'), 0, 0),
+            (reverse('account:login'), 0, 0),
+            (reverse('account:profile'), 0, 0),
+            (reverse('account:edit_profile'), 0, 0),
+            (reverse('account:edit_post', args=[self.post.slug]), 0, 0),
+            (reverse('account:delete_post', args=[self.post.slug]), 0, 0),
+        ])
+
+    def test_logged_in_budgets(self):
+        self.assertBudgetsHold([
+            # Session, user, count estimate, exact count, draft count, a page of 7 posts
+            (reverse('account:profile'), 6, 12),
+            (reverse('account:profile') + '?page=2', 6, 12),
+            (reverse('account:profile') + '?status=draft', 6, 12),
+            (reverse('account:edit_profile'), 2, 2),
+            # Session, user, the post
+            (reverse('account:edit_post', args=[self.post.slug]), 3, 3),
+            (reverse('account:delete_post', args=[self.post.slug]), 3, 3),
+            (reverse('account:register'), 2, 2),
+            (reverse('account:login'), 2, 2),
+            # Last, as it ends the session: session, user, then Django
+            # loads the session row again to delete it
+            (reverse('account:logout'), 4, 3),
+        ], user=self.author)
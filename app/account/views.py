@@ -4,9 +4,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
 from .models import CustomUser
 from blog.models import Post
+from blog.counts import cached_count
+from blog.pagination import paginate
 
 def register_view(request):
     if request.method == 'POST':
@@ -89,18 +90,19 @@ def profile_view(request):
     else:
         posts = posts.filter(status='published')
 
-    posts = posts.order_by('-created_at')
+    posts = posts.order_by('-created_at', '-id')
 
-    paginator = Paginator(posts, 7)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts.for_listing(), 7)
+
+    published_count = user.published_post_count
+    draft_count, _ = cached_count(Post.objects.filter(author=user, status='draft'), allow_estimate=False)
 
     context = {
         'user': user,
         'posts': page_obj,
         'page_obj': page_obj,
-        'published_count': Post.objects.filter(author=user, status='published').count(),
-        'draft_count': Post.objects.filter(author=user, status='draft').count(),
+        'published_count': published_count,
+        'draft_count': draft_count,
         'current_filter': status_filter,
     }
     return render(request, 'account/profile.html', context)
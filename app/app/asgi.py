@@ -7,10 +7,33 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+
+class ConcurrencyLimit:
+    """
+    Lets at most `limit` HTTP requests into Django at once; the others wait
+    while the server keeps reading slow clients. Every request inside may
+    hold a database connection until its response is sent; with DB_POOL
+    they share the worker's pool, otherwise the limit times the number of
+    workers must stay below PostgreSQL's max_connections.
+    """
+
+    def __init__(self, app, limit):
+        self.app = app
+        self.semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if self.semaphore is None or scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        async with self.semaphore:
+            return await self.app(scope, receive, send)
+
+
+application = ConcurrencyLimit(get_asgi_application(), settings.ASGI_MAX_CONCURRENCY)
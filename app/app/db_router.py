@@ -0,0 +1,202 @@
+"""
+Read replicas (settings.DATABASE_REPLICA_URLS, aliases replica1, replica2...).
+
+Only views decorated with read_from_replica send their reads to a replica;
+everything else, including background jobs and management commands, reads
+from the primary. A replica is picked at random among those reachable and
+at most REPLICA_MAX_LAG seconds behind, checked every
+REPLICA_CHECK_INTERVAL seconds per process; with none left, reads fall
+back to the primary.
+
+A visitor who writes would not find their change on a lagging replica, so
+PrimaryPinningMiddleware sets a cookie on any response whose request wrote
+to the database (posting, editing, logging in), and for REPLICA_PIN_SECONDS
+afterwards that visitor's reads stay on the primary. Within a request, reads
+after a write or inside a transaction go to the primary as well.
+
+Cached pages and values are dropped when the data they show changes, and
+the next anonymous request rebuilds them. Read from a lagging replica, they
+would be stored again as they were. So every purge calls
+hold_replica_reads(), and for REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+seconds afterwards replica reads in every process go to the primary.
+"""
+import contextvars
+import logging
+import math
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_pin'
+HOLD_KEY = 'db:replica_hold_until'
+
+LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() '
+    'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+# Set by read_from_replica for the duration of the view: None, or for a
+# visitor who may read from a replica {'held': whether a hold is on, looked
+# up at the first replica read}
+_replica_reads = contextvars.ContextVar('replica_reads', default=None)
+# Per request state of PrimaryPinningMiddleware: {'wrote': bool}
+_request = contextvars.ContextVar('db_request', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def _pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def _reads(request):
+    return None if _pinned(request) else {'held': None}
+
+
+def hold_replica_reads():
+    """
+    Keep replica reads on the primary until every usable replica has seen
+    what was just committed.
+    """
+    window = settings.REPLICA_MAX_LAG + settings.REPLICA_CHECK_INTERVAL
+    cache.set(HOLD_KEY, time.time() + window, math.ceil(window))
+
+
+def replica_reads_held():
+    return cache.get(HOLD_KEY, 0) > time.time()
+
+
+def read_from_replica(view):
+    """
+    Let the view's reads go to a replica, unless the visitor wrote recently.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_reads(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(_reads(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pins a visitor's reads to the primary for REPLICA_PIN_SECONDS after a
+    request of theirs wrote to the database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {'wrote': False}
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state = {'wrote': False}
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.pin(response, state)
+
+    def pin(self, response, state):
+        if state['wrote'] and settings.REPLICA_PIN_SECONDS > 0 and replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+class ReplicaRouter:
+    def __init__(self, replicas=None):
+        self.replicas = replica_aliases() if replicas is None else replicas
+        # alias -> (monotonic time of the last check, usable)
+        self._health = {}
+
+    def _check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            logger.warning('Replica %s is unreachable', alias, exc_info=True)
+            return False
+        if lag is not None and lag > settings.REPLICA_MAX_LAG:
+            logger.warning('Replica %s is %.1fs behind', alias, lag)
+            return False
+        return True
+
+    def _usable(self, alias):
+        now = time.monotonic()
+        checked, usable = self._health.get(alias, (None, False))
+        if checked is None or now - checked >= settings.REPLICA_CHECK_INTERVAL:
+            usable = self._check(alias)
+            self._health[alias] = (now, usable)
+        return usable
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas:
+            return None
+        reads = _replica_reads.get()
+        if reads is None:
+            return DEFAULT_DB_ALIAS
+        state = _request.get()
+        if state is not None and state['wrote'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if reads['held'] is None:
+            reads['held'] = replica_reads_held()
+        if reads['held']:
+            return DEFAULT_DB_ALIAS
+        usable = [alias for alias in self.replicas if self._usable(alias)]
+        return random.choice(usable) if usable else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self.replicas:
+            return False
+        return None
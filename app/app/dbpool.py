@@ -0,0 +1,50 @@
+"""
+Statistics of this process's PostgreSQL connection pool (settings.DB_POOL),
+and its shutdown: pools are closed when the process exits, or the
+interpreter waits for each pool thread in turn (5s apiece) before giving up.
+"""
+import atexit
+
+from django.db import connections
+
+
+def close_pools():
+    """
+    Closes the connection pools this process opened, stopping their threads.
+    Pools are shared by all threads; none is created here.
+    """
+    for alias in connections:
+        connection = connections[alias]
+        if alias in getattr(connection, '_connection_pools', {}):
+            connection.close_pool()
+
+
+atexit.register(close_pools)
+
+
+def pool_stats(alias='default'):
+    """
+    Counters of the pool behind a database alias since the process started,
+    or None when it is not pooled: open connections (size, idle of them),
+    requests waiting right now, checkouts, how many of those had to wait and
+    for how long in total and on average, and checkouts that timed out.
+    """
+    pool = connections[alias].pool
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    checkouts = stats.get('requests_num', 0)
+    waits = stats.get('requests_queued', 0)
+    wait_ms = stats.get('requests_wait_ms', 0)
+    return {
+        'min_size': pool.min_size,
+        'max_size': pool.max_size,
+        'size': stats.get('pool_size', 0),
+        'idle': stats.get('pool_available', 0),
+        'waiting': stats.get('requests_waiting', 0),
+        'checkouts': checkouts,
+        'waits': waits,
+        'wait_ms': wait_ms,
+        'avg_wait_ms': wait_ms / checkouts if checkouts else 0,
+        'timeouts': stats.get('requests_errors', 0),
+    }
@@ -0,0 +1,243 @@
+"""
+Prometheus metrics and Server-Timing headers.
+
+MetricsMiddleware records, per resolved URL name (``blog:post_detail``,
+``account:login``; ``<unresolved>`` for 404s), the request latency, the
+number and total time of database queries, template render time and
+response size, and adds a Server-Timing header with the same figures so a
+browser's network panel shows them per request. Queries are timed by an
+execute wrapper installed on every database connection; templates by the
+TimedDjangoTemplates backend. The connection pool's counters (see
+app.dbpool) are exported as well.
+
+Under gunicorn every worker keeps its own counters. Set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before the server starts
+(entrypoint.sh does) so that workers write them to files there and
+/metrics adds them up across workers; gunicorn.conf.py removes the files of
+workers that exit.
+
+Monitoring endpoints (/metrics, /health/db/) are wrapped in monitoring_only
+and answer 404 to the public: only requests bearing MONITORING_TOKEN, or
+made straight to the app from INTERNAL_IPS, are served.
+"""
+import contextvars
+import hmac
+import os
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+from .dbpool import pool_stats
+
+REQUEST_LATENCY = Histogram(
+    'django_request_duration_seconds', 'Request latency', ['view'],
+)
+REQUESTS = Counter(
+    'django_requests', 'Requests by response status', ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'django_request_db_queries', 'Database queries per request', ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float('inf')),
+)
+DB_TIME = Histogram(
+    'django_request_db_duration_seconds', 'Time spent in database queries per request', ['view'],
+)
+TEMPLATE_TIME = Histogram(
+    'django_request_template_duration_seconds', 'Time spent rendering templates per request', ['view'],
+)
+RESPONSE_SIZE = Histogram(
+    'django_response_size_bytes', 'Response body size', ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, float('inf')),
+)
+POOL_CONNECTIONS = Gauge(
+    'django_db_pool_connections', 'Open pooled database connections', ['state'],
+    multiprocess_mode='livesum',
+)
+POOL_WAITING = Gauge(
+    'django_db_pool_waiting', 'Requests waiting for a pooled connection',
+    multiprocess_mode='livesum',
+)
+POOL_CHECKOUTS = Counter('django_db_pool_checkouts', 'Connections taken from the pool')
+POOL_WAITS = Counter('django_db_pool_waits', 'Checkouts that had to wait for a connection')
+POOL_WAIT_TIME = Counter('django_db_pool_wait_seconds', 'Time spent waiting for pooled connections')
+POOL_TIMEOUTS = Counter('django_db_pool_timeouts', 'Checkouts that timed out')
+
+# Per request figures, set by MetricsMiddleware
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings['db_time'] += time.perf_counter() - started
+        timings['db_queries'] += 1
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    # Sent on every (re)connect of the same DatabaseWrapper
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings['template_time'] += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each top-level render.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+_pool_seen = {}
+_pool_lock = threading.Lock()
+
+
+@receiver(request_finished)
+def _record_pool(sender, **kwargs):
+    # Connected after Django's close_old_connections, so this request's
+    # connection is back in the pool
+    stats = pool_stats()
+    if stats is None:
+        return
+    POOL_CONNECTIONS.labels('idle').set(stats['idle'])
+    POOL_CONNECTIONS.labels('busy').set(stats['size'] - stats['idle'])
+    POOL_WAITING.set(stats['waiting'])
+    # The pool's counters only grow; export what they grew by since the last request
+    with _pool_lock:
+        for counter, name, scale in (
+            (POOL_CHECKOUTS, 'checkouts', 1),
+            (POOL_WAITS, 'waits', 1),
+            (POOL_WAIT_TIME, 'wait_ms', 0.001),
+            (POOL_TIMEOUTS, 'timeouts', 1),
+        ):
+            delta = stats[name] - _pool_seen.get(name, 0)
+            if delta > 0:
+                counter.inc(delta * scale)
+            _pool_seen[name] = stats[name]
+
+
+def _response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length', 0))
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    # Sync and async, so that async views under ASGI are not run in a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = {'db_queries': 0, 'db_time': 0.0, 'template_time': 0.0}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.record(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = {'db_queries': 0, 'db_time': 0.0, 'template_time': 0.0}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.record(request, response, timings, time.perf_counter() - started)
+
+    def record(self, request, response, timings, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else '<unresolved>'
+        REQUEST_LATENCY.labels(view).observe(duration)
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(view).observe(timings['db_queries'])
+        DB_TIME.labels(view).observe(timings['db_time'])
+        TEMPLATE_TIME.labels(view).observe(timings['template_time'])
+        RESPONSE_SIZE.labels(view).observe(_response_size(response))
+
+        response['Server-Timing'] = (
+            f'db;dur={timings["db_time"] * 1000:.1f};desc="{timings["db_queries"]} queries", '
+            f'tpl;dur={timings["template_time"] * 1000:.1f}, '
+            f'app;dur={duration * 1000:.1f}'
+        )
+        return response
+
+
+def is_monitoring_request(request):
+    """
+    Whether a request comes from monitoring: it bears MONITORING_TOKEN, or
+    it reaches the app directly (nginx sets X-Forwarded-For) from one of
+    INTERNAL_IPS
+    """
+    token = settings.MONITORING_TOKEN
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return 'X-Forwarded-For' not in request.headers and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+def monitoring_only(view):
+    """
+    Serves a view to monitoring only; anyone else gets a 404
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_monitoring_request(request):
+            raise Http404
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@monitoring_only
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, aggregated across workers in multiprocess mode
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,228 @@
+"""
+Query inspector for development and staging (settings.QUERY_INSPECTOR).
+
+Every SQL statement is reduced to a fingerprint (literals and parameters
+replaced by ?, IN lists collapsed) and attributed to its call site: the
+template line being rendered (``blog/post_detail.html:42``) or else the
+innermost frame of project code (``blog/views.py:57 in index``). When one
+request runs the same fingerprint from the same call site
+QUERY_INSPECTOR_N_PLUS_ONE times or more, that is reported as an N+1: a
+query per row of something the view should have fetched at once.
+
+SELECT statements taking QUERY_INSPECTOR_SLOW_MS or longer, inside a
+request or not, are run again under ``EXPLAIN (ANALYZE, BUFFERS)`` (in a
+savepoint, on the same connection) and reported with their plan.
+
+Reports are logged as warnings and appended as JSON lines to
+QUERY_INSPECTOR_LOG, which every process shares; ``manage.py query_report``
+aggregates them.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\$\d+')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+_PROJECT = os.path.join(os.path.abspath(settings.BASE_DIR), '')
+# Frames of execute wrappers (this module's, app.metrics') are not call sites
+_WRAPPER_ARGS = ('execute', 'sql', 'params', 'many', 'context')
+
+# The inspection of the current request, set by inspect_queries()
+_current = contextvars.ContextVar('query_inspection', default=None)
+_explaining = contextvars.ContextVar('query_inspector_explaining', default=False)
+_write_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """
+    The statement with literals and parameters replaced by ?, so that the
+    same query with different values has the same fingerprint.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            # Django template node: report the template line being rendered
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        filename = code.co_filename
+        if (
+            filename.startswith(_PROJECT) and 'site-packages' not in filename
+            and code.co_varnames[:5] != _WRAPPER_ARGS
+        ):
+            return f'{os.path.relpath(filename, _PROJECT)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return '?'
+
+
+def _publish(event):
+    event['time'] = time.time()
+    path = settings.QUERY_INSPECTOR_LOG
+    with _write_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+
+
+def _explain(connection, sql, params):
+    token = _explaining.set(True)
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        _explaining.reset(token)
+
+
+class Inspection:
+    def __init__(self, label):
+        self.label = label
+        self.counts = Counter()
+        self.statements = {}
+
+    def add(self, sql, site):
+        normalized = fingerprint(sql)
+        key = (_digest(normalized), site)
+        self.counts[key] += 1
+        self.statements.setdefault(key, normalized)
+
+    def repeated(self):
+        """
+        [(count, site, fingerprint)] of the statements run at least
+        QUERY_INSPECTOR_N_PLUS_ONE times from one call site.
+        """
+        return [
+            (count, site, self.statements[digest, site])
+            for (digest, site), count in self.counts.most_common()
+            if count >= settings.QUERY_INSPECTOR_N_PLUS_ONE
+        ]
+
+    def report(self):
+        for count, site, sql in self.repeated():
+            logger.warning('N+1 in %s: %d queries from %s: %s', self.label, count, site, sql[:200])
+            _publish({
+                'type': 'n+1', 'label': self.label, 'site': site, 'count': count,
+                'fingerprint': _digest(sql), 'sql': sql,
+            })
+
+
+def _inspect(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    inspection = _current.get()
+    site = _call_site()
+    if inspection is not None:
+        inspection.add(sql, site)
+    if (
+        duration_ms >= settings.QUERY_INSPECTOR_SLOW_MS
+        and not many and sql.lstrip()[:6].upper() == 'SELECT'
+    ):
+        plan = _explain(context['connection'], sql, params)
+        normalized = fingerprint(sql)
+        label = inspection.label if inspection is not None else '-'
+        logger.warning('Slow query (%.1f ms) in %s from %s: %s', duration_ms, label, site, normalized[:200])
+        _publish({
+            'type': 'slow', 'label': label, 'site': site, 'duration_ms': duration_ms,
+            'fingerprint': _digest(normalized), 'sql': normalized, 'plan': plan,
+        })
+    return result
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if settings.QUERY_INSPECTOR and _inspect not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_inspect)
+
+
+class inspect_queries:
+    """
+    Collect the statements run inside the block and report N+1 patterns
+    when it ends. Usable as a context manager around any unit of work;
+    QueryInspectorMiddleware wraps each request in one.
+    """
+
+    def __init__(self, label):
+        self.inspection = Inspection(label)
+
+    def __enter__(self):
+        self._token = _current.set(self.inspection)
+        return self.inspection
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        self.inspection.report()
+
+
+class QueryInspectorMiddleware:
+    # Sync and async, so that async views are measured as they run in production
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with inspect_queries(request.path) as inspection:
+            response = self.get_response(request)
+            self.label(inspection, request)
+        return response
+
+    async def __acall__(self, request):
+        with inspect_queries(request.path) as inspection:
+            response = await self.get_response(request)
+            self.label(inspection, request)
+        return response
+
+    @staticmethod
+    def label(inspection, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            inspection.label = f'{match.view_name} ({request.path})'
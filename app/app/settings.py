@@ -1,4 +1,5 @@
 import os
+import copy
 import json
 import logging
 from urllib.parse import urlparse
@@ -71,15 +72,19 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'blog.apps.BlogConfig',
-    'account.apps.AccountConfig'
+    'account.apps.AccountConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'app.metrics.MetricsMiddleware',
+    'app.query_inspector.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.db_router.PrimaryPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,7 +93,8 @@ ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for app.metrics
+        'BACKEND': 'app.metrics.TimedDjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
@@ -113,7 +119,7 @@ if DATABASE_URL:
     url = urlparse(DATABASE_URL)
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'ENGINE': 'django.db.backends.postgresql',
             'NAME': url.path[1:],
             'USER': url.username,
             'PASSWORD': url.password,
@@ -127,7 +133,7 @@ if DATABASE_URL:
 else:
     # Fallback to individual environment variables
     db_config = {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'OPTIONS': {
             'options': '-c search_path=%s' % os.environ.get("DB_SCHEME", "app")
         },
@@ -145,6 +151,86 @@ else:
         'default': db_config
     }
 
+# Connection reuse. With DB_POOL each worker process keeps a psycopg pool of
+# DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections, checked before each use,
+# and a request waits up to DB_POOL_TIMEOUT seconds for a free one; the pool
+# sizes times the number of worker processes must stay below PostgreSQL's
+# max_connections. Without it every thread keeps its own connection for
+# DB_CONN_MAX_AGE seconds, which suits WSGI only: ASGI runs requests on
+# fresh threads, so there DB_CONN_MAX_AGE must stay 0.
+DB_POOL = os.getenv("DB_POOL", "true").lower() == "true"
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "4")),
+        'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+
+# Read replicas: comma-separated DATABASE_URL-style URLs, added as aliases
+# replica1, replica2... with the primary's options (see app/db_router.py).
+# Tests read them from the primary's test database.
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+for number, replica_url in enumerate(DATABASE_REPLICA_URLS, 1):
+    url = urlparse(replica_url)
+    replica = copy.deepcopy(DATABASES['default'])
+    replica.update({
+        'NAME': url.path[1:],
+        'USER': url.username,
+        'PASSWORD': url.password,
+        'HOST': url.hostname,
+        'PORT': url.port or '5432',
+        'TEST': {'MIRROR': 'default'},
+    })
+    # Give up quickly on a replica that is down; reads fall back to the primary
+    replica['OPTIONS']['connect_timeout'] = 3
+    DATABASES[f'replica{number}'] = replica
+DATABASE_ROUTERS = ['app.db_router.ReplicaRouter']
+
+# Replicas further behind than REPLICA_MAX_LAG seconds are skipped; lag is
+# checked every REPLICA_CHECK_INTERVAL seconds, and a visitor's reads stay on
+# the primary for REPLICA_PIN_SECONDS after they write
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "15"))
+
+# Cache: shared Redis when REDIS_URL is set (required for page cache purges to
+# reach every worker), otherwise a per-process in-memory cache
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'theblogs',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'theblogs',
+        }
+    }
+
+# Sessions are read through the cache, the logged-in user is cached for
+# USER_CACHE_TIMEOUT seconds (see account/backends.py) and messages travel in
+# a cookie, so a logged-in page view queries only for its content. A logout
+# or profile change must reach every worker's cache, so without Redis
+# sessions stay in the database and users are not cached.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db'
+USER_CACHE_TIMEOUT = int(os.getenv("USER_CACHE_TIMEOUT", "300" if REDIS_URL else "0"))
+# Logins go through CachedModelBackend; ModelBackend stays listed for the
+# sessions started before it, which name ModelBackend and would otherwise
+# be logged out. It can go once SESSION_COOKIE_AGE has passed since then.
+AUTHENTICATION_BACKENDS = [
+    'account.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -181,6 +267,79 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# PostgreSQL text search configuration used for Post.search_vector
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "english")
+
+# Listings switch from ?page=N to keyset cursors after this page
+PAGINATION_MAX_PAGE_NUMBER = int(os.getenv("PAGINATION_MAX_PAGE_NUMBER", "5"))
+
+# Listing counts are cached for COUNT_CACHE_TIMEOUT seconds; above
+# COUNT_ESTIMATE_THRESHOLD rows the planner's estimate replaces COUNT(*)
+COUNT_CACHE_TIMEOUT = int(os.getenv("COUNT_CACHE_TIMEOUT", "300"))
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "10000"))
+
+# Cache-Control max-age of calendar API responses for finished and current months
+CALENDAR_PAST_MAX_AGE = int(os.getenv("CALENDAR_PAST_MAX_AGE", "86400"))
+CALENDAR_CURRENT_MAX_AGE = int(os.getenv("CALENDAR_CURRENT_MAX_AGE", "60"))
+
+# Related posts (see blog/related.py): neighbours stored per post, TF-IDF
+# vocabulary size, SVD dimensions, where the fitted model is saved, and the
+# number of posts changed since the last build past which a refresh rebuilds
+RELATED_POSTS_COUNT = int(os.getenv("RELATED_POSTS_COUNT", "5"))
+RELATED_POSTS_MAX_FEATURES = int(os.getenv("RELATED_POSTS_MAX_FEATURES", "50000"))
+RELATED_POSTS_DIMENSIONS = int(os.getenv("RELATED_POSTS_DIMENSIONS", "256"))
+RELATED_POSTS_MODEL_PATH = os.getenv("RELATED_POSTS_MODEL_PATH", os.path.join(BASE_DIR, 'var', 'related_posts.joblib'))
+RELATED_POSTS_REFRESH_LIMIT = int(os.getenv("RELATED_POSTS_REFRESH_LIMIT", "1000"))
+
+# Anonymous full-page cache lifetime in seconds (see blog/page_cache.py); 0 disables it
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "300"))
+
+# Write-behind view counter (see blog/view_counter.py)
+VIEW_COUNTER_FLUSH_INTERVAL = float(os.getenv("VIEW_COUNTER_FLUSH_INTERVAL", "5"))
+VIEW_COUNTER_MAX_PENDING = int(os.getenv("VIEW_COUNTER_MAX_PENDING", "1000"))
+VIEW_COUNTER_SPOOL_DIR = os.getenv("VIEW_COUNTER_SPOOL_DIR", os.path.join(BASE_DIR, 'spool', 'views'))
+
+# Requests each ASGI worker runs at once (see app/asgi.py); 0 for no limit
+ASGI_MAX_CONCURRENCY = int(os.getenv("ASGI_MAX_CONCURRENCY", "16"))
+
+# Background jobs (see jobs/worker.py): first retry delay and its cap in
+# seconds, how long a job may run before it is presumed lost, and how many
+# days finished jobs are kept
+JOBS_RETRY_DELAY = float(os.getenv("JOBS_RETRY_DELAY", "5"))
+JOBS_RETRY_MAX_DELAY = float(os.getenv("JOBS_RETRY_MAX_DELAY", "600"))
+JOBS_LEASE_TIMEOUT = int(os.getenv("JOBS_LEASE_TIMEOUT", "1800"))
+JOBS_RETENTION_DAYS = int(os.getenv("JOBS_RETENTION_DAYS", "7"))
+
+# Two-tier app cache (see blog/caching.py): shared-cache lifetime of values,
+# per-process LRU entries and lifetime (the delay before other workers see an
+# invalidation), XFetch early-refresh factor and how long others wait on a
+# recompute
+APP_CACHE_TIMEOUT = int(os.getenv("APP_CACHE_TIMEOUT", "300"))
+APP_CACHE_LOCAL_SIZE = int(os.getenv("APP_CACHE_LOCAL_SIZE", "1000"))
+APP_CACHE_LOCAL_TIMEOUT = float(os.getenv("APP_CACHE_LOCAL_TIMEOUT", "5"))
+APP_CACHE_BETA = float(os.getenv("APP_CACHE_BETA", "1.0"))
+APP_CACHE_LOCK_TIMEOUT = float(os.getenv("APP_CACHE_LOCK_TIMEOUT", "10"))
+
+# Query inspector for development and staging (see app/query_inspector.py):
+# on by default with DEBUG; repeats of one query from one call site reported
+# as N+1, the threshold for EXPLAIN ANALYZE of slow queries, and the shared
+# report file read by manage.py query_report
+QUERY_INSPECTOR = os.getenv("QUERY_INSPECTOR", str(DEBUG)).lower() == "true"
+QUERY_INSPECTOR_N_PLUS_ONE = int(os.getenv("QUERY_INSPECTOR_N_PLUS_ONE", "3"))
+QUERY_INSPECTOR_SLOW_MS = float(os.getenv("QUERY_INSPECTOR_SLOW_MS", "100"))
+QUERY_INSPECTOR_LOG = os.getenv("QUERY_INSPECTOR_LOG", os.path.join(BASE_DIR, 'var', 'query_inspector.jsonl'))
+
+# Bulk test data (generate_users --bulk, generate_posts --count): shared
+# password hashes and synthetic rows, so allowed by default only with DEBUG;
+# set BULK_TEST_DATA=true to load a staging or benchmark database
+BULK_TEST_DATA = os.getenv("BULK_TEST_DATA", str(DEBUG)).lower() == "true"
+
+# Monitoring endpoints (/metrics, /health/db/): served only to requests with
+# "Authorization: Bearer <MONITORING_TOKEN>", or made straight to the app
+# (not through nginx) from INTERNAL_IPS
+MONITORING_TOKEN = os.getenv("MONITORING_TOKEN", "")
+INTERNAL_IPS = os.getenv("INTERNAL_IPS", "127.0.0.1,::1").split(",")
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'account.CustomUser'
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -11,6 +13,7 @@ urlpatterns = [
     path('account/', include('account.urls'), name="account"),
 
     path("health/", lambda r: HttpResponse("ok")),
+    path("metrics", metrics_view, name="metrics"),
     # While it is still under construction, we have to make it invisible for search robots. After we will update it.
     path("robots.txt", lambda r: HttpResponse(
         """User-agent: *
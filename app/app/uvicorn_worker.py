@@ -0,0 +1,19 @@
+"""
+Gunicorn worker class serving app.asgi with uvicorn.
+
+    gunicorn app.asgi:application -k app.uvicorn_worker.UvicornWorker
+
+Gunicorn keeps managing the processes (and runs the hooks in
+gunicorn.conf.py); each worker runs an event loop, so one process holds many
+slow connections at once.
+"""
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    CONFIG_KWARGS = {
+        'loop': 'auto',
+        'http': 'auto',
+        # Django does not implement the ASGI lifespan protocol
+        'lifespan': 'off',
+    }
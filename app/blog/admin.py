@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from .images import thumbnail_url
 from .models import Post
 
 @admin.register(Post)
@@ -32,7 +33,8 @@ class PostAdmin(admin.ModelAdmin):
 
     def display_image(self, obj):
         if obj.featured_image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.featured_image.url)
+            url = thumbnail_url(obj.featured_image, obj.featured_image_variants)
+            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', url)
         return "No Image"
     display_image.short_description = 'Image'
 
@@ -0,0 +1,179 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+"""
+import datetime
+import itertools
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.utils.text import slugify
+
+# Seeded datasets draw their text from this fixed vocabulary rather than
+# Faker, whose output changes between releases, so that a dataset stays the
+# same across dependency upgrades and runs remain comparable.
+WORDS = (
+    'python', 'django', 'postgres', 'index', 'query', 'cache', 'latency', 'throughput', 'worker',
+    'thread', 'async', 'server', 'request', 'response', 'template', 'session', 'cookie', 'header',
+    'deploy', 'docker', 'nginx', 'gunicorn', 'uvicorn', 'replica', 'primary', 'backup', 'vacuum',
+    'planner', 'buffer', 'memory', 'profile', 'benchmark', 'release', 'feature', 'review', 'design',
+    'garden', 'travel', 'coffee', 'recipe', 'mountain', 'river', 'city', 'winter', 'summer',
+    'autumn', 'spring', 'music', 'guitar', 'piano', 'novel', 'poetry', 'history', 'science',
+    'physics', 'biology', 'ocean', 'forest', 'desert', 'island', 'bridge', 'railway', 'bicycle',
+    'camera', 'photo', 'painting', 'museum', 'library', 'school', 'teacher', 'student', 'market',
+    'startup', 'budget', 'invoice', 'meeting', 'roadmap', 'sprint', 'incident', 'outage', 'metric',
+    'dashboard', 'alert', 'pager', 'runbook', 'migration', 'schema', 'column', 'table', 'join',
+    'lock', 'deadlock', 'transaction', 'commit', 'rollback', 'snapshot', 'stream', 'queue',
+    'job', 'retry', 'timeout', 'pool', 'connection', 'socket', 'packet', 'network', 'router',
+    'kernel', 'scheduler', 'compiler', 'parser', 'token', 'grammar', 'language', 'syntax',
+    'morning', 'evening', 'weekend', 'holiday', 'family', 'friend', 'neighbour', 'village',
+    'harbour', 'lighthouse', 'storm', 'sunset', 'meadow', 'orchard', 'harvest', 'kitchen',
+    'bread', 'cheese', 'tea', 'bakery', 'festival', 'theatre', 'cinema', 'football', 'tennis',
+    'running', 'swimming', 'climbing', 'sailing', 'hiking', 'camping', 'journey', 'letter',
+)
+
+# Seeded posts are spread over the year before this date, not before today,
+# so that every run pages and groups them alike
+SEED_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+SEED_PASSWORD = 'bench'
+
+
+def percentile(samples, pct):
+    """
+    Returns the pct-th percentile of the samples (nearest-rank method).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies, elapsed):
+    """
+    Returns request count, throughput and latency percentiles in milliseconds.
+    """
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def make_client(**defaults):
+    """
+    Returns a test client that passes ALLOWED_HOSTS outside the test runner.
+    """
+    host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'localhost')
+    return Client(HTTP_HOST=host, **defaults)
+
+
+def run_concurrent(request_fn, clients, requests_per_client):
+    """
+    Calls request_fn(client_index, request_index) from `clients` threads and
+    returns (latencies, elapsed). Each thread closes its own DB connection.
+    """
+    latencies = []
+    lock = threading.Lock()
+    errors = []
+
+    def worker(client_index):
+        local = []
+        try:
+            for request_index in range(requests_per_client):
+                started = time.perf_counter()
+                request_fn(client_index, request_index)
+                local.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        raise errors[0]
+    return latencies, elapsed
+
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + '.'
+
+
+def _markdown(rng, words):
+    blocks = []
+    while words > 0:
+        kind = rng.random()
+        if kind < 0.1:
+            blocks.append('## ' + _sentence(rng, 2, 6)[:-1])
+        elif kind < 0.2:
+            blocks.append('\n'.join('- ' + _sentence(rng, 3, 8) for _ in range(rng.randint(2, 5))))
+        else:
+            blocks.append(' '.join(_sentence(rng, 6, 20) for _ in range(rng.randint(2, 6))))
+        words -= len(blocks[-1].split())
+    return '\n\n'.join(blocks)
+
+
+def seed_dataset(users, posts, seed=0, batch_size=1000):
+    """
+    Fills an empty database with `users` authors (usernames bench00000...,
+    password SEED_PASSWORD) and `posts` posts, 90% of them published, most
+    written by a few prolific authors. The same arguments give the same
+    dataset. Rows are inserted with bulk_create; derived columns, rollups
+    and related posts are then computed in bulk.
+    """
+    from blog import related
+    from blog.models import DailyPostCount, Post
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)
+    User.objects.bulk_create([
+        User(username=f'bench{i:05d}', password=password, bio=_sentence(rng, 5, 15))
+        for i in range(users)
+    ], batch_size=batch_size)
+    author_ids = list(User.objects.filter(username__startswith='bench').order_by('username').values_list('id', flat=True))
+    # Zipf-like: the n-th author writes about 1/n as much as the first
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(author_ids) + 1)))
+
+    batch = []
+    for i, author_id in enumerate(rng.choices(author_ids, cum_weights=cum_weights, k=posts)):
+        title = _sentence(rng, 3, 8)[:-1]
+        post = Post(
+            title=title,
+            slug=f'{slugify(title)[:180]}-{i}',
+            excerpt=_sentence(rng, 8, 20) if rng.random() < 0.7 else '',
+            content=_markdown(rng, int(rng.lognormvariate(6, 0.8))),
+            author_id=author_id,
+            status='published' if rng.random() < 0.9 else 'draft',
+            created_at=SEED_EPOCH - datetime.timedelta(seconds=rng.randrange(365 * 86400)),
+        )
+        post.refresh_word_count()
+        post.refresh_content_html(force=True)
+        post.refresh_summary()
+        batch.append(post)
+        if len(batch) >= batch_size:
+            Post.objects.bulk_create(batch)
+            batch = []
+    Post.objects.bulk_create(batch)
+
+    Post.objects.update(search_vector=Post.build_search_vector())
+    DailyPostCount.rebuild()
+    User.reconcile_post_stats()
+    related.build(batch_size=batch_size)
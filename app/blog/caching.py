@@ -0,0 +1,224 @@
+"""
+Two-tier cache for computed values: a small per-process LRU in front of the
+shared Django cache.
+
+A value is looked up in the process's LRU (at most APP_CACHE_LOCAL_SIZE
+entries, each kept APP_CACHE_LOCAL_TIMEOUT seconds), then in the shared
+cache, where it lives for the caller's timeout (APP_CACHE_TIMEOUT by
+default). Keys belong to a namespace whose generation number is part of
+every key, so invalidate(namespace) drops all of them at once (as
+blog.counts does); other processes notice within APP_CACHE_LOCAL_TIMEOUT.
+
+Recomputing a popular value must not stampede PostgreSQL:
+
+* On a miss, one thread per process computes while the others wait for its
+  result, and across processes a lock key in the shared cache lets one of
+  them compute while the rest poll for the value (up to
+  APP_CACHE_LOCK_TIMEOUT seconds, after which they compute themselves).
+* Values are refreshed early with probability growing as expiry nears,
+  scaled by how long they took to compute and APP_CACHE_BETA (XFetch,
+  Vattani et al., "Optimal Probabilistic Cache Stampede Prevention"). The
+  refreshing caller takes the lock; everyone else keeps serving the
+  current value, so a hot key is normally recomputed before it expires.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from app.db_router import hold_replica_reads
+
+
+class LocalCache:
+    """
+    Thread-safe LRU of at most APP_CACHE_LOCAL_SIZE entries, each expiring
+    APP_CACHE_LOCAL_TIMEOUT seconds after it was stored.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if settings.APP_CACHE_LOCAL_SIZE <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + settings.APP_CACHE_LOCAL_TIMEOUT)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.APP_CACHE_LOCAL_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _generation_key(namespace):
+    return f'app:{namespace}:generation'
+
+
+def _generation(namespace):
+    key = _generation_key(namespace)
+    generation = local_cache.get(key)
+    if generation is None:
+        generation = cache.get_or_set(key, time.time_ns(), None)
+        local_cache.set(key, generation)
+    return generation
+
+
+def invalidate(namespace):
+    """
+    Drop every value cached in the namespace. Replica reads are held
+    meanwhile, so that the values are recomputed from the primary.
+    """
+    hold_replica_reads()
+    key = _generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Missing key: start from a value no earlier generation can have used
+        cache.set(key, time.time_ns(), None)
+    local_cache.delete(key)
+
+
+def _expires_early(delta, expiry):
+    # XFetch: -log(u) is exponentially distributed, so a value that took
+    # `delta` seconds to compute is refreshed a few deltas before expiry
+    return time.time() - delta * settings.APP_CACHE_BETA * math.log(1 - random.random()) >= expiry
+
+
+def _compute(key, compute, timeout):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    entry = (value, delta, time.time() + timeout)
+    cache.set(key, entry, timeout)
+    local_cache.set(key, entry)
+    return value
+
+
+def _compute_locked(key, compute, timeout):
+    # One process computes; the others poll the shared cache for its result
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, settings.APP_CACHE_LOCK_TIMEOUT):
+        try:
+            return _compute(key, compute, timeout)
+        finally:
+            cache.delete(lock)
+    deadline = time.monotonic() + settings.APP_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            local_cache.set(key, entry)
+            return entry[0]
+    return _compute(key, compute, timeout)
+
+
+def _single_flight(key, compute, timeout):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(settings.APP_CACHE_LOCK_TIMEOUT):
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        return _compute(key, compute, timeout)
+
+    try:
+        flight.value = _compute_locked(key, compute, timeout)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def get_or_compute(namespace, key, compute, timeout=None):
+    """
+    Returns the value cached under (namespace, key), calling compute() to
+    produce it when missing or due for an early refresh. Values must be
+    picklable and not None.
+    """
+    timeout = settings.APP_CACHE_TIMEOUT if timeout is None else timeout
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    full_key = f'app:{namespace}:{_generation(namespace)}:{digest}'
+
+    entry = local_cache.get(full_key)
+    if entry is None:
+        entry = cache.get(full_key)
+        if entry is not None:
+            local_cache.set(full_key, entry)
+    if entry is None:
+        return _single_flight(full_key, compute, timeout)
+
+    value, delta, expiry = entry
+    if _expires_early(delta, expiry) and cache.add(f'{full_key}:lock', 1, settings.APP_CACHE_LOCK_TIMEOUT):
+        try:
+            return _compute(full_key, compute, timeout)
+        finally:
+            cache.delete(f'{full_key}:lock')
+    return value
+
+
+async def aget_or_compute(namespace, key, compute, timeout=None):
+    """
+    get_or_compute() for async views; compute runs in a worker thread.
+    """
+    return await sync_to_async(get_or_compute)(namespace, key, compute, timeout)
+
+
+def cached(namespace, timeout=None):
+    """
+    Caches a function's results by its arguments (see get_or_compute).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f'{func.__module__}.{func.__qualname__}:{args!r}:{sorted(kwargs.items())!r}'
+            return get_or_compute(namespace, key, lambda: func(*args, **kwargs), timeout)
+        return wrapper
+    return decorator
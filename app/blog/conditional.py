@@ -0,0 +1,204 @@
+"""
+Conditional GET (ETag / Last-Modified) for read views.
+
+A validator computes a cheap version of the page with at most one small
+query before the view runs. When the client's If-None-Match or
+If-Modified-Since matches, a 304 is returned without running the view's own
+queries or rendering the template.
+
+ETags include a hash of the session cookie, so pages that differ between
+visitors (navbar, drafts) never validate across users.
+
+conditional_page also wraps async views, running the validator (and
+on_not_modified) through sync_to_async.
+"""
+import datetime
+import hashlib
+from functools import wraps
+from typing import Callable, NamedTuple, Optional
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Q, Subquery, Sum
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.http import http_date, quote_etag
+
+from .models import DailyPostCount, Post
+
+
+class Validators(NamedTuple):
+    version: str
+    last_modified: Optional[datetime.datetime] = None
+    # Called instead of the view when a 304 is returned
+    on_not_modified: Optional[Callable[[], None]] = None
+
+
+def _visitor(request):
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    return hashlib.sha1(session_key.encode('utf-8')).hexdigest()[:12] if session_key else 'anon'
+
+
+def _etag(request, version):
+    digest = hashlib.sha1(f'{request.get_full_path()}|{version}'.encode('utf-8')).hexdigest()
+    return quote_etag(f'{digest[:20]}-{_visitor(request)}')
+
+
+def _has_pending_messages(request):
+    # Messages are consumed by rendering; never answer 304 while some wait.
+    return 'messages' in request.COOKIES
+
+
+def conditional_page(validator):
+    """
+    Decorator answering conditional GETs with 304 when validator(request,
+    *args, **kwargs) reports an unchanged page. The validator returns
+    Validators, or None when the page cannot be validated cheaply.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _validatable(request):
+                    return await view(request, *args, **kwargs)
+
+                validators = await sync_to_async(validator)(request, *args, **kwargs)
+                if validators is None:
+                    return await view(request, *args, **kwargs)
+
+                etag, last_modified, not_modified = _precondition(request, validators)
+                if not_modified is not None:
+                    if not_modified.status_code == 304 and validators.on_not_modified:
+                        await sync_to_async(validators.on_not_modified)()
+                    return not_modified
+
+                response = await view(request, *args, **kwargs)
+                return _with_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _validatable(request):
+                return view(request, *args, **kwargs)
+
+            validators = validator(request, *args, **kwargs)
+            if validators is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified, not_modified = _precondition(request, validators)
+            if not_modified is not None:
+                if not_modified.status_code == 304 and validators.on_not_modified:
+                    validators.on_not_modified()
+                return not_modified
+
+            response = view(request, *args, **kwargs)
+            return _with_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def _validatable(request):
+    return request.method in ('GET', 'HEAD') and not _has_pending_messages(request)
+
+
+def _precondition(request, validators):
+    # Returns (etag, last_modified, the 304 or 412 response or None)
+    etag = _etag(request, validators.version)
+    last_modified = (
+        int(validators.last_modified.timestamp()) if validators.last_modified else None
+    )
+    return etag, last_modified, get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response.headers.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def conditional_content(request, response):
+    """
+    Validate a small, already built response by a hash of its content.
+    Returns a 304 response, or the response with its ETag set.
+    """
+    if response.status_code != 200:
+        return response
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _listing_version(rollup):
+    last = rollup['last'].isoformat() if rollup['last'] else ''
+    return f"{last}|{rollup['total'] or 0}"
+
+
+def published_posts_validators(request, *args, **kwargs):
+    """
+    Validators for listings of all published posts (index, search): the
+    daily rollup changes whenever a published post is added, edited,
+    unpublished or deleted.
+    """
+    rollup = DailyPostCount.objects.aggregate(last=Max('updated_at'), total=Sum('count'))
+    return Validators(_listing_version(rollup), rollup['last'])
+
+
+def authors_validators(request, *args, **kwargs):
+    """
+    Validators for the authors directory: published posts and user profiles.
+    """
+    from account.models import CustomUser
+
+    rollup_table = DailyPostCount._meta.db_table
+    user_table = CustomUser._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT max(updated_at) FROM {rollup_table}), '
+            f'(SELECT sum(count) FROM {rollup_table}), '
+            f'(SELECT max(updated_at) FROM {user_table})'
+        )
+        posts_last, posts_total, users_last = cursor.fetchone()
+    last = max(filter(None, [posts_last, users_last]), default=None)
+    return Validators(f'{posts_last}|{posts_total}|{users_last}', last)
+
+
+def profile_validators(request, username):
+    """
+    Validators for an author's public profile: the user row and their
+    published posts.
+    """
+    from account.models import CustomUser
+
+    row = CustomUser.objects.filter(username=username).annotate(
+        posts_last=Max('blog_posts__updated_at', filter=Q(blog_posts__status='published')),
+        posts_total=Count('blog_posts', filter=Q(blog_posts__status='published')),
+    ).values_list('updated_at', 'posts_last', 'posts_total').first()
+    if row is None:
+        return None
+    user_last, posts_last, posts_total = row
+    last = max(filter(None, [user_last, posts_last]), default=None)
+    return Validators(f'{user_last}|{posts_last}|{posts_total}', last)
+
+
+def post_detail_validators(request, post_slug):
+    """
+    Validators for a published post page: the post, its author and, for the
+    related posts, the daily rollup. A 304 still counts the view.
+    """
+    from .view_counter import view_counter
+
+    listing_last = DailyPostCount.objects.order_by('-updated_at').values('updated_at')[:1]
+    row = Post.objects.filter(slug=post_slug).annotate(
+        listing_last=Subquery(listing_last)
+    ).values_list('pk', 'status', 'updated_at', 'author__updated_at', 'listing_last').first()
+    if row is None or row[1] != 'published':
+        return None
+    pk, _, post_last, author_last, listing_last = row
+    last = max(filter(None, [post_last, author_last, listing_last]))
+    return Validators(
+        f'{post_last}|{author_last}|{listing_last}', last,
+        on_not_modified=lambda: view_counter.record(pk),
+    )
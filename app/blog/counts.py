@@ -0,0 +1,87 @@
+"""
+Cached and estimated row counts for paginated listings.
+
+Exact counts are cached under a generation number that is bumped whenever a
+post is saved or deleted (see blog.signals), so every cached count is
+invalidated at once without tracking which listings a post belongs to.
+When a count is not cached, the planner's estimate is asked first (from
+pg_class.reltuples for an unfiltered table, EXPLAIN otherwise); above
+COUNT_ESTIMATE_THRESHOLD rows the estimate is used instead of COUNT(*).
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from app.db_router import hold_replica_reads
+
+GENERATION_KEY = 'blog:counts:generation'
+
+
+def count_generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_counts():
+    """
+    Invalidate every cached count, holding replica reads meanwhile.
+    """
+    hold_replica_reads()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Missing key: start from a value no earlier generation can have used.
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _cache_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha1(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()
+    return f'blog:counts:{count_generation()}:{digest}'
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for the queryset.
+    """
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        if row and row[0] >= 0:
+            return row[0]
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(queryset, allow_estimate=True):
+    """
+    Returns (count, is_estimate) for the queryset.
+    """
+    queryset = queryset.order_by()
+    # none() or an always-false filter: no SQL to key, estimate or run
+    if queryset.query.is_empty():
+        return (0, False)
+    key = _cache_key(queryset)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    result = None
+    if allow_estimate:
+        estimate = estimate_count(queryset)
+        if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+            result = (estimate, True)
+    if result is None:
+        result = (queryset.count(), False)
+
+    cache.set(key, result, settings.COUNT_CACHE_TIMEOUT)
+    return result
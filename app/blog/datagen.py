@@ -0,0 +1,312 @@
+"""
+Offline generation of large synthetic datasets for scale testing
+(``manage.py generate_posts --count``, ``manage.py generate_users --count``).
+
+Text comes from Faker and images are drawn with Pillow into a small pool
+under MEDIA_ROOT, so nothing is fetched from the network. Posts are made in
+chunks, each seeded from the dataset seed and its own number, so the same
+arguments give the same posts whatever the number of worker processes.
+
+Rendering Markdown is the costly part of a post. Each chunk renders a pool
+of blocks (paragraphs, headings, lists, code) once and composes its posts
+from them: the content is the blocks joined by blank lines, and the HTML,
+word count and summary are assembled from those of the blocks, exactly as
+Post.save() would have computed them. Blocks are arranged so that none
+merges with its neighbour when the whole post is rendered (two lists or
+two quotes in a row would), which blog.tests checks.
+"""
+import datetime
+import html
+import itertools
+import multiprocessing
+import random
+import re
+import uuid
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+from PIL import Image, ImageDraw, ImageFont
+
+from app.dbpool import close_pools
+
+from .rendering import render_key, render_markdown
+
+# Images are shared by many posts, so they are drawn once per pool slot
+IMAGE_DIR = 'blog_images/generated'
+IMAGE_SIZE = (1200, 675)
+AVATAR_SIZE = 320
+
+PUBLISHED_RATIO = 0.9
+EXCERPT_RATIO = 0.7
+# Blocks rendered per chunk; posts draw from them
+PARAGRAPHS, HEADINGS, EXTRAS = 400, 120, 120
+
+_WORD = re.compile(r'\w+')
+
+
+class Block:
+    """
+    A Markdown block with its rendered HTML, its text as listings show it
+    and its word counts.
+    """
+
+    def __init__(self, markdown):
+        self.markdown = markdown
+        self.html = render_markdown(markdown)
+        self.text = ' '.join(html.unescape(strip_tags(self.html)).split())
+        self.words = len(_WORD.findall(markdown))
+        self.text_words = len(self.text.split())
+        # The renderer leaves a blank line after highlighted code
+        self.separator = '\n\n' if markdown.startswith('```') else '\n'
+
+
+class BlockPool:
+    def __init__(self, fake, rng):
+        self.paragraphs = [
+            Block(fake.paragraph(nb_sentences=rng.randint(3, 7))) for _ in range(PARAGRAPHS)
+        ]
+        self.headings = [
+            Block('## ' + fake.sentence(nb_words=rng.randint(3, 7)).rstrip('.')) for _ in range(HEADINGS)
+        ]
+        self.extras = [Block(self._extra(fake, rng)) for _ in range(EXTRAS)]
+
+    @staticmethod
+    def _extra(fake, rng):
+        kind = rng.random()
+        if kind < 0.35:
+            return '\n'.join('- ' + fake.sentence(nb_words=rng.randint(4, 10)) for _ in range(rng.randint(2, 5)))
+        if kind < 0.55:
+            return '\n'.join(f'{n}. ' + fake.sentence(nb_words=rng.randint(4, 8)) for n in range(1, rng.randint(3, 5)))
+        if kind < 0.8:
+            lines = [f'{fake.word()}_{n} = {fake.pyint()}' for n in range(rng.randint(2, 5))]
+            return '```python\n' + '\n'.join(lines) + '\n```'
+        return '> ' + fake.paragraph(nb_sentences=rng.randint(1, 3))
+
+    def compose(self, rng, words):
+        """
+        Returns the blocks of a post of about `words` words: an introduction,
+        then sections of a heading, paragraphs and at most one list, quote
+        or code block, which is never followed by another.
+        """
+        blocks = [rng.choice(self.paragraphs)]
+        total = blocks[0].words
+        while total < words:
+            section = [rng.choice(self.headings)]
+            section += rng.choices(self.paragraphs, k=rng.randint(1, 3))
+            if rng.random() < 0.5:
+                section.append(rng.choice(self.extras))
+            blocks += section
+            total += sum(block.words for block in section)
+        return blocks
+
+
+def _summary(excerpt, blocks, limit):
+    # Post.refresh_summary() over the text of just enough blocks
+    if excerpt:
+        return Truncator(' '.join(excerpt.split())).words(limit)
+    texts, words = [], 0
+    for block in blocks:
+        if block.text:
+            texts.append(block.text)
+            words += block.text_words
+            if words > limit:
+                break
+    return Truncator(' '.join(texts)).words(limit)
+
+
+def chunk_seed(seed, chunk):
+    return seed * 1_000_003 + chunk
+
+
+def fill_post(post, blocks):
+    """
+    Sets the content of an unsaved post from blocks and its derived
+    columns as Post.save() would, except the search vector.
+    """
+    post.content = '\n\n'.join(block.markdown for block in blocks)
+    post.content_html = ''.join(
+        block.html + (block.separator if n < len(blocks) - 1 else '') for n, block in enumerate(blocks)
+    )
+    post.content_html_key = render_key(post.content)
+    post.word_count = sum(block.words for block in blocks)
+    post.reading_time = max(1, round(post.word_count / post.WORDS_PER_MINUTE))
+    post.summary = _summary(post.excerpt, blocks, post.SUMMARY_WORDS)
+
+
+def build_posts(chunk, size, spec):
+    """
+    Returns the unsaved posts of a chunk. `spec` holds the dataset
+    parameters: seed, author_ids and cum_weights, images, image_chance,
+    end (the latest created_at) and days.
+    """
+    from faker import Faker
+
+    from .models import Post
+
+    rng = random.Random(chunk_seed(spec['seed'], chunk))
+    fake = Faker('en_US')
+    fake.seed_instance(chunk_seed(spec['seed'], chunk))
+    pool = BlockPool(fake, rng)
+    span = spec['days'] * 86400
+
+    posts = []
+    for _ in range(size):
+        author_id = rng.choices(spec['author_ids'], cum_weights=spec['cum_weights'])[0]
+        title = fake.sentence(nb_words=rng.randint(4, 9)).rstrip('.')
+        post = Post(
+            title=title,
+            slug=f'{slugify(title)[:180]}-{uuid.UUID(int=rng.getrandbits(128)).hex[:8]}',
+            excerpt=fake.paragraph(nb_sentences=2)[:500] if rng.random() < EXCERPT_RATIO else '',
+            author_id=author_id,
+            status='published' if rng.random() < PUBLISHED_RATIO else 'draft',
+            created_at=spec['end'] - datetime.timedelta(seconds=rng.randrange(span)),
+        )
+        fill_post(post, pool.compose(rng, int(rng.lognormvariate(6, 0.8))))
+        if spec['images'] and rng.random() < spec['image_chance']:
+            post.featured_image = rng.choice(spec['images'])
+            post.image_caption = fake.sentence(nb_words=rng.randint(4, 8))
+        posts.append(post)
+    return posts
+
+
+def reserve_ids(model, count):
+    """
+    Returns `count` new primary keys of a model, taken from its sequence.
+    """
+    opts = model._meta
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+            [opts.db_table, opts.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_posts(posts):
+    """
+    Inserts unsaved posts with COPY, about twice as fast as bulk_create(),
+    then computes their search vectors in one UPDATE. Their ids are taken
+    from the sequence beforehand.
+    """
+    from .models import Post
+
+    opts = Post._meta
+    fields = [field for field in opts.concrete_fields if field.name != 'search_vector']
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        ids = reserve_ids(Post, len(posts))
+        columns = ', '.join(quote(field.column) for field in fields)
+        with cursor.copy(f'COPY {quote(opts.db_table)} ({columns}) FROM STDIN') as copy:
+            for post, pk in zip(posts, ids):
+                post.pk = pk
+                copy.write_row([field.get_db_prep_save(field.pre_save(post, True), connection) for field in fields])
+        Post.objects.filter(pk__in=ids).update(search_vector=Post.build_search_vector())
+    return ids
+
+
+def _insert_chunk(args):
+    chunk, size, spec = args
+    return chunk, len(copy_posts(build_posts(chunk, size, spec)))
+
+
+def run_chunks(function, chunks, workers):
+    """
+    Yields function(chunk) for each chunk, run by `workers` forked
+    processes (or in this one). Database connections are closed first so
+    that no child shares one with its parent.
+    """
+    if workers <= 1:
+        yield from map(function, chunks)
+        return
+    connections.close_all()
+    close_pools()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap_unordered(function, chunks)
+
+
+def generate_posts(count, spec, chunk_size=2000, workers=1):
+    """
+    Inserts `count` posts in chunks and yields (chunk, posts inserted) as
+    each chunk commits.
+    """
+    chunks = [
+        (n, min(chunk_size, count - start), spec)
+        for n, start in enumerate(range(0, count, chunk_size))
+    ]
+    yield from run_chunks(_insert_chunk, chunks, workers)
+
+
+def first_slug(spec):
+    """
+    Returns the slug of the first post a dataset would insert, to tell
+    whether it was generated already.
+    """
+    return build_posts(0, 1, spec)[0].slug
+
+
+def author_weights(count):
+    # Zipf-like: the n-th author writes about 1/n as much as the first
+    return list(itertools.accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+def _palette(rng):
+    return [tuple(rng.randrange(40, 230) for _ in range(3)) for _ in range(2)]
+
+
+def draw_image(rng, size=IMAGE_SIZE):
+    """
+    Returns the JPEG bytes of an abstract picture: a gradient with a few
+    translucent shapes.
+    """
+    width, height = size
+    top, bottom = _palette(rng)
+    gradient = Image.linear_gradient('L').resize(size)
+    image = Image.composite(Image.new('RGB', size, bottom), Image.new('RGB', size, top), gradient)
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for _ in range(rng.randint(3, 8)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randint(height // 12, height // 3)
+        color = tuple(rng.randrange(256) for _ in range(3)) + (rng.randint(60, 160),)
+        box = (x - radius, y - radius, x + radius, y + radius)
+        if rng.random() < 0.5:
+            draw.ellipse(box, fill=color)
+        else:
+            draw.rectangle(box, fill=color)
+    image = Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=82)
+    return buffer.getvalue()
+
+
+def draw_avatar(rng, initials, size=AVATAR_SIZE):
+    """
+    Returns the JPEG bytes of a square avatar: initials on a plain colour.
+    """
+    background, _ = _palette(rng)
+    image = Image.new('RGB', (size, size), background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size // 2.5)
+    draw.text((size / 2, size / 2), initials.upper(), fill='white', font=font, anchor='mm')
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def image_pool(size, seed=0):
+    """
+    Returns the names of `size` stored images for featured images, drawing
+    those that do not exist yet. Pools of the same seed share their images.
+    """
+    names = []
+    for n in range(size):
+        name = f'{IMAGE_DIR}/pool-{seed}-{n:04d}.jpg'
+        if not default_storage.exists(name):
+            rng = random.Random(chunk_seed(seed, n))
+            name = default_storage.save(name, ContentFile(draw_image(rng)))
+        names.append(name)
+    return names
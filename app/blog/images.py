@@ -0,0 +1,108 @@
+"""
+Resized variants of uploaded images (post featured images, avatars).
+
+Each upload is resized to a fixed set of widths and saved as WebP and JPEG
+next to the original, under variants/. The result is recorded on the model
+(Post.featured_image_variants, CustomUser.avatar_variants) as:
+
+    {'source': <original name>, 'width': ..., 'height': ...,
+     'webp': [[name, width, height], ...], 'jpeg': [...]}
+
+The responsive_image template tag turns it into a <picture> with srcset,
+width and height, and falls back to the original while no variants exist
+or they belong to a replaced image.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Widths in pixels; avatars are cropped square. The smallest featured width
+# serves the admin's thumbnails
+FEATURED_WIDTHS = (160, 480, 800, 1200, 1600)
+AVATAR_WIDTHS = (64, 128, 320)
+
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def variant_name(source, width, extension):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}-{width}w.{extension}')
+
+
+def _flattened(image):
+    # JPEG has no alpha channel; lay transparent images on white
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(source, widths, square=False):
+    """
+    Write the variants of the stored image `source` and return their
+    description. Widths larger than the image are skipped, except that the
+    smallest is always produced.
+    """
+    with default_storage.open(source, 'rb') as f:
+        image = _flattened(Image.open(f))
+    if square:
+        side = min(image.size)
+        image = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+
+    result = {'source': source, 'width': image.width, 'height': image.height}
+    targets = [w for w in widths if w <= image.width] or [min(widths[0], image.width)]
+    for extension, _, _ in FORMATS:
+        result[extension] = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, pil_format, options in FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = variant_name(source, width, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            result[extension].append([name, width, height])
+    return result
+
+
+def delete_variants(variants, keep=None):
+    """
+    Delete the files of `variants` that are not also part of `keep`.
+    """
+    kept = {entry[0] for entries in (keep or {}).values() if isinstance(entries, list) for entry in entries}
+    for extension, _, _ in FORMATS:
+        for name, _, _ in variants.get(extension, []):
+            if name not in kept:
+                default_storage.delete(name)
+
+
+def current_variants(image, variants):
+    """
+    Returns variants if they were made from the image currently stored in
+    the field, else None.
+    """
+    if image and variants and variants.get('source') == image.name:
+        return variants
+    return None
+
+
+def thumbnail_url(image, variants):
+    """
+    URL of the smallest JPEG variant of the image, or of the original.
+    """
+    variants = current_variants(image, variants)
+    if variants is None:
+        return image.url
+    return default_storage.url(variants['jpeg'][0][0])
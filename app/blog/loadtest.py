@@ -0,0 +1,156 @@
+"""
+Helpers for benchmarks that load a real server: start gunicorn in a
+subprocess, drive it with concurrent asyncio HTTP clients and measure its
+memory. Used by bench_servers and bench_db_pool.
+"""
+import asyncio
+import contextlib
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+SERVERS = {
+    'wsgi': ['app.wsgi:application'],
+    'asgi': ['app.asgi:application', '-k', 'app.uvicorn_worker.UvicornWorker'],
+}
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields follow its ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def rss_mb(pid):
+    """
+    Resident memory of a process and its children, in MB.
+    """
+    total = 0
+    for process in [pid, *_children(pid)]:
+        try:
+            with open(f'/proc/{process}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+@contextlib.contextmanager
+def serve(mode, workers, port, env=None):
+    """
+    Runs gunicorn serving the app in `mode` ('wsgi' or 'asgi') on port until
+    the block exits; yields its Popen. Environment overrides apply to the
+    server only.
+    """
+    env = {**os.environ, 'PAGE_CACHE_TIMEOUT': '0', 'DEBUG': 'False', **(env or {})}
+    with tempfile.TemporaryFile() as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *SERVERS[mode],
+             '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=log,
+        )
+        try:
+            for _ in range(200):
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/health/', timeout=1).read()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            else:
+                log.seek(0)
+                raise CommandError(f'{mode} server did not start:\n{log.read().decode(errors="replace")}')
+            yield server
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+async def get(port, path, trickle=0):
+    """
+    One GET over a new connection. Returns (status, seconds). With trickle,
+    the request is sent in small pieces over that many seconds.
+    """
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode()
+    if trickle:
+        # Send the request in small pieces, like a client on a slow link
+        pieces = [request[i:i + 16] for i in range(0, len(request), 16)]
+        for piece in pieces:
+            writer.write(piece)
+            await writer.drain()
+            await asyncio.sleep(trickle / len(pieces))
+    else:
+        writer.write(request)
+        await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return int(data.split(b' ', 2)[1]), time.perf_counter() - started
+
+
+async def _load(port, paths, clients, duration, slow_clients, trickle):
+    deadline = time.perf_counter() + duration
+    results = {'fast': [], 'slow': [], 'errors': 0}
+
+    async def client(kind):
+        while time.perf_counter() < deadline:
+            try:
+                status, elapsed = await get(port, random.choice(paths), trickle if kind == 'slow' else 0)
+            except (OSError, IndexError, ValueError):
+                results['errors'] += 1
+                await asyncio.sleep(0.05)
+                continue
+            if status == 200:
+                results[kind].append(elapsed)
+            else:
+                results['errors'] += 1
+
+    await asyncio.gather(
+        *[client('fast') for _ in range(clients)],
+        *[client('slow') for _ in range(slow_clients)],
+    )
+    return results
+
+
+def run_load(port, paths, clients, duration, slow_clients=0, trickle=0):
+    """
+    Requests random paths from `clients` concurrent clients (plus
+    `slow_clients` trickling theirs) for `duration` seconds. Returns
+    {'fast': [seconds], 'slow': [seconds], 'errors': n}.
+    """
+    return asyncio.run(_load(port, paths, clients, duration, slow_clients, trickle))
+
+
+def describe(latencies, duration):
+    """
+    'N req/s, p50 X ms, p95 Y ms' for a list of request durations.
+    """
+    latencies = sorted(latencies)
+    text = f'{len(latencies) / duration:.1f} req/s'
+    if latencies:
+        text += (
+            f', p50 {statistics.median(latencies) * 1000:.1f} ms'
+            f', p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms'
+        )
+    return text
@@ -0,0 +1,343 @@
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+from blog.benchmarking import WORDS, make_client, run_concurrent, seed_dataset, summarize
+from blog.caching import local_cache
+from blog.models import Post
+from blog.pagination import DATE_KEYS, RANK_KEYS, CursorPaginator
+from blog.view_counter import view_counter
+
+User = get_user_model()
+
+# Default weight of each kind of page in the request mix
+MIX = {
+    'index': 20,
+    'search': 15,
+    'post_detail': 35,
+    'profile': 15,
+    'days_with_posts': 10,
+    'account_profile': 5,
+}
+
+# Listing pages past PAGINATION_MAX_PAGE_NUMBER are requested through
+# cursors, as a reader paging on would reach them
+DEEP_PAGES = (10, 25, 50)
+
+
+def _listing_urls(path, queryset, per_page, keys=DATE_KEYS, **params):
+    urls = [
+        f'{path}?{urlencode({**params, "page": number})}'
+        for number in range(1, settings.PAGINATION_MAX_PAGE_NUMBER + 1)
+    ]
+    paginator = CursorPaginator(queryset, per_page, keys)
+    for number in DEEP_PAGES:
+        offset = (number - 1) * per_page - 1
+        rows = list(queryset[offset:offset + 1])
+        if rows:
+            urls.append(f'{path}?{urlencode({**params, "cursor": paginator.cursor_after(rows[0])})}')
+    return urls
+
+
+def _revision():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def _change(old, new):
+    if not old:
+        return ''
+    return f' ({(new - old) / old * 100:+.1f}%)'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a deterministic dataset in a separate database and measure throughput, '
+        'latency and queries per request over a weighted mix of pages'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Authors to seed (default: 200)'
+        )
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=5000,
+            help='Posts to seed (default: 5000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Seed of the dataset and of the request sequence (default: 1)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=4,
+            help='Number of concurrent clients (default: 4)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=250,
+            help='Measured requests per client (default: 250)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=25,
+            help='Unmeasured requests per client first (default: 25)'
+        )
+        parser.add_argument(
+            '--mix',
+            help='Weights of the page kinds, e.g. index=20,post_detail=35 '
+                 f'(default: {",".join(f"{kind}={weight}" for kind, weight in MIX.items())})'
+        )
+        parser.add_argument(
+            '--page-cache',
+            action='store_true',
+            help='Keep the anonymous page cache on (it is off by default, so views are measured)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the seeded database for the next run with the same --users, --posts and --seed'
+        )
+        parser.add_argument(
+            '--output',
+            help='Where to save the JSON results (default: var/bench/<time>.json)'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results of an earlier run to compare with'
+        )
+
+    def _mix(self, text):
+        if not text:
+            return dict(MIX)
+        mix = {}
+        for item in text.split(','):
+            kind, _, weight = item.partition('=')
+            if kind not in MIX:
+                raise CommandError(f'Unknown page kind {kind!r}; choose from {", ".join(MIX)}')
+            try:
+                mix[kind] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight for {kind}: {weight!r}')
+        return mix
+
+    def _seed(self, users, posts, seed):
+        if User.objects.count() == users and Post.objects.count() == posts:
+            self.stdout.write('Reusing the seeded database')
+            return
+        if User.objects.exists():
+            call_command('flush', interactive=False, verbosity=0)
+        started = time.perf_counter()
+        seed_dataset(users, posts, seed)
+        self.stdout.write(f'Seeded {users} users and {posts} posts in {time.perf_counter() - started:.1f}s')
+
+    def _urls(self, rng):
+        # Page sizes as in blog.views and account.views
+        published = Post.objects.filter(status='published').order_by('-created_at', '-id').for_listing()
+        authors = list(User.objects.filter(published_post_count__gt=0).values_list('username', flat=True))
+        profiles = []
+        for username in rng.sample(authors, min(len(authors), 20)):
+            path = reverse('blog:profile', args=[username])
+            profiles.append(path)
+            profiles.append(f'{path}?page=2')
+        searches = []
+        for word in rng.sample(WORDS, 5):
+            searches += _listing_urls(reverse('blog:search'), Post.search(word).for_listing(), 5, RANK_KEYS, q=word)
+        searches += _listing_urls(reverse('blog:search'), published, 5)
+        months = Post.objects.filter(status='published').dates('created_at', 'month')
+        calendar = [
+            f'{reverse("blog:days_with_posts")}?{urlencode({"year": month.year, "month": month.month})}'
+            for month in months
+        ]
+        calendar += [f'{reverse("blog:days_with_posts")}?year={year}' for year in {month.year for month in months}]
+        slugs = list(Post.objects.filter(status='published').order_by('id').values_list('slug', flat=True))
+        return {
+            'index': _listing_urls(reverse('blog:index'), published, 3),
+            'search': searches,
+            'post_detail': [reverse('blog:post_detail', args=[slug]) for slug in rng.sample(slugs, min(len(slugs), 500))],
+            'profile': profiles,
+            'days_with_posts': calendar,
+            'account_profile': [
+                reverse('account:profile'),
+                f'{reverse("account:profile")}?page=2',
+                f'{reverse("account:profile")}?status=draft',
+            ],
+        }
+
+    def _run(self, options, mix):
+        clients = options['clients']
+        rng = random.Random(options['seed'])
+        urls = self._urls(rng)
+        kinds = [kind for kind in mix if mix[kind] > 0 and urls[kind]]
+        if not kinds:
+            raise CommandError('No pages to request')
+        weights = [mix[kind] for kind in kinds]
+        total = options['warmup'] + options['requests']
+        plans = [
+            [(kind, rng.choice(urls[kind])) for kind in rng.choices(kinds, weights, k=total)]
+            for _ in range(clients)
+        ]
+
+        anonymous = [make_client() for _ in range(clients)]
+        members = []
+        # The most prolific authors, whose own post lists are the longest
+        for user in User.objects.order_by('-published_post_count', 'id')[:clients]:
+            member = make_client()
+            member.force_login(user)
+            members.append(member)
+        connection.close()
+
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def hit(client_index, request_index, measured):
+            kind, url = plans[client_index][request_index]
+            client = members[client_index % len(members)] if kind == 'account_profile' else anonymous[client_index]
+            queries = 0
+
+            def count(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            started = time.perf_counter()
+            with connection.execute_wrapper(count):
+                response = client.get(url)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            if measured:
+                with lock:
+                    samples[kind].append((elapsed, queries))
+
+        cache.clear()
+        local_cache.clear()
+        run_concurrent(lambda c, r: hit(c, r, False), clients, options['warmup'])
+        _, elapsed = run_concurrent(lambda c, r: hit(c, r + options['warmup'], True), clients, options['requests'])
+
+        pages = {}
+        for kind in kinds:
+            latencies = [latency for latency, _ in samples[kind]]
+            pages[kind] = summarize(latencies, elapsed)
+            pages[kind]['queries'] = round(sum(queries for _, queries in samples[kind]) / len(samples[kind]), 2) \
+                if samples[kind] else 0.0
+        everything = [sample for kind in kinds for sample in samples[kind]]
+        overall = summarize([latency for latency, _ in everything], elapsed)
+        overall['queries'] = round(sum(queries for _, queries in everything) / len(everything), 2)
+        return overall, pages
+
+    def handle(self, *args, **options):
+        mix = self._mix(options['mix'])
+        users, posts, seed = options['users'], options['posts'], options['seed']
+        if users < 1 or posts < 1 or options['clients'] < 1 or options['requests'] < 1:
+            raise CommandError('--users, --posts, --clients and --requests must be positive')
+
+        # A database of its own, named after the dataset so --keepdb reuses
+        # only a matching one
+        database = connections['default'].settings_dict
+        database['TEST']['NAME'] = f'bench_{database["NAME"]}_u{users}_p{posts}_s{seed}'
+
+        started = datetime.datetime.now(datetime.timezone.utc)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            DEBUG=False,
+            QUERY_INSPECTOR=False,
+            RELATED_POSTS_MODEL_PATH=os.path.join(tmp, 'related_posts.joblib'),
+            **({} if options['page_cache'] else {'PAGE_CACHE_TIMEOUT': 0}),
+        ):
+            old_config = setup_databases(
+                verbosity=0, interactive=False, keepdb=options['keepdb'], serialized_aliases=set(),
+            )
+            try:
+                self._seed(users, posts, seed)
+                overall, pages = self._run(options, mix)
+                postgres = connection.pg_version
+            finally:
+                view_counter.flush()
+                connection.close()
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        results = {
+            'started': started.isoformat(),
+            'revision': _revision(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'postgres': postgres,
+                'cpus': os.cpu_count(),
+                'db_pool': bool(database.get('OPTIONS', {}).get('pool')),
+            },
+            'dataset': {'users': users, 'posts': posts, 'seed': seed},
+            'options': {
+                'clients': options['clients'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'mix': mix,
+                'page_cache': options['page_cache'],
+            },
+            'overall': overall,
+            'pages': pages,
+        }
+
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+            if previous.get('dataset') != results['dataset'] or previous.get('options') != results['options']:
+                self.stdout.write(self.style.WARNING('The earlier run used another dataset or options'))
+
+        self.stdout.write(
+            f"{options['clients']} clients x {options['requests']} requests, "
+            f'{users} users, {posts} posts, seed {seed}'
+        )
+        rows = [('overall', overall, previous and previous.get('overall'))]
+        rows += [(kind, stats, previous and previous.get('pages', {}).get(kind)) for kind, stats in pages.items()]
+        for name, stats, before in rows:
+            before = before or {}
+            self.stdout.write(
+                f"  {name:<16} rps={stats['rps']}{_change(before.get('rps'), stats['rps'])} "
+                f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms{_change(before.get('p95_ms'), stats['p95_ms'])} "
+                f"p99={stats['p99_ms']}ms queries={stats['queries']}{_change(before.get('queries'), stats['queries'])}"
+            )
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'var', 'bench', f'{started:%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Saved results to {output}'))
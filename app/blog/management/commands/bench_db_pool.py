@@ -0,0 +1,90 @@
+import json
+import urllib.request
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import reverse
+from blog.loadtest import describe, run_load, serve
+
+MODES = {
+    'none': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency with new, persistent and pooled database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            action='append',
+            choices=list(MODES),
+            help='Connection mode to measure; repeat for several (default: all)'
+        )
+        parser.add_argument(
+            '--server',
+            choices=['wsgi', 'asgi'],
+            default='wsgi',
+            help='Server interface to run (default: wsgi)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Worker processes (default: 4)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=8,
+            help='Concurrent clients (default: 8)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds of load per mode and page (default: 10)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port the server listens on (default: 8765)'
+        )
+
+    def _server_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM pg_stat_activity '
+                'WHERE datname = current_database() AND pid <> pg_backend_pid()'
+            )
+            return cursor.fetchone()[0]
+
+    def handle(self, *args, **options):
+        pages = {'health': reverse('blog:health_check'), 'index': reverse('blog:index')}
+        port = options['port']
+
+        self.stdout.write(
+            f"{options['server']}, {options['workers']} workers, {options['clients']} clients, "
+            f"{options['duration']:g}s per mode and page"
+        )
+        for mode in options['mode'] or MODES:
+            with serve(options['server'], options['workers'], port, MODES[mode]):
+                for name, path in pages.items():
+                    results = run_load(port, [path], options['clients'], options['duration'])
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{mode} {name}: {describe(results["fast"], options["duration"])}, '
+                        f'{results["errors"]} errors'
+                    ))
+                # Other processes may be connected too; compare across modes
+                line = f'{mode}: {self._server_connections()} database connections open'
+                if mode == 'pool':
+                    url = f'http://127.0.0.1:{port}{reverse("blog:db_pool_stats")}'
+                    stats = json.load(urllib.request.urlopen(url, timeout=5))['pool']
+                    line += (
+                        f'; one worker: {stats["checkouts"]} checkouts, {stats["waits"]} waited '
+                        f'(avg {stats["avg_wait_ms"]:.2f} ms), {stats["timeouts"]} timeouts'
+                    )
+                self.stdout.write(line)
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.test.utils import override_settings
+from django.urls import reverse
+from blog.benchmarking import make_client, run_concurrent, summarize
+from blog.models import Post
+from blog.page_cache import page_cache_stats, reset_page_cache_stats
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Compare anonymous read throughput with and without the page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=16,
+            help='Number of concurrent clients (default: 16)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests per client (default: 100)'
+        )
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        requests_per_client = options['requests']
+
+        post = Post.objects.filter(status='published').select_related('author').order_by('-created_at').first()
+        if post is None:
+            raise CommandError('No published posts to benchmark; create some first')
+
+        urls = [
+            reverse('blog:index'),
+            post.get_absolute_url(),
+            reverse('blog:profile', args=[post.author.username]),
+            reverse('blog:search'),
+        ]
+        client_pool = [make_client() for _ in range(clients)]
+
+        def hit(client_index, request_index):
+            url = urls[(client_index + request_index) % len(urls)]
+            response = client_pool[client_index].get(url)
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+
+        results = {}
+        for mode, timeout in (('uncached', 0), ('cached', None)):
+            settings_override = {} if timeout is None else {'PAGE_CACHE_TIMEOUT': timeout}
+            with override_settings(**settings_override):
+                cache.clear()
+                reset_page_cache_stats()
+                latencies, elapsed = run_concurrent(hit, clients, requests_per_client)
+                results[mode] = summarize(latencies, elapsed)
+                results[mode].update(page_cache_stats())
+
+        self.stdout.write(f'{clients} clients x {requests_per_client} requests over {len(urls)} pages')
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"  {mode:<9} rps={stats['rps']:<8} p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms "
+                f"hits={stats['hits']} misses={stats['misses']}"
+            )
+        if results['uncached']['rps']:
+            speedup = results['cached']['rps'] / results['uncached']['rps']
+            self.stdout.write(f'  speedup: {speedup:.1f}x')
@@ -0,0 +1,60 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from blog.models import Post
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Time Post.save on posts of growing length: views-only, unchanged and edited content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--words',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Post lengths in words (default: 1000 10000 100000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Saves timed per case (default: 50)'
+        )
+
+    def time_ms(self, fn, repeat):
+        started = time.perf_counter()
+        for i in range(repeat):
+            fn(i)
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        author, _ = User.objects.get_or_create(username='bench_post_save')
+        paragraph = 'The quick brown fox jumps over the lazy dog near the river bank. '
+
+        self.stdout.write(f'{"words":>8} {"views-only":>11} {"unchanged":>10} {"edited":>9} {"regex pass":>11}  (ms per save)')
+        try:
+            for words in options['words']:
+                content = paragraph * (words // 13 + 1)
+                post = Post.objects.create(title=f'Save benchmark {words}', content=content, author=author)
+
+                def save_views(i):
+                    post.views += 1
+                    post.save(update_fields=['views'])
+
+                def save_edit(i):
+                    post.content = f'{content} edit {i}'
+                    post.save()
+
+                views_only = self.time_ms(save_views, repeat)
+                unchanged = self.time_ms(lambda i: post.save(), repeat)
+                edited = self.time_ms(save_edit, repeat)
+                regex = self.time_ms(lambda i: re.findall(r'\w+', post.content), repeat)
+                self.stdout.write(f'{words:>8} {views_only:>11.2f} {unchanged:>10.2f} {edited:>9.2f} {regex:>11.2f}')
+        finally:
+            author.delete()
+        self.stdout.write('"regex pass" is what every save used to spend before deriving fields only on change.')
@@ -0,0 +1,69 @@
+import resource
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog import related
+
+class Command(BaseCommand):
+    help = 'Time the related posts build (vectorizing and nearest neighbours) on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=100000,
+            help='Number of synthetic posts (default: 100000)'
+        )
+        parser.add_argument(
+            '--words',
+            type=int,
+            default=400,
+            help='Words per post (default: 400)'
+        )
+        parser.add_argument(
+            '--topics',
+            type=int,
+            default=200,
+            help='Number of topics posts are drawn from (default: 200)'
+        )
+
+    def corpus(self, posts, words, topics, rng):
+        # Zipf-distributed words, half of each post from its topic's own
+        # vocabulary, so neighbours are meaningful
+        vocabulary = np.array([f'w{i:x}' for i in range(60000)])
+        topic_words = rng.integers(0, len(vocabulary), size=(topics, 300))
+        for _ in range(posts):
+            topic = topic_words[rng.integers(topics)]
+            common = rng.zipf(1.3, size=words // 2) % len(vocabulary)
+            own = topic[rng.zipf(1.5, size=words - words // 2) % len(topic)]
+            yield related.document(
+                ' '.join(vocabulary[own[:8]]), ' '.join(vocabulary[own[8:30]]),
+                ' '.join(vocabulary[np.concatenate([common, own])]),
+            )
+
+    def handle(self, *args, **options):
+        posts = options['posts']
+        rng = np.random.default_rng(0)
+        documents = list(self.corpus(posts, options['words'], options['topics'], rng))
+        ids = np.arange(1, posts + 1, dtype=np.int64)
+
+        started = time.perf_counter()
+        embedder = related.Embedder()
+        vectors = embedder.fit_transform(documents)
+        vectorized = time.perf_counter()
+        rows = sum(
+            len(neighbours) for _, neighbours in
+            related.nearest(vectors, ids, [(vectors, ids)], settings.RELATED_POSTS_COUNT)
+        )
+        finished = time.perf_counter()
+
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f'{posts} posts x {options["words"]} words, '
+            f'{len(embedder.vectorizer.vocabulary_)} terms -> {vectors.shape[1]} dimensions'
+        )
+        self.stdout.write(f'  embed      {vectorized - started:.1f}s')
+        self.stdout.write(f'  neighbours {finished - vectorized:.1f}s ({rows} rows, {posts / (finished - vectorized):.0f} posts/s)')
+        self.stdout.write(f'  total      {finished - started:.1f}s, peak RSS {peak_mb:.0f} MB')
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from blog.loadtest import SERVERS, describe, rss_mb, run_load, serve
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Compare gunicorn sync (WSGI) and uvicorn (ASGI) workers under fast and slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Worker processes in both modes, so both use similar memory (default: 4)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=8,
+            help='Concurrent clients sending requests at full speed (default: 8)'
+        )
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=0,
+            help='Extra concurrent clients trickling their requests (default: 0)'
+        )
+        parser.add_argument(
+            '--trickle',
+            type=float,
+            default=1.0,
+            help='Seconds a slow client takes to send its request (default: 1.0)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=20,
+            help='Seconds of load per mode (default: 20)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port the servers listen on (default: 8765)'
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.filter(status='published').order_by('-created_at').first()
+        if post is None:
+            raise CommandError('No published posts; run generate_posts first')
+        paths = [
+            reverse('blog:index'),
+            reverse('blog:search') + '?q=post',
+            post.get_absolute_url(),
+            reverse('blog:days_with_posts') + f'?year={post.created_at.year}',
+        ]
+
+        self.stdout.write(
+            f"{options['workers']} workers, {options['clients']} fast and {options['slow_clients']} slow clients "
+            f"(requests trickled over {options['trickle']}s), {options['duration']:g}s per mode"
+        )
+        for mode in SERVERS:
+            with serve(mode, options['workers'], options['port']) as server:
+                results = run_load(
+                    options['port'], paths, options['clients'], options['duration'],
+                    options['slow_clients'], options['trickle'],
+                )
+                rss = rss_mb(server.pid)
+
+            line = f'{mode}: {describe(results["fast"], options["duration"])}'
+            if options['slow_clients']:
+                line += f', {len(results["slow"]) / options["duration"]:.1f} slow req/s'
+            line += f', {results["errors"]} errors, {rss:.0f} MB RSS'
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from blog.benchmarking import make_client, run_concurrent, summarize
+from blog.models import Post
+from blog.view_counter import view_counter
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Compare per-hit and buffered view counting on a single hot post under concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=16,
+            help='Number of concurrent clients (default: 16)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per client (default: 200)'
+        )
+        parser.add_argument(
+            '--slug',
+            help='Benchmark an existing published post instead of a temporary one'
+        )
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        requests_per_client = options['requests']
+
+        if options['slug']:
+            post = Post.objects.filter(slug=options['slug'], status='published').first()
+            if post is None:
+                raise CommandError(f"No published post with slug {options['slug']}")
+            temporary = None
+        else:
+            author, _ = User.objects.get_or_create(username='bench_view_counter')
+            post = Post.objects.create(
+                title='View counter benchmark',
+                content='Hot post body.',
+                author=author,
+                status='published',
+            )
+            temporary = author
+
+        url = post.get_absolute_url()
+        client_pool = [make_client() for _ in range(clients)]
+
+        def hit(client_index, request_index):
+            response = client_pool[client_index].get(url)
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+
+        try:
+            results = {}
+            for mode, buffered in (('per-hit UPDATE', False), ('buffered', True)):
+                view_counter.buffered = buffered
+                views_before = Post.objects.values_list('views', flat=True).get(pk=post.pk)
+                latencies, elapsed = run_concurrent(hit, clients, requests_per_client)
+                view_counter.flush()
+                views_after = Post.objects.values_list('views', flat=True).get(pk=post.pk)
+                results[mode] = summarize(latencies, elapsed)
+                results[mode]['counted'] = views_after - views_before
+        finally:
+            view_counter.buffered = True
+            if temporary is not None:
+                temporary.delete()
+
+        self.stdout.write(f'{clients} clients x {requests_per_client} requests on {url}')
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"  {mode:<15} rps={stats['rps']:<8} p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms counted={stats['counted']}"
+            )
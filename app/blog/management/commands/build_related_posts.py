@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from blog import related
+
+class Command(BaseCommand):
+    help = 'Fit the related posts model on all published posts and rebuild every list'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows per INSERT (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = related.build(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indexed {count} posts in {time.perf_counter() - started:.1f}s'
+            )
+        )
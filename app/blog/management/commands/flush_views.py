@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog.view_counter import replay_spool
+
+class Command(BaseCommand):
+    help = 'Write post views spooled by exiting workers to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--spool-dir',
+            default=settings.VIEW_COUNTER_SPOOL_DIR,
+            help='Directory holding spooled view counts (default: VIEW_COUNTER_SPOOL_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        written = replay_spool(options['spool_dir'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {written} spooled views')
+        )
@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from blog.images import AVATAR_WIDTHS, FEATURED_WIDTHS, current_variants, delete_variants, generate_variants
+from blog.models import Post
+from account.backends import forget_users
+from account.models import CustomUser
+
+# (model, image field, variants field, widths, square)
+TARGETS = {
+    'post': (Post, 'featured_image', 'featured_image_variants', FEATURED_WIDTHS, False),
+    'avatar': (CustomUser, 'avatar', 'avatar_variants', AVATAR_WIDTHS, True),
+}
+
+
+def _generate(task):
+    # Runs in a worker process: image work only, the parent writes the rows
+    kind, pk, source = task
+    _, _, _, widths, square = TARGETS[kind]
+    try:
+        return kind, pk, source, generate_variants(source, widths, square=square), None
+    except Exception as exc:
+        return kind, pk, source, None, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants of existing featured images and avatars in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help=f'Number of worker processes (default: {os.cpu_count() or 1})'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that are already current'
+        )
+
+    def _tasks(self, force):
+        tasks = []
+        for kind, (model, image_field, variants_field, _, _) in TARGETS.items():
+            rows = model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+            for obj in rows.only(image_field, variants_field).iterator(chunk_size=2000):
+                image = getattr(obj, image_field)
+                if force or current_variants(image, getattr(obj, variants_field)) is None:
+                    tasks.append((kind, obj.pk, image.name))
+        return tasks
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+
+        if workers < 1:
+            self.stdout.write(self.style.ERROR('Workers must be positive'))
+            return
+
+        tasks = self._tasks(options['force'])
+        if not tasks:
+            self.stdout.write(self.style.WARNING('No images need variants'))
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        started = time.perf_counter()
+        generated = failed = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            for kind, pk, source, variants, error in executor.map(_generate, tasks, chunksize=4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'  {kind} {pk} ({source}): {error}')
+                    continue
+                model, image_field, variants_field, _, _ = TARGETS[kind]
+                previous = model.objects.filter(pk=pk).values_list(variants_field, flat=True).first()
+                # Skip rows whose image was replaced meanwhile
+                updated = model.objects.filter(pk=pk, **{image_field: source}).update(
+                    **{variants_field: variants}
+                )
+                if updated:
+                    delete_variants(previous or {}, keep=variants)
+                    if model is CustomUser:
+                        forget_users(pk)
+                    generated += 1
+                else:
+                    delete_variants(variants)
+                if (generated + failed) % 100 == 0:
+                    self.stdout.write(f'  Processed {generated + failed} of {len(tasks)} images...')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generated variants of {generated} images in '
+                f'{time.perf_counter() - started:.1f}s with {workers} workers'
+                + (f' ({failed} failed)' if failed else '')
+            )
+        )
@@ -1,15 +1,24 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from datetime import timedelta
 import random
 import requests
 import os
+import time
 from faker import Faker
 from account.models import CustomUser
-from blog.models import Post
+from blog import datagen
+from blog.caching import invalidate
+from blog.counts import invalidate_counts
+from blog.models import DailyPostCount, Post
+from blog.page_cache import purge_author, purge_listings
 
 class Command(BaseCommand):
-    help = 'Generate 40 posts for each user with themed content using Faker, Markdown, and Picsum Photos images'
+    help = (
+        'Generate 40 posts for each user with themed content using Faker, Markdown, and Picsum Photos images, '
+        'or with --count any number of posts offline and in bulk'
+    )
 
     def __init__(self):
         super().__init__()
@@ -290,8 +299,108 @@ class Command(BaseCommand):
             default=1.0,
             help='Probability of generating featured image for each post (0.0 to 1.0, default: 1.0)'
         )
+        parser.add_argument(
+            '--count',
+            type=int,
+            help='Generate this many posts offline, in bulk, instead of the themed posts of the sample users'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='With --count: spread the posts over the first N users (default: all users)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='With --count: seed of the generated dataset (default: 0)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='With --count: processes generating posts in parallel (default: 1)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='With --count: posts generated and committed together (default: 2000)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='With --count: spread creation dates over this many past days (default: 365)'
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=50,
+            help='With --count: size of the pool of generated featured images (default: 50)'
+        )
+
+    def generate_bulk(self, options):
+        if not settings.BULK_TEST_DATA:
+            raise CommandError('Bulk test data is disabled in these settings; set BULK_TEST_DATA=true to allow it')
+        count, workers, chunk_size = options['count'], options['workers'], options['chunk_size']
+        if count < 1 or workers < 1 or chunk_size < 1 or options['days'] < 1:
+            raise CommandError('--count, --workers, --chunk-size and --days must be positive')
+        if not 0.0 <= options['image_chance'] <= 1.0:
+            raise CommandError('Image chance must be between 0.0 and 1.0')
+
+        authors = list(
+            CustomUser.objects.order_by('id').values_list('id', 'username')[:options['users']]
+        )
+        if not authors:
+            raise CommandError('No users to write the posts; run generate_users --count first')
+        images = []
+        if options['image_chance'] > 0 and options['images'] > 0:
+            images = datagen.image_pool(options['images'], options['seed'])
+        spec = {
+            'seed': options['seed'],
+            'author_ids': [author_id for author_id, _ in authors],
+            'cum_weights': datagen.author_weights(len(authors)),
+            'images': images,
+            'image_chance': options['image_chance'],
+            'end': timezone.now(),
+            'days': options['days'],
+        }
+        if Post.objects.filter(slug=datagen.first_slug(spec)).exists():
+            raise CommandError(f'Posts of seed {options["seed"]} exist already; choose another --seed')
+
+        self.stdout.write(
+            f'Generating {count} posts by {len(authors)} users in chunks of {chunk_size}, '
+            f'{workers} worker(s), {len(images)} images'
+        )
+        started = time.perf_counter()
+        created = 0
+        for _, inserted in datagen.generate_posts(count, spec, chunk_size, workers):
+            created += inserted
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {created}/{count} posts, {created / elapsed:.0f} posts/s')
+
+        # Rollups and caches the signals of single saves would have updated
+        DailyPostCount.rebuild()
+        CustomUser.reconcile_post_stats()
+        invalidate('calendar')
+        invalidate('search')
+        invalidate_counts()
+        purge_listings()
+        for _, username in authors:
+            purge_author(username)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} posts in {time.perf_counter() - started:.1f}s'
+        ))
+        self.stdout.write(self.style.WARNING(
+            'Related posts are not computed; run build_related_posts when generation is done'
+        ))
 
     def handle(self, *args, **options):
+        if options['count'] is not None:
+            return self.generate_bulk(options)
+
         image_chance = options['image_chance']
         
         # Validate image_chance parameter
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from blog.page_cache import page_cache_stats, reset_page_cache_stats
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the anonymous page cache (shared between processes with REDIS_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after showing them'
+        )
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.2%}"
+        )
+        if options['reset']:
+            reset_page_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
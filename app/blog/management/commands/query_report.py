@@ -0,0 +1,95 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Summarize the N+1 patterns and slow queries found by the query inspector'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Only count reports from this many past hours (default: 24)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Entries shown per section (default: 20)'
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the latest EXPLAIN ANALYZE plan of each slow query'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the collected reports afterwards'
+        )
+
+    def _events(self, since):
+        path = settings.QUERY_INSPECTOR_LOG
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A line still being written by another process
+                    continue
+                if event['time'] >= since:
+                    yield event
+
+    def handle(self, *args, **options):
+        since = time.time() - options['hours'] * 3600
+        repeats = {}
+        slow = {}
+        for event in self._events(since):
+            if event['type'] == 'n+1':
+                entry = repeats.setdefault((event['site'], event['fingerprint']), {
+                    'site': event['site'], 'sql': event['sql'], 'requests': 0, 'max': 0, 'labels': set(),
+                })
+                entry['requests'] += 1
+                entry['max'] = max(entry['max'], event['count'])
+                entry['labels'].add(event['label'].split(' ')[0])
+            else:
+                entry = slow.setdefault(event['fingerprint'], {
+                    'sql': event['sql'], 'count': 0, 'total': 0.0, 'max': 0.0, 'sites': set(),
+                })
+                entry['count'] += 1
+                entry['total'] += event['duration_ms']
+                entry['max'] = max(entry['max'], event['duration_ms'])
+                entry['sites'].add(event['site'])
+                entry['plan'] = event['plan']
+
+        if not repeats and not slow:
+            self.stdout.write(self.style.WARNING('No reports found'))
+        else:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'N+1 patterns ({len(repeats)})'))
+            for entry in sorted(repeats.values(), key=lambda e: (-e['requests'], -e['max']))[:options['limit']]:
+                self.stdout.write(
+                    f"{entry['requests']:>5} requests, up to {entry['max']} queries, "
+                    f"from {entry['site']} in {', '.join(sorted(entry['labels']))}"
+                )
+                self.stdout.write(f"      {entry['sql'][:300]}")
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Slow queries ({len(slow)})'))
+            for entry in sorted(slow.values(), key=lambda e: -e['total'])[:options['limit']]:
+                self.stdout.write(
+                    f"{entry['count']:>5} times, avg {entry['total'] / entry['count']:.1f} ms, "
+                    f"max {entry['max']:.1f} ms, from {', '.join(sorted(entry['sites']))}"
+                )
+                self.stdout.write(f"      {entry['sql'][:300]}")
+                if options['plans']:
+                    self.stdout.write('      ' + entry['plan'].replace('\n', '\n      '))
+
+        if options['clear'] and os.path.exists(settings.QUERY_INSPECTOR_LOG):
+            os.remove(settings.QUERY_INSPECTOR_LOG)
+            self.stdout.write(self.style.SUCCESS('Cleared the collected reports'))
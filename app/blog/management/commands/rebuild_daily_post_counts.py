@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from blog.models import DailyPostCount
+
+class Command(BaseCommand):
+    help = 'Recompute the per-day published post counts used by the calendar'
+
+    def handle(self, *args, **options):
+        days = DailyPostCount.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt daily post counts for {days} days')
+        )
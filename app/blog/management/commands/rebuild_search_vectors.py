@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from blog.models import Post
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored search vector of existing posts in primary key chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of primary keys updated per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Only fill posts that have no search vector yet'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        if chunk_size < 1:
+            self.stdout.write(self.style.ERROR('Chunk size must be positive'))
+            return
+
+        bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.WARNING('No posts found'))
+            return
+
+        vector = Post.build_search_vector()
+        updated_count = 0
+        start = bounds['first']
+        while start <= bounds['last']:
+            posts = Post.objects.filter(pk__gte=start, pk__lt=start + chunk_size)
+            if options['only_missing']:
+                posts = posts.filter(search_vector__isnull=True)
+            with transaction.atomic():
+                updated_count += posts.update(search_vector=vector)
+            start += chunk_size
+            self.stdout.write(f'  Updated {updated_count} posts...')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt search vectors of {updated_count} posts '
+                f'(config: {settings.SEARCH_CONFIG})'
+            )
+        )
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.rendering import render_key
+
+class Command(BaseCommand):
+    help = 'Render the stored HTML (and the summary taken from it) of posts whose content or renderer version changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of posts loaded and updated per batch (default: 500)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render every post, even if its stored HTML is current'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        force = options['force']
+
+        if batch_size < 1:
+            self.stdout.write(self.style.ERROR('Batch size must be positive'))
+            return
+
+        posts = Post.objects.only('id', 'content', 'content_html_key', 'excerpt').order_by('pk')
+        # Listings show the summary, which comes from the HTML without an excerpt
+        fields = ['content_html', 'content_html_key', 'summary']
+
+        checked_count = 0
+        rendered_count = 0
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            checked_count += 1
+            if force or post.content_html_key != render_key(post.content):
+                post.refresh_content_html(force=True)
+                post.refresh_summary()
+                batch.append(post)
+
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, fields)
+                rendered_count += len(batch)
+                self.stdout.write(f'  Rendered {rendered_count} posts...')
+                batch = []
+
+        if batch:
+            Post.objects.bulk_update(batch, fields)
+            rendered_count += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked_count} posts, rendered {rendered_count}')
+        )
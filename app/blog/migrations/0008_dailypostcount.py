@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_post_counts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    DailyPostCount = apps.get_model('blog', 'DailyPostCount')
+    counts = Post.objects.filter(status='published').annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(total=Count('id')).order_by()
+    DailyPostCount.objects.bulk_create(
+        [DailyPostCount(day=row['day'], count=row['total']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPostCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.RunPython(fill_daily_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_word_counts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').order_by('pk').iterator(chunk_size=1000):
+        post.word_count = len(re.findall(r'\w+', post.content))
+        post.reading_time = max(1, round(post.word_count / 200))
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['word_count', 'reading_time'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_word_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+import html
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from blog.rendering import render_key, render_markdown
+
+FIELDS = ['summary', 'content_html', 'content_html_key']
+
+
+def fill_summaries(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    posts = Post.objects.only('id', 'excerpt', 'content', 'content_html', 'content_html_key').order_by('pk')
+    for post in posts.iterator(chunk_size=1000):
+        # 0005 adds content_html empty, and render_posts may not have run
+        # yet: render the HTML the summary is taken from where it is stale
+        key = render_key(post.content)
+        if post.content_html_key != key:
+            post.content_html = render_markdown(post.content)
+            post.content_html_key = key
+        text = post.excerpt or html.unescape(strip_tags(post.content_html))
+        post.summary = Truncator(' '.join(text.split())).words(50)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, FIELDS)
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_word_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='summary',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
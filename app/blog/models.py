@@ -1,18 +1,65 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import connection, models, router, transaction
 from django.conf import settings
 from django.utils.text import slugify
+import datetime
+import html
 import math
 import uuid
 from django.contrib.auth.models import User
 from django.urls import reverse
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.db.models.functions import ExtractDay
-from django.db.models import Q
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorExact, SearchVectorField,
+)
+from django.db.models.functions import Cast, Greatest, TruncDate
+from django.db.models import Count, F, FloatField, Q, Value
+from django.db.models.query import ValuesIterable
 from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 
 import markdown
 import re
 
+from .caching import cached, invalidate
+from .images import FEATURED_WIDTHS, delete_variants, generate_variants
+from .rendering import render_markdown, render_key
+
+
+
+class PostRow:
+    """
+    A post as listings show it: no body, no rendered HTML. Rows are built
+    from values() dicts, so they carry no model machinery either.
+    """
+    FIELDS = ('id', 'slug', 'title', 'summary', 'status', 'created_at', 'views', 'reading_time')
+    __slots__ = FIELDS + ('rank',)
+
+    def __init__(self, values):
+        self.rank = None
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f'<PostRow {self.id}: {self.title}>'
+
+
+class PostRowIterable(ValuesIterable):
+    def __iter__(self):
+        for values in super().__iter__():
+            yield PostRow(values)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Project the queryset onto PostRow: only the columns listings show,
+        plus annotations such as a search rank.
+        """
+        queryset = self.values(*PostRow.FIELDS, *self.query.annotations)
+        queryset._iterable_class = PostRowIterable
+        return queryset
 
 
 class Post(models.Model):
@@ -25,6 +72,8 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     featured_image = models.ImageField(upload_to='blog_images/', null=True, blank=True)
     image_caption = models.CharField(max_length=200, blank=True)
+    # Resized copies of featured_image, see blog.images
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     status = models.CharField(
         max_length=10,
         choices=[
@@ -35,71 +84,395 @@ class Post(models.Model):
     )
     views = models.PositiveIntegerField(default=0)
     reading_time = models.PositiveIntegerField(default=0)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    summary = models.TextField(blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    content_html_key = models.CharField(max_length=80, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', '-created_at', '-id'], name='blog_post_status_created'),
+            models.Index(fields=['author', 'status', '-created_at', '-id'], name='blog_post_author_created'),
+            GinIndex(
+                fields=['search_vector'],
+                name='blog_post_search_vector_gin',
+                condition=Q(status='published'),
+            ),
         ]
 
+    # Fields whose last loaded or saved values are remembered, so save() and
+    # signal handlers can tell what a save or delete changed
+    TRACKED_FIELDS = ('status', 'created_at', 'author_id', 'title', 'excerpt', 'content')
+
+    # Derived columns: (source fields, derived fields, method computing them).
+    # save() runs a step only when one of its sources changed.
+    DERIVED_FIELDS = (
+        (('content',), ('word_count', 'reading_time'), 'refresh_word_count'),
+        (('content',), ('content_html', 'content_html_key'), 'refresh_content_html'),
+        (('title', 'excerpt'), ('search_vector',), 'refresh_search_vector'),
+        # After content_html, which it is taken from
+        (('excerpt', 'content'), ('summary',), 'refresh_summary'),
+    )
+
+    WORDS_PER_MINUTE = 200
+    SUMMARY_WORDS = 50
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Also how deferred fields are loaded on access; remember what was read
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._saved_values = {
+            **getattr(self, '_saved_values', {}),
+            **{name: self.__dict__[name] for name in self.TRACKED_FIELDS
+               if (fields is None or name in fields) and name in self.__dict__},
+        }
+
+    def load_previous_values(self, using=None):
+        """
+        Reads the tracked fields that were not loaded (deferred, or a post
+        built with just its pk) from the database. Called before the row is
+        written or deleted, while it still holds the previous values.
+        """
+        saved = getattr(self, '_saved_values', {})
+        missing = [name for name in self.TRACKED_FIELDS if name not in saved]
+        if missing and self.pk is not None:
+            row = Post.objects.using(using).filter(pk=self.pk).values(*missing).first()
+            self._saved_values = {**saved, **(row or {})}
+
+    def previous_values(self, *names):
+        """
+        Returns the values the given tracked fields had in the database before
+        the current save or delete, or None for a post that was never saved.
+        """
+        saved = getattr(self, '_saved_values', {})
+        if not saved:
+            return None
+        return {name: saved[name] if name in saved else getattr(self, name) for name in names}
+
+    def changed_fields(self, *names):
+        """
+        Returns those of the given tracked fields whose value differs from
+        the one last loaded or saved; all of them for a post not saved yet.
+        Deferred fields that were never assigned are unchanged.
+        """
+        saved = getattr(self, '_saved_values', None)
+        if self._state.adding or saved is None:
+            return set(names)
+        return {
+            name for name in names
+            if name in self.__dict__ and (name not in saved or saved[name] != self.__dict__[name])
+        }
+
     def save(self, *args, **kwargs):
+        # The row and the rollups maintained by blog.signals commit together
+        using = kwargs.get('using') or router.db_for_write(Post, instance=self)
+        with transaction.atomic(using=using):
+            self._save(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
         if not self.slug:
             # Generate base slug from title
             base_slug = slugify(self.title)
             # Add a unique suffix using first 8 characters of UUID
             unique_suffix = str(uuid.uuid4())[:8]
             self.slug = f"{base_slug}-{unique_suffix}"
-        
-        # Calculate reading time (assuming average reading speed of 200 words per minute)
-        word_count = len(re.findall(r'\w+', self.content))
-        self.reading_time = max(1, round(word_count / 200))
-        
+
+        # Recompute only the derived columns whose sources changed, and only
+        # from sources being saved; a views-only save never reads the content
+        update_fields = kwargs.get('update_fields')
+        saving = None if update_fields is None else set(update_fields)
+        derived = set()
+        for sources, fields, method in self.DERIVED_FIELDS:
+            if saving is not None:
+                sources = [name for name in sources if name in saving]
+            if self.changed_fields(*sources):
+                getattr(self, method)()
+                derived.update(fields)
+        if saving is not None and derived:
+            kwargs['update_fields'] = saving | derived
+
+        # The signal handlers compare with the previous values of what is saved
+        if saving is None or saving & set(self.TRACKED_FIELDS):
+            self.load_previous_values(kwargs.get('using'))
+
         super().save(*args, **kwargs)
 
+        # The attribute still holds the expression; defer it so the stored
+        # value is loaded on access.
+        if hasattr(self.__dict__.get('search_vector'), 'resolve_expression'):
+            del self.__dict__['search_vector']
+
+        saved_fields = self.TRACKED_FIELDS if update_fields is None else update_fields
+        self._saved_values = {
+            **getattr(self, '_saved_values', {}),
+            **{name: self.__dict__[name] for name in self.TRACKED_FIELDS
+               if name in saved_fields and name in self.__dict__},
+        }
+
+    def refresh_word_count(self):
+        self.word_count = len(re.findall(r'\w+', self.content))
+        self.reading_time = max(1, round(self.word_count / self.WORDS_PER_MINUTE))
+
+    def refresh_summary(self):
+        # What listings show: the excerpt, or the start of the post as text
+        text = self.excerpt or html.unescape(strip_tags(self.content_html))
+        self.summary = Truncator(' '.join(text.split())).words(self.SUMMARY_WORDS)
+
+    def refresh_search_vector(self):
+        # Built in the same INSERT/UPDATE as the row itself
+        self.search_vector = self.build_search_vector(Value(self.title), Value(self.excerpt))
+
+    def refresh_content_html(self, force=False):
+        """
+        Re-render the stored HTML if the content or the renderer changed.
+        Returns True if the HTML was re-rendered.
+        """
+        key = render_key(self.content)
+        if not force and key == self.content_html_key:
+            return False
+        self.content_html = render_markdown(self.content)
+        self.content_html_key = key
+        return True
+
+    def refresh_image_variants(self):
+        """
+        Generate the resized copies of the featured image, replacing those of
+        any previous image.
+        """
+        old = self.featured_image_variants or {}
+        new = generate_variants(self.featured_image.name, FEATURED_WIDTHS) if self.featured_image else {}
+        self.featured_image_variants = new
+        self.save(update_fields=['featured_image_variants', 'updated_at'])
+        delete_variants(old, keep=new)
+
     def get_absolute_url(self):
-        return f'/blog/{self.slug}/'
+        return reverse('blog:post_detail', args=[self.slug])
 
     @property
     def is_draft(self):
         return self.status == 'draft'
 
     def increment_views(self):
+        """
+        Count a view. The database is updated in batches by the view counter,
+        so only this instance reflects the new value right away.
+        """
+        from .view_counter import view_counter
+
+        view_counter.record(self.pk)
         self.views += 1
-        self.save(update_fields=['views'])
+
+    def get_related_posts(self, limit=3):
+        """
+        Returns the most similar published posts, precomputed by blog.related.
+        """
+        return Post.objects.filter(
+            related_to__post=self, status='published'
+        ).order_by('related_to__rank').only(
+            'title', 'slug', 'created_at', 'featured_image'
+        )[:limit]
+
+    @staticmethod
+    def _days_in_month(year, month):
+        start = datetime.date(year, month, 1)
+        end = datetime.date(year + month // 12, month % 12 + 1, 1)
+        return DailyPostCount.objects.filter(
+            day__gte=start, day__lt=end, count__gt=0
+        ).values_list('day', flat=True)
+
+    @staticmethod
+    def _days_in_year(year):
+        return DailyPostCount.objects.filter(
+            day__year=year, count__gt=0
+        ).order_by('day').values_list('day', flat=True)
+
+    @staticmethod
+    def _group_by_month(days):
+        months = {}
+        for day in days:
+            months.setdefault(day.month, []).append(day.day)
+        return months
 
     @classmethod
+    @cached('calendar')
     def get_days_with_posts(cls, year, month):
         """
         Returns a set of days in the given month that have published posts.
         """
-        # Get all days in the month that have published posts
-        days_with_posts = cls.objects.filter(
-            status='published',
-            created_at__year=year,
-            created_at__month=month
-        ).annotate(
-            day=ExtractDay('created_at')
-        ).values_list('day', flat=True).distinct()
-        
-        return set(days_with_posts)
+        return {day.day for day in cls._days_in_month(year, month)}
+
+    @classmethod
+    async def aget_days_with_posts(cls, year, month):
+        return await sync_to_async(cls.get_days_with_posts)(year, month)
+
+    @classmethod
+    @cached('calendar')
+    def get_days_with_posts_in_year(cls, year):
+        """
+        Returns {month: sorted days} for the months of the given year that
+        have published posts.
+        """
+        return cls._group_by_month(cls._days_in_year(year))
+
+    @classmethod
+    async def aget_days_with_posts_in_year(cls, year):
+        return await sync_to_async(cls.get_days_with_posts_in_year)(year)
+
+    @staticmethod
+    def build_search_vector(title='title', excerpt='excerpt', config=None):
+        """
+        Returns the weighted search vector expression: title 'A', excerpt 'B'.
+        """
+        config = config or settings.SEARCH_CONFIG
+        return SearchVector(title, weight='A', config=config) + \
+               SearchVector(excerpt, weight='B', config=config)
 
     @classmethod
-    def search(cls, query):
+    def search(cls, query, config=None):
         """
-        Search posts using PostgreSQL full-text search.
+        Search published posts using PostgreSQL full-text search.
         Searches in title and excerpt fields.
+
+        With the default configuration (settings.SEARCH_CONFIG) this matches
+        against the stored, GIN-indexed search_vector; any other configuration
+        builds the vector at query time and cannot use the index.
+        """
+        config = config or settings.SEARCH_CONFIG
+        search_query = SearchQuery(query, config=config)
+
+        if config == settings.SEARCH_CONFIG:
+            search_vector = F('search_vector')
+        else:
+            search_vector = cls.build_search_vector(config=config)
+        # Matched as an expression, so that no annotation but the rank reaches
+        # for_listing()
+        posts = cls.objects.filter(status='published').filter(SearchVectorExact(search_vector, search_query))
+
+        # ts_rank returns a real; cast it so keyset cursors compare exactly
+        return posts.annotate(
+            rank=Cast(SearchRank(search_vector, search_query), FloatField())
+        ).order_by('-rank', '-id')
+
+
+class RelatedPost(models.Model):
+    """
+    One of a post's nearest neighbours by content similarity, in rank order.
+    Rows are written by blog.related.
+    """
+    # Indexed by the (post, rank) constraint below
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries', db_index=False)
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            # Also the index post_detail reads a post's neighbours through
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_post_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
+
+
+class DailyPostCount(models.Model):
+    """
+    Number of published posts per calendar day (in TIME_ZONE), kept current
+    by blog.signals so the calendar never scans the posts table.
+    """
+    day = models.DateField(unique=True)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f'{self.day}: {self.count}'
+
+    @staticmethod
+    def day_of(status, created_at):
+        """
+        Returns the calendar day a post counts towards, or None if it does not.
+        """
+        if status != 'published' or created_at is None:
+            return None
+        return timezone.localdate(created_at)
+
+    @classmethod
+    def adjust(cls, day, delta):
+        """
+        Add delta published posts to the given day.
+        """
+        if day is None or not delta:
+            return
+        if delta < 0:
+            cls.objects.filter(day=day).update(
+                count=Greatest(F('count') + delta, 0),
+                updated_at=timezone.now(),
+            )
+            return
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (day, count, updated_at) VALUES (%s, %s, %s) '
+                f'ON CONFLICT (day) DO UPDATE SET count = {table}.count + EXCLUDED.count, '
+                f'updated_at = EXCLUDED.updated_at',
+                [day, delta, timezone.now()],
+            )
+
+    @classmethod
+    def record_change(cls, before, after):
+        """
+        Move a post's contribution from the day of `before` to the day of
+        `after`; each is a (status, created_at) pair or None.
         """
+        old_day = cls.day_of(*before) if before else None
+        new_day = cls.day_of(*after) if after else None
+        if old_day == new_day:
+            cls.touch(new_day)
+            return
+        cls.adjust(old_day, -1)
+        cls.adjust(new_day, 1)
 
-        search_vector = SearchVector('title', weight='A') + \
-                       SearchVector('excerpt', weight='B')
-        search_query = SearchQuery(query)
+    @classmethod
+    def touch(cls, day):
+        """
+        Mark a day as changed without changing its count, so listing
+        validators notice edits of published posts.
+        """
+        if day is not None:
+            cls.objects.filter(day=day).update(updated_at=timezone.now())
 
-        return cls.objects.annotate(
-            rank=SearchRank(search_vector, search_query)
-        ).filter(
-            rank__gt=0
-        ).order_by('-rank')
\ No newline at end of file
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute every day from the posts table. Returns the number of days.
+        """
+        counts = Post.objects.filter(status='published').annotate(
+            day=TruncDate('created_at')
+        ).values('day').annotate(total=Count('id')).order_by()
+        rows = [cls(day=row['day'], count=row['total']) for row in counts]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        invalidate('calendar')
+        return len(rows)
@@ -0,0 +1,201 @@
+"""
+Full-page cache for anonymous visitors.
+
+Pages are stored under keys built from the view, a scope (post slug,
+username) and the query string, so that when a post or an author changes
+blog.signals deletes exactly the pages that show it: the post page, the
+author's profile pages and the page-numbered listing pages. Pages that only
+mention a post in passing (related posts, cursor pages, search results)
+expire after PAGE_CACHE_TIMEOUT.
+
+Purges also hold replica reads for a while (see app.db_router), so that the
+pages are rebuilt from the primary.
+
+Only requests without a session cookie are served from the cache: such a
+visitor cannot be logged in and has no messages waiting in a session. A
+response is not stored when it sets cookies, uses the CSRF token or queues
+messages, since none of those may be shared between visitors.
+
+Async views get an async wrapper whose cache round trips run in one
+sync_to_async call each, like the view's own queries.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from app.db_router import hold_replica_reads
+
+STATS_KEYS = {'hits': 'page:stats:hits', 'misses': 'page:stats:misses'}
+
+
+def page_key(view_name, scope='', query=''):
+    digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    return f'page:{view_name}:{scope}:{digest}'
+
+
+def _normalized_query(querydict):
+    return urlencode(sorted(querydict.lists()), doseq=True)
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not set yet (or evicted); a lost increment under a race is fine
+        cache.add(key, 1, timeout=None)
+
+
+def page_cache_stats():
+    """
+    Returns {'hits', 'misses', 'hit_ratio'} counted since the last reset.
+    """
+    values = cache.get_many(STATS_KEYS.values())
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else 0.0
+    return stats
+
+
+def reset_page_cache_stats():
+    cache.delete_many(STATS_KEYS.values())
+
+
+def _cacheable_request(request):
+    return (
+        settings.PAGE_CACHE_TIMEOUT > 0
+        and request.method == 'GET'
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not getattr(getattr(request, '_messages', None), 'added_new', False)
+    )
+
+
+def _lookup(key, on_hit):
+    entry = cache.get(key)
+    _count('misses' if entry is None else 'hits')
+    if entry is not None and on_hit:
+        on_hit(entry[2])
+    return entry
+
+
+def _store(key, request, response):
+    if _cacheable_response(request, response):
+        entry = (dict(response.items()), response.content, getattr(response, 'page_cache_meta', None))
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+
+def _cached_response(request, entry):
+    headers, content, _ = entry
+    response = HttpResponse(content, headers=headers)
+    last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+    return get_conditional_response(
+        request, etag=response.get('ETag'), last_modified=last_modified, response=response
+    )
+
+
+def cache_anonymous_page(view_name, scope=None, on_hit=None):
+    """
+    Decorator caching a view's page for anonymous visitors.
+
+    scope(*args, **kwargs) returns the key part purges target (a slug or a
+    username). on_hit(meta) runs for every page served from the cache, for
+    side effects the view would have had (counting a view); meta is what the
+    view set as response.page_cache_meta when the page was stored.
+    Apply it outside conditional_page so that hits need no query at all.
+    """
+    def request_key(request, args, kwargs):
+        return page_key(
+            view_name,
+            scope(*args, **kwargs) if scope else '',
+            _normalized_query(request.GET),
+        )
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _cacheable_request(request):
+                    return await view(request, *args, **kwargs)
+
+                key = request_key(request, args, kwargs)
+                entry = await sync_to_async(_lookup)(key, on_hit)
+                if entry is not None:
+                    return _cached_response(request, entry)
+
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(_store)(key, request, response)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = request_key(request, args, kwargs)
+            entry = _lookup(key, on_hit)
+            if entry is not None:
+                return _cached_response(request, entry)
+
+            response = view(request, *args, **kwargs)
+            _store(key, request, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def _listing_keys(view_name, scope=''):
+    queries = [''] + [f'page={n}' for n in range(1, settings.PAGINATION_MAX_PAGE_NUMBER + 1)]
+    return [page_key(view_name, scope, query) for query in queries]
+
+
+def purge_post(slug, username):
+    """
+    Deletes the cached pages showing a post: its own page, its author's
+    profile pages and the page-numbered pages of the index and of search.
+    """
+    hold_replica_reads()
+    cache.delete_many([
+        page_key('post_detail', slug),
+        *_listing_keys('profile', username),
+        *_listing_keys('index'),
+        *_listing_keys('search'),
+    ])
+
+
+def purge_listings():
+    """
+    Deletes the page-numbered pages of the index and of search, which any
+    newly published post may appear on.
+    """
+    hold_replica_reads()
+    cache.delete_many([*_listing_keys('index'), *_listing_keys('search')])
+
+
+def purge_author(username, slugs=()):
+    """
+    Deletes the cached pages showing an author: their profile pages and the
+    pages of the given posts.
+    """
+    hold_replica_reads()
+    cache.delete_many([
+        *_listing_keys('profile', username),
+        *[page_key('post_detail', slug) for slug in slugs],
+    ])
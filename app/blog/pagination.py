@@ -0,0 +1,228 @@
+"""
+Pagination for post listings.
+
+The first PAGINATION_MAX_PAGE_NUMBER pages are linked with ?page=N and served
+by Django's Paginator. From there on, links carry an opaque ?cursor= token and
+pages are fetched by keyset on the listing's ordering columns, e.g.
+``WHERE (created_at, id) < (...) ORDER BY created_at DESC, id DESC LIMIT n``,
+so a deep page costs the same as the first one.
+
+Every page returned by paginate() has next_page/previous_page (page numbers)
+and next_cursor/previous_cursor (tokens); at most one of each pair is set, so
+templates can build links with {% querystring page=... cursor=... %}.
+Page-number pages use CachedCountPaginator, whose count may be an estimate
+(paginator.is_estimate) on large listings.
+"""
+from collections.abc import Sequence
+from datetime import datetime
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .caching import aget_or_compute
+from .counts import cached_count
+
+CURSOR_SALT = 'blog.pagination.cursor'
+
+# Keyset columns, all ordered descending, with the parser used to decode
+# each value from a cursor token.
+DATE_KEYS = (('created_at', datetime.fromisoformat), ('id', int))
+RANK_KEYS = (('rank', float), ('id', int))
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _row_value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose count comes from blog.counts: cached, and estimated by
+    the planner above COUNT_ESTIMATE_THRESHOLD rows.
+    """
+    is_estimate = False
+
+    @cached_property
+    def count(self):
+        count, self.is_estimate = cached_count(self.object_list)
+        return count
+
+    def exact(self):
+        """
+        A paginator over the same rows with their exact count, for when the
+        estimate promised pages past the last row.
+        """
+        paginator = CachedCountPaginator(
+            self.object_list, self.per_page, self.orphans, self.allow_empty_first_page,
+        )
+        paginator.count = self.object_list.count()
+        return paginator
+
+
+class CursorPage(Sequence):
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_page = None
+        self.previous_page = None
+        self.next_cursor = paginator.cursor_after(object_list[-1]) if has_next and object_list else None
+        self.previous_cursor = paginator.cursor_before(object_list[0]) if has_previous and object_list else None
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over a queryset ordered descending by `keys`.
+    """
+
+    def __init__(self, object_list, per_page, keys=DATE_KEYS):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def _cursor(self, row, direction):
+        values = [_encode_value(_row_value(row, name)) for name, _ in self.keys]
+        return signing.dumps({'k': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def cursor_after(self, row):
+        return self._cursor(row, 'n')
+
+    def cursor_before(self, row):
+        return self._cursor(row, 'p')
+
+    def decode(self, token):
+        try:
+            data = signing.loads(token, salt=CURSOR_SALT)
+            values = [parse(value) for (_, parse), value in zip(self.keys, data['k'], strict=True)]
+            backwards = {'n': False, 'p': True}[data['d']]
+        except (signing.BadSignature, KeyError, TypeError, ValueError) as e:
+            raise InvalidCursor(str(e)) from e
+        return values, backwards
+
+    def _beyond(self, values, backwards):
+        # (k1, k2, ...) < (v1, v2, ...) expanded for the ORM. The redundant
+        # k1 <= v1 bound gives PostgreSQL an index range to start from.
+        lookup = 'gt' if backwards else 'lt'
+        condition = Q()
+        for i, (name, _) in enumerate(self.keys):
+            equal = {key: value for (key, _), value in zip(self.keys[:i], values[:i])}
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+        return Q(**{f'{self.keys[0][0]}__{lookup}e': values[0]}) & condition
+
+    def page(self, token):
+        values, backwards = self.decode(token)
+        prefix = '' if backwards else '-'
+        queryset = self.object_list.filter(self._beyond(values, backwards)).order_by(
+            *[f'{prefix}{name}' for name, _ in self.keys]
+        )
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=more)
+        return CursorPage(rows, self, has_next=more, has_previous=True)
+
+
+def paginate(request, queryset, per_page, keys=DATE_KEYS):
+    """
+    Returns the page requested by ?cursor= or ?page= for a queryset ordered
+    descending by `keys`.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            return CursorPaginator(queryset, per_page, keys).page(cursor)
+        except InvalidCursor:
+            pass
+
+    paginator = CachedCountPaginator(queryset, per_page)
+    page = paginator.get_page(request.GET.get('page'))
+    if paginator.is_estimate and not page.object_list:
+        # An overestimate let the number pass: serve the last real page
+        page = paginator.exact().get_page(page.number)
+    page.next_page = page.next_page_number() if page.has_next() else None
+    page.previous_page = page.previous_page_number() if page.has_previous() else None
+    page.next_cursor = None
+    page.previous_cursor = None
+    if page.next_page and page.number >= settings.PAGINATION_MAX_PAGE_NUMBER and page.object_list:
+        page.next_page = None
+        page.next_cursor = CursorPaginator(queryset, per_page, keys).cursor_after(page[-1])
+    return page
+
+
+class PaginatorSummary:
+    """
+    What templates read from a page's paginator, without its queryset, so
+    that the page can be pickled into a cache.
+    """
+
+    def __init__(self, paginator):
+        self.per_page = paginator.per_page
+        if isinstance(paginator, Paginator):
+            self.count = paginator.count
+            self.num_pages = paginator.num_pages
+            self.is_estimate = getattr(paginator, 'is_estimate', False)
+
+
+def _fetched_page(request, queryset, per_page, keys):
+    page = paginate(request, queryset, per_page, keys)
+    page.object_list = list(page.object_list)
+    return page
+
+
+def _summarized_page(request, queryset, per_page, keys):
+    page = _fetched_page(request, queryset, per_page, keys)
+    page.paginator = PaginatorSummary(page.paginator)
+    return page
+
+
+async def apaginate(request, queryset, per_page, keys=DATE_KEYS):
+    """
+    paginate() for async views. The count and the rows are fetched in one
+    sync_to_async call (Paginator is synchronous), so the page needs no
+    query once returned.
+    """
+    return await sync_to_async(_fetched_page)(request, queryset, per_page, keys)
+
+
+async def acached_page(namespace, request, queryset, per_page, keys=DATE_KEYS):
+    """
+    apaginate() through blog.caching, shared by every visitor asking for
+    the same query string; the queryset must depend on nothing else.
+    """
+    key = urlencode(sorted(request.GET.lists()), doseq=True)
+    return await aget_or_compute(
+        namespace, key, lambda: _summarized_page(request, queryset, per_page, keys)
+    )
@@ -0,0 +1,256 @@
+"""
+Related posts by content similarity.
+
+build() fits a TF-IDF model over the title, excerpt and content of every
+published post, reduces it to RELATED_POSTS_DIMENSIONS with a truncated SVD
+(latent semantic analysis), stores each post's RELATED_POSTS_COUNT nearest
+neighbours by cosine similarity in RelatedPost, and saves the fitted model
+to RELATED_POSTS_MODEL_PATH. post_detail then reads a post's neighbours with a
+single indexed query.
+
+Between builds, refresh() keeps the table current as posts are published,
+edited or unpublished. Changed posts are vectorized with the saved
+vocabulary and compared with the saved vectors plus those of posts changed
+since the build; the lists of the posts most similar to them, and of those
+that listed them, are recomputed too. Posts no longer published are left
+out. The saved vectors are memory-mapped, so workers share one copy.
+Rebuild periodically (``manage.py build_related_posts``) to pick up new
+vocabulary; a refresh rebuilds by itself once more than
+RELATED_POSTS_REFRESH_LIMIT posts changed since the build, since it
+re-embeds all of them.
+"""
+import os
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from .models import Post, RelatedPost
+
+# Title words count three times, excerpt words twice
+TITLE_WEIGHT = 3
+EXCERPT_WEIGHT = 2
+
+# Similarity scores held in memory at once (float32), bounding the rows
+# of the query x posts matrix computed per step
+SIMILARITY_BLOCK = 2 ** 24
+
+# Besides the changed posts, refresh() recomputes this many of their most
+# similar posts, whose lists the changed posts may now enter
+REFRESH_NEIGHBOURS = 20
+
+
+def document(title, excerpt, content):
+    return ' '.join([title] * TITLE_WEIGHT + [excerpt] * EXCERPT_WEIGHT + [content])
+
+
+class Embedder:
+    """
+    TF-IDF followed by a truncated SVD, producing L2-normalized dense
+    vectors whose dot product is the cosine similarity. Corpora too small
+    for the SVD keep the TF-IDF vectors.
+    """
+
+    def __init__(self):
+        self.vectorizer = TfidfVectorizer(
+            stop_words='english',
+            sublinear_tf=True,
+            max_features=settings.RELATED_POSTS_MAX_FEATURES,
+            dtype=np.float32,
+        )
+        self.svd = None
+
+    def fit_transform(self, documents):
+        tfidf = self.vectorizer.fit_transform(documents)
+        dimensions = settings.RELATED_POSTS_DIMENSIONS
+        if min(tfidf.shape) > dimensions:
+            self.svd = TruncatedSVD(dimensions, algorithm='randomized', random_state=0)
+            return self._normalized(self.svd.fit_transform(tfidf))
+        return self._normalized(tfidf.toarray())
+
+    def transform(self, documents):
+        documents = list(documents)
+        if not documents:
+            dimensions = self.svd.n_components if self.svd else len(self.vectorizer.vocabulary_)
+            return np.zeros((0, dimensions), dtype=np.float32)
+        tfidf = self.vectorizer.transform(documents)
+        return self._normalized(self.svd.transform(tfidf) if self.svd else tfidf.toarray())
+
+    @staticmethod
+    def _normalized(vectors):
+        return normalize(vectors).astype(np.float32, copy=False)
+
+
+def nearest(queries, query_ids, blocks, k, skip=None):
+    """
+    Yields (query_id, [(id, score), ...]) with the k posts most similar to
+    each row of `queries`, best first, leaving out the query itself and
+    unrelated (non-positive score) posts. Candidates come from `blocks`, a
+    list of (vectors, ids), and columns set in the boolean `skip` mask over
+    their concatenated ids are ignored. The candidate arrays are only read,
+    never copied.
+    """
+    ids = np.concatenate([block_ids for _, block_ids in blocks])
+    if not len(ids):
+        for query_id in query_ids.tolist():
+            yield query_id, []
+        return
+    position = {post_id: i for i, post_id in enumerate(ids.tolist())}
+    top = min(k, len(ids))
+    step = max(1, SIMILARITY_BLOCK // len(ids))
+    for start in range(0, len(query_ids), step):
+        chunk_ids = query_ids[start:start + step].tolist()
+        scores = np.hstack([queries[start:start + step] @ vectors.T for vectors, _ in blocks])
+        if skip is not None:
+            scores[:, skip] = 0
+        for row, query_id in enumerate(chunk_ids):
+            if query_id in position:
+                scores[row, position[query_id]] = 0
+        best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for row, query_id in enumerate(chunk_ids):
+            yield query_id, [
+                (int(ids[i]), float(score))
+                for i, score in zip(best[row].tolist(), best_scores[row].tolist()) if score > 0
+            ]
+
+
+def _rows(neighbours):
+    return [
+        RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+        for post_id, related in neighbours
+        for rank, (related_id, score) in enumerate(related)
+    ]
+
+
+def _published_documents(queryset, ids):
+    # Streams documents into the vectorizer, collecting the ids alongside
+    rows = queryset.filter(status='published').order_by('pk').values_list(
+        'pk', 'title', 'excerpt', 'content'
+    )
+    for pk, title, excerpt, content in rows.iterator(chunk_size=2000):
+        ids.append(pk)
+        yield document(title, excerpt, content)
+
+
+@dataclass
+class RelatedModel:
+    embedder: Embedder
+    ids: np.ndarray
+    vectors: np.ndarray
+    built_at: object
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+
+
+_loaded = {}
+
+
+def load_model(path=None):
+    """
+    Returns the saved RelatedModel, or None before the first build. The
+    model is reloaded when the file changes.
+    """
+    path = path or settings.RELATED_POSTS_MODEL_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _loaded.get('key') != (path, mtime):
+        _loaded.update(key=(path, mtime), model=joblib.load(path, mmap_mode='r'))
+    return _loaded['model']
+
+
+def build(batch_size=5000):
+    """
+    Fit the model on all published posts and replace every stored list.
+    Returns the number of posts indexed.
+    """
+    built_at = timezone.now()
+    ids = []
+    embedder = Embedder()
+    try:
+        vectors = embedder.fit_transform(_published_documents(Post.objects.all(), ids))
+    except ValueError:
+        # No posts, or nothing but stop words
+        with transaction.atomic():
+            RelatedPost.objects.all().delete()
+        return 0
+    ids = np.array(ids, dtype=np.int64)
+
+    rows = _rows(nearest(vectors, ids, [(vectors, ids)], settings.RELATED_POSTS_COUNT))
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        RelatedPost.objects.bulk_create(rows, batch_size=batch_size)
+
+    RelatedModel(embedder, ids, vectors, built_at).save(settings.RELATED_POSTS_MODEL_PATH)
+    return len(ids)
+
+
+def refresh(post_ids):
+    """
+    Recompute the lists affected by changes to the given posts. Does
+    nothing before the first build.
+    """
+    model = load_model()
+    if model is None:
+        return
+
+    limit = settings.RELATED_POSTS_REFRESH_LIMIT
+    changed = Post.objects.filter(pk__in=post_ids) | Post.objects.filter(updated_at__gte=model.built_at)
+    changed_ids = list(changed.order_by().values_list('pk', flat=True)[:limit + 1])
+    if len(changed_ids) > limit:
+        build()
+        return
+
+    # Current vectors: the saved ones of posts still published and unchanged
+    # since the build, and the changed posts as they are now
+    fresh_ids = []
+    fresh_vectors = model.embedder.transform(_published_documents(Post.objects.filter(pk__in=changed_ids), fresh_ids))
+    fresh_ids = np.array(fresh_ids, dtype=np.int64)
+    published = np.fromiter(
+        Post.objects.filter(status='published').values_list('pk', flat=True).iterator(chunk_size=10000),
+        dtype=np.int64,
+    )
+    stale = ~np.isin(model.ids, published) | np.isin(model.ids, np.array(changed_ids, dtype=np.int64))
+    blocks = [(model.vectors, model.ids), (fresh_vectors, fresh_ids)]
+    skip = np.concatenate([stale, np.zeros(len(fresh_ids), dtype=bool)])
+
+    def current_vectors(wanted):
+        base = {post_id: i for i, post_id in enumerate(model.ids.tolist()) if not stale[i]}
+        fresh = {post_id: i for i, post_id in enumerate(fresh_ids.tolist())}
+        wanted = [post_id for post_id in wanted if post_id in base or post_id in fresh]
+        vectors = np.zeros((len(wanted), model.vectors.shape[1]), dtype=np.float32)
+        for row, post_id in enumerate(wanted):
+            vectors[row] = fresh_vectors[fresh[post_id]] if post_id in fresh else model.vectors[base[post_id]]
+        return vectors, np.array(wanted, dtype=np.int64)
+
+    # The changed posts, the posts most similar to them and the posts that
+    # listed them
+    target_vectors, target_ids = current_vectors(post_ids)
+    affected = set(target_ids.tolist())
+    affected.update(
+        RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True)
+    )
+    for _, related in nearest(target_vectors, target_ids, blocks, REFRESH_NEIGHBOURS, skip):
+        affected.update(related_id for related_id, _ in related)
+
+    affected_vectors, affected_ids = current_vectors(sorted(affected))
+    rows = _rows(nearest(affected_vectors, affected_ids, blocks, settings.RELATED_POSTS_COUNT, skip))
+
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=[*affected, *post_ids]).delete()
+        RelatedPost.objects.bulk_create(rows)
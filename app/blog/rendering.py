@@ -0,0 +1,46 @@
+"""
+Markdown rendering for post content.
+
+Rendered HTML is stored on the Post together with a render key made of
+RENDERER_VERSION and a hash of the source, so a post is rendered once per
+edit instead of once per view. Bump RENDERER_VERSION whenever the extensions
+or their configuration change, then run ``manage.py render_posts``.
+"""
+import hashlib
+import threading
+
+import markdown
+
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite']
+RENDERER_VERSION = '1'
+
+_local = threading.local()
+
+
+def _get_renderer():
+    # Building a Markdown instance loads every extension (and Pygments for
+    # codehilite), so keep one per thread and reset it between documents.
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        _local.renderer = renderer
+    return renderer
+
+
+def render_markdown(text):
+    """
+    Render Markdown source to HTML.
+    """
+    renderer = _get_renderer()
+    try:
+        return renderer.convert(text or '')
+    finally:
+        renderer.reset()
+
+
+def render_key(text):
+    """
+    Returns the key identifying the HTML rendered from the given source.
+    """
+    digest = hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+    return f'{RENDERER_VERSION}:{digest}'
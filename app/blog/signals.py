@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from .caching import invalidate
+from .counts import invalidate_counts
+from .images import current_variants
+from .models import DailyPostCount, Post, RelatedPost
+from .page_cache import purge_author, purge_post
+
+User = get_user_model()
+
+
+def _calendar_state(values):
+    return (values['status'], values['created_at']) if values else None
+
+
+def _published_state(values):
+    if not values or values['status'] != 'published':
+        return None
+    return (values['author_id'], values['created_at'])
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields, **kwargs):
+    invalidate_counts()
+
+    # Any change but a view count can alter a listing, so let the rollup see it
+    if update_fields is None or set(update_fields) - {'views'}:
+        before = None if created else instance.previous_values(
+            'status', 'created_at', 'author_id', 'title', 'excerpt', 'content'
+        )
+        DailyPostCount.record_change(
+            _calendar_state(before), (instance.status, instance.created_at)
+        )
+        User.record_published_change(
+            _published_state(before),
+            _published_state({'status': instance.status, 'author_id': instance.author_id,
+                              'created_at': instance.created_at}),
+        )
+        _purge_pages(instance, before)
+        _invalidate_cached_listings()
+        if _similarity_changed(instance, before):
+            # A refresh of the post still waiting will see this edit too
+            _refresh_related([instance.pk], key=f'related:{instance.pk}')
+        if instance.featured_image and not current_variants(
+            instance.featured_image, instance.featured_image_variants
+        ):
+            # A new image, whether from the site, the admin or a script
+            enqueue('blog.image_variants', {'post_id': instance.pk}, key=f'image-variants:post:{instance.pk}')
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, using, **kwargs):
+    # post_deleted needs what the row held, gone by then
+    instance.load_previous_values(using)
+    deferred = instance.get_deferred_fields() & {'slug', 'author_id'}
+    if deferred:
+        instance.refresh_from_db(using=using, fields=deferred)
+    # Rows listing the post disappear with it; remember whose lists to refill
+    instance._listed_by = list(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_counts()
+
+    before = instance.previous_values('status', 'created_at', 'author_id')
+    DailyPostCount.record_change(_calendar_state(before), None)
+    User.record_published_change(_published_state(before), None)
+    _purge_pages(instance, before)
+    _invalidate_cached_listings()
+    if getattr(instance, '_listed_by', None):
+        _refresh_related([instance.pk, *instance._listed_by])
+
+
+def _similarity_changed(post, before):
+    if before is None:
+        return post.status == 'published'
+    if 'published' not in (post.status, before['status']):
+        return False
+    return any(before[name] != getattr(post, name) for name in ('status', 'title', 'excerpt', 'content'))
+
+
+def _refresh_related(post_ids, key=None):
+    # Queued in the same transaction as the change
+    enqueue('blog.refresh_related', {'post_ids': post_ids}, key=key)
+
+
+def _purge_pages(post, before):
+    # Purge after commit, or a concurrent request could cache the old page again
+    usernames = {post.author.username}
+    if before and before['author_id'] != post.author_id:
+        usernames.update(User.objects.filter(pk=before['author_id']).values_list('username', flat=True))
+    slug = post.slug
+
+    def purge():
+        for username in usernames:
+            purge_post(slug, username)
+    transaction.on_commit(purge)
+
+
+def _invalidate_cached_listings():
+    # After commit, like _purge_pages
+    def invalidate_all():
+        invalidate('calendar')
+        invalidate('search')
+    transaction.on_commit(invalidate_all)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    # Logging in only touches last_login, which no page shows
+    if created or update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    slugs = list(instance.blog_posts.filter(status='published').values_list('slug', flat=True))
+    username = instance.username
+    transaction.on_commit(lambda: purge_author(username, slugs))
@@ -0,0 +1,23 @@
+"""
+Background job handlers of the blog (see jobs.queue).
+"""
+from jobs.queue import handler
+
+from .images import current_variants
+from .models import Post
+
+
+@handler('blog.refresh_related')
+def refresh_related(post_ids):
+    from .related import refresh
+
+    refresh(post_ids)
+
+
+@handler('blog.image_variants')
+def image_variants(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    # Already done by an earlier attempt or the backfill command
+    if post is None or current_variants(post.featured_image, post.featured_image_variants):
+        return
+    post.refresh_image_variants()
@@ -1,4 +1,8 @@
 from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from blog.images import current_variants
 
 register = template.Library()
 
@@ -8,4 +12,33 @@ def split(value, arg):
     Returns the string split by arg.
     Usage: {{ value|split:"," }}
     """
-    return value.split(arg) 
\ No newline at end of file
+    return value.split(arg) 
+
+def _srcset(entries):
+    return ', '.join(f'{default_storage.url(name)} {width}w' for name, width, _ in entries)
+
+
+@register.simple_tag
+def responsive_image(image, variants, sizes, alt='', css_class='', loading='lazy'):
+    """
+    Returns a <picture> offering the WebP and JPEG variants of an image, or
+    a plain <img> of the original while it has none.
+    Usage: {% responsive_image post.featured_image post.featured_image_variants "800px" alt=post.title %}
+    """
+    variants = current_variants(image, variants)
+    if variants is None:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            image.url, alt, css_class, loading,
+        )
+    name, width, height = variants['jpeg'][-1]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'loading="{}" decoding="async">'
+        '</picture>',
+        _srcset(variants['webp']), sizes,
+        default_storage.url(name), _srcset(variants['jpeg']), sizes, width, height, alt, css_class,
+        loading,
+    )
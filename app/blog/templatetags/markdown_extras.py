@@ -1,8 +1,19 @@
 from django import template
-import markdown
+
+from blog.rendering import render_markdown, render_key
 
 register = template.Library()
 
 @register.filter(name='markdown')
 def markdown_format(text):
-    return markdown.markdown(text, extensions=['extra', 'codehilite']) 
\ No newline at end of file
+    return render_markdown(text)
+
+@register.filter(name='post_html')
+def post_html(post):
+    """
+    Returns the stored HTML for a post, rendering only if it is stale.
+    Usage: {{ post|post_html|safe }}
+    """
+    if post.content_html_key and post.content_html_key == render_key(post.content):
+        return post.content_html
+    return render_markdown(post.content)
@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import CustomUser
+from app import query_inspector
+from app.dbpool import close_pools
+from app.db_router import HOLD_KEY, PIN_COOKIE, ReplicaRouter, read_from_replica
+from jobs.models import Job
+from . import caching, counts, datagen, related
+from .models import DailyPostCount, Post, RelatedPost
+from .page_cache import purge_post
+from .pagination import RANK_KEYS, CursorPaginator, InvalidCursor, paginate
+from .view_counter import ViewCounter, replay_spool, view_counter, write_view_counts
+
+
+class StoredSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username='writer', password='test')
+        cls.post = Post.objects.create(
+            title='No excerpt', content='## Opening\n\nThe *first* words &amp; more.', author=author, status='published',
+        )
+        cls.summary = cls.post.summary
+        # As migration 0005 leaves existing posts: no HTML rendered yet
+        Post.objects.filter(pk=cls.post.pk).update(content_html='', content_html_key='', summary='')
+
+    def assertSummaryRestored(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.summary, self.summary)
+        self.assertIn('first words', self.post.summary)
+
+    def test_render_posts(self):
+        call_command('render_posts', stdout=StringIO())
+        self.assertSummaryRestored()
+
+    def test_summary_migration_renders_missing_html(self):
+        import_module('blog.migrations.0011_post_summary').fill_summaries(apps, None)
+        self.assertSummaryRestored()
+        self.assertNotEqual(self.post.content_html, '')
+
+
+class DerivedFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='deriver', password='test')
+        cls.post = Post.objects.create(
+            title='Derived', content='One *two* three', author=cls.author, status='published',
+        )
+
+    def stored(self, *names):
+        return Post.objects.values_list(*names).get(pk=self.post.pk)
+
+    def test_changed_fields(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.changed_fields(*Post.TRACKED_FIELDS), set())
+        post.title = 'Derived'
+        post.content = 'Changed'
+        self.assertEqual(post.changed_fields(*Post.TRACKED_FIELDS), {'content'})
+        post.save()
+        self.assertEqual(post.changed_fields(*Post.TRACKED_FIELDS), set())
+        self.assertEqual(Post(title='New').changed_fields('title', 'content'), {'title', 'content'})
+
+    def test_unchanged_sources_are_not_recomputed(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.status = 'draft'
+        with mock.patch.object(Post, 'refresh_word_count') as word_count, \
+                mock.patch.object(Post, 'refresh_content_html') as content_html, \
+                mock.patch.object(Post, 'refresh_search_vector') as search_vector, \
+                mock.patch.object(Post, 'refresh_summary') as summary:
+            post.save()
+        for method in (word_count, content_html, search_vector, summary):
+            method.assert_not_called()
+
+    def test_content_change_recomputes_its_columns(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = 'Four *five* six seven'
+        post.save()
+        self.assertEqual(
+            self.stored('word_count', 'content_html', 'summary'),
+            (4, '<p>Four <em>five</em> six seven</p>', 'Four five six seven'),
+        )
+
+    def test_update_fields(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = 'Not saved here'
+        post.excerpt = 'A new excerpt'
+        post.save(update_fields=['excerpt'])
+        # The excerpt's derived columns are saved with it; the content's are not
+        self.assertEqual(self.stored('content', 'word_count', 'summary'), ('One *two* three', 3, 'A new excerpt'))
+        self.assertTrue(Post.search('excerpt').filter(pk=post.pk).exists())
+
+        post.save(update_fields=['content'])
+        self.assertEqual(self.stored('content', 'word_count'), ('Not saved here', 3))
+
+    def test_deferred_sources_are_not_read(self):
+        post = Post.objects.defer('content', 'excerpt').get(pk=self.post.pk)
+        post.title = 'Retitled'
+        with mock.patch.object(Post, 'refresh_word_count') as word_count, \
+                mock.patch.object(Post, 'refresh_summary') as summary:
+            post.save()
+        word_count.assert_not_called()
+        summary.assert_not_called()
+        self.assertNotIn('content', post.__dict__)
+        self.assertTrue(Post.search('retitled').filter(pk=post.pk).exists())
+
+
+class DailyPostCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='counted', password='test')
+        cls.day = timezone.now() - timedelta(days=3)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            title='Counted', content='Body', author=self.author, status='published', created_at=self.day,
+        )
+
+    def count(self, moment):
+        day = DailyPostCount.objects.filter(day=timezone.localdate(moment)).first()
+        return day.count if day else 0
+
+    def test_publish_unpublish_redate_and_delete(self):
+        self.assertEqual(self.count(self.day), 1)
+        draft = Post.objects.create(title='Draft', content='Body', author=self.author, created_at=self.day)
+        self.assertEqual(self.count(self.day), 1)
+
+        draft.status = 'published'
+        draft.save()
+        self.assertEqual(self.count(self.day), 2)
+
+        later = self.day + timedelta(days=1)
+        draft.created_at = later
+        draft.save()
+        self.assertEqual((self.count(self.day), self.count(later)), (1, 1))
+
+        draft.status = 'draft'
+        draft.save()
+        self.assertEqual(self.count(later), 0)
+
+        self.post.delete()
+        self.assertEqual(self.count(self.day), 0)
+        # What a rebuild from the posts table would give
+        counted = dict(DailyPostCount.objects.filter(count__gt=0).values_list('day', 'count'))
+        DailyPostCount.rebuild()
+        self.assertEqual(dict(DailyPostCount.objects.values_list('day', 'count')), counted)
+
+    def test_edit_of_other_fields_keeps_the_count(self):
+        self.post.title = 'Renamed'
+        self.post.save()
+        self.post.save(update_fields=['views'])
+        self.assertEqual(self.count(self.day), 1)
+
+    def test_unpublish_through_deferred_fields(self):
+        for post in (Post.objects.only('id', 'title').get(), Post.objects.defer('status').get(),
+                     Post(pk=self.post.pk, title='Counted', content='Body', author=self.author)):
+            Post.objects.filter(pk=self.post.pk).update(status='published')
+            DailyPostCount.rebuild()
+            post.status = 'draft'
+            post.save()
+            self.assertEqual(self.count(self.day), 0)
+
+    def test_delete_through_deferred_fields(self):
+        Post.objects.only('id').get().delete()
+        self.assertEqual(self.count(self.day), 0)
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = CustomUser.objects.create_user(username='first', password='test')
+        cls.second = CustomUser.objects.create_user(username='second', password='test')
+        cls.day = timezone.now() - timedelta(days=3)
+
+    def setUp(self):
+        self.older = Post.objects.create(
+            title='Older', content='Body', author=self.first, status='published', created_at=self.day - timedelta(days=1),
+        )
+        self.post = Post.objects.create(
+            title='Newer', content='Body', author=self.first, status='published', created_at=self.day,
+        )
+
+    def assertStats(self, author, count, last_published_at):
+        author.refresh_from_db()
+        self.assertEqual((author.published_post_count, author.last_published_at), (count, last_published_at))
+
+    def assertDayCount(self, count):
+        day = DailyPostCount.objects.filter(day=timezone.localdate(self.day)).first()
+        self.assertEqual(day.count if day else 0, count)
+
+    def test_move_to_another_author(self):
+        self.post.author = self.second
+        self.post.save()
+        self.assertStats(self.first, 1, self.older.created_at)
+        self.assertStats(self.second, 1, self.day)
+        self.assertDayCount(1)
+
+    def test_unpublish_through_only(self):
+        post = Post.objects.only('id', 'title').get(pk=self.post.pk)
+        post.status = 'draft'
+        post.save()
+        self.assertStats(self.first, 1, self.older.created_at)
+        self.assertDayCount(0)
+
+    def test_reassign_through_defer(self):
+        post = Post.objects.defer('author_id', 'status', 'created_at').get(pk=self.post.pk)
+        post.author = self.second
+        post.save()
+        self.assertStats(self.first, 1, self.older.created_at)
+        self.assertStats(self.second, 1, self.day)
+        self.assertDayCount(1)
+
+    def test_delete_moves_last_published_back(self):
+        Post.objects.only('id').get(pk=self.post.pk).delete()
+        self.assertStats(self.first, 1, self.older.created_at)
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=60, VIEW_COUNTER_MAX_PENDING=1000)
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username='viewed', password='test')
+        cls.first = Post.objects.create(title='First', content='Body', author=author, status='published')
+        cls.second = Post.objects.create(title='Second', content='Body', author=author, status='published')
+
+    def setUp(self):
+        self.counter = ViewCounter()
+        # No flusher thread: flushes happen when the test calls them
+        self.counter._ensure_flusher = lambda: None
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool = spool.name
+
+    def views(self, post):
+        return Post.objects.values_list('views', flat=True).get(pk=post.pk)
+
+    def test_write_view_counts_adds_per_post(self):
+        Post.objects.filter(pk=self.first.pk).update(views=5)
+        with self.assertNumQueries(1):
+            self.assertEqual(write_view_counts({self.first.pk: 3, self.second.pk: 1, 0: 0}), 2)
+        self.assertEqual((self.views(self.first), self.views(self.second)), (8, 1))
+
+    def test_flush_writes_the_buffer_once(self):
+        for post in (self.first, self.first, self.second):
+            self.counter.record(post.pk)
+        self.assertEqual((self.counter.pending(self.first.pk), self.counter.pending()), (2, 3))
+        self.assertEqual(self.views(self.first), 0)
+
+        self.assertEqual(self.counter.flush(), 3)
+        self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual((self.views(self.first), self.views(self.second)), (2, 1))
+
+    def test_failed_flush_keeps_the_views(self):
+        self.counter.record(self.first.pk, 4)
+        with mock.patch('blog.view_counter.write_view_counts', side_effect=DatabaseError):
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending(self.first.pk), 4)
+
+    def test_spool_and_replay_on_start(self):
+        self.counter.record(self.first.pk, 2)
+        self.counter.record(self.second.pk)
+        with override_settings(VIEW_COUNTER_SPOOL_DIR=self.spool), \
+                mock.patch('blog.view_counter.write_view_counts', side_effect=DatabaseError):
+            self.counter.flush_or_spool()
+        self.assertEqual(self.counter.pending(), 0)
+        self.assertEqual(len(os.listdir(self.spool)), 1)
+
+        # As entrypoint.sh does before the server starts
+        call_command('flush_views', spool_dir=self.spool, stdout=StringIO())
+        self.assertEqual((self.views(self.first), self.views(self.second)), (2, 1))
+        self.assertEqual(os.listdir(self.spool), [])
+        self.assertEqual(replay_spool(self.spool), 0)
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0, PAGE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='writer', password='test')
+        cls.post = Post.objects.create(
+            title='Conditional requests',
+            excerpt='ETags and validators',
+            content='Body',
+            author=cls.author,
+            status='published',
+        )
+
+    def assertNotModified(self, url, queries=1):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_index(self):
+        self.assertNotModified(reverse('blog:index'))
+
+    def test_search(self):
+        self.assertNotModified(reverse('blog:search') + '?q=conditional')
+
+    def test_authors_list(self):
+        self.assertNotModified(reverse('blog:authors_list'))
+
+    def test_profile(self):
+        self.assertNotModified(reverse('blog:profile', args=[self.author.username]))
+
+    def test_days_with_posts(self):
+        # The days come from the app cache
+        self.assertNotModified(reverse('blog:days_with_posts') + '?year=2025', queries=0)
+
+    def test_post_detail_counts_view_on_304(self):
+        with mock.patch.object(view_counter, 'record') as record:
+            self.assertNotModified(reverse('blog:post_detail', args=[self.post.slug]))
+        self.assertEqual(record.call_count, 2)
+
+    def test_edit_invalidates_listing(self):
+        url = reverse('blog:index')
+        etag = self.client.get(url)['ETag']
+        self.post.title = 'Edited title'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_between_visitors(self):
+        url = reverse('blog:index')
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='cached', password='test')
+        cls.post = Post.objects.create(
+            title='Cached page',
+            excerpt='Served from the cache',
+            content='Body',
+            author=cls.author,
+            status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_hit_runs_no_queries(self):
+        url = reverse('blog:index')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_hit_counts_post_view(self):
+        url = reverse('blog:post_detail', args=[self.post.slug])
+        with mock.patch.object(view_counter, 'record') as record:
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+        self.assertEqual([c.args for c in record.call_args_list], [(self.post.pk,), (self.post.pk,)])
+
+    def test_logged_in_visitor_bypasses_cache(self):
+        url = reverse('blog:index')
+        self.client.get(url)
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertTrue(queries.captured_queries)
+
+    def test_edit_purges_post_and_listings(self):
+        urls = [
+            reverse('blog:post_detail', args=[self.post.slug]),
+            reverse('blog:index'),
+            reverse('blog:profile', args=[self.author.username]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed cached page'
+            self.post.save()
+        for url in urls:
+            self.assertContains(self.client.get(url), 'Renamed cached page')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ImageVariantJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='illustrator', password='test')
+
+    def queued(self, post):
+        return Job.objects.filter(key=f'image-variants:post:{post.pk}', status='queued').exists()
+
+    def test_image_saved_outside_the_views_is_queued(self):
+        # As the admin saves it
+        post = Post.objects.create(title='Pictured', content='Body', author=self.author)
+        self.assertFalse(self.queued(post))
+        post.featured_image = 'blog_images/pictured.jpg'
+        post.save()
+        self.assertTrue(self.queued(post))
+
+    def test_current_variants_are_not_queued_again(self):
+        post = Post.objects.create(
+            title='Pictured', content='Body', author=self.author, featured_image='blog_images/pictured.jpg',
+            featured_image_variants={'source': 'blog_images/pictured.jpg', 'webp': [], 'jpeg': []},
+        )
+        post.save()
+        self.assertFalse(self.queued(post))
+
+
+class EstimatedPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username='estimated', password='test')
+        for i in range(4):
+            Post.objects.create(title=f'Estimated {i}', content='Body', author=author, status='published')
+
+    @override_settings(PAGINATION_MAX_PAGE_NUMBER=5)
+    def test_overestimated_count_serves_last_real_page(self):
+        # A planner estimate above the real count lets ?page=5 through
+        request = RequestFactory().get('/', {'page': 5})
+        with mock.patch('blog.pagination.cached_count', return_value=(100, True)):
+            page = paginate(request, Post.objects.order_by('-created_at', '-id'), 3)
+        self.assertEqual(page.number, 2)
+        self.assertEqual([post.title for post in page], ['Estimated 0'])
+        self.assertIsNone(page.next_cursor)
+        self.assertIsNone(page.next_page)
+
+
+class RelatedPostsTests(TestCase):
+    TOPICS = {
+        'cats': 'Cats purr, nap in the sun and chase mice around the garden shed.',
+        'rockets': 'Rockets burn fuel, reach orbit and launch satellites into space.',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='relater', password='test')
+        cls.posts = {
+            topic: [cls.write(f'{topic.title()} {i}', text) for i in range(3)]
+            for topic, text in cls.TOPICS.items()
+        }
+
+    @classmethod
+    def write(cls, title, content, status='published'):
+        return Post.objects.create(title=title, content=content, author=cls.author, status=status)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            RELATED_POSTS_MODEL_PATH=os.path.join(directory.name, 'related.joblib'),
+            RELATED_POSTS_COUNT=3, RELATED_POSTS_REFRESH_LIMIT=10,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        related.build()
+
+    def related_ids(self, post):
+        return list(RelatedPost.objects.filter(post=post).order_by('rank').values_list('related_id', flat=True))
+
+    def test_build_lists_posts_of_the_same_topic(self):
+        cats = [post.pk for post in self.posts['cats']]
+        self.assertCountEqual(self.related_ids(self.posts['cats'][0]), cats[1:])
+
+    def test_refresh_adds_a_new_post(self):
+        kitten = self.write('Kitten', self.TOPICS['cats'] + ' Kittens purr too.')
+        related.refresh([kitten.pk])
+        self.assertIn(kitten.pk, self.related_ids(self.posts['cats'][0]))
+        self.assertEqual(len(self.related_ids(kitten)), 3)
+
+    def test_posts_unpublished_or_deleted_after_the_build_drop_out(self):
+        first, unpublished, deleted = self.posts['cats']
+        # An update() changes neither updated_at nor the lists
+        Post.objects.filter(pk=unpublished.pk).update(status='draft')
+        deleted.delete()
+        # A later refresh for another post
+        related.refresh([first.pk])
+        self.assertNotIn(unpublished.pk, self.related_ids(first))
+        self.assertNotIn(deleted.pk, self.related_ids(first))
+
+    def test_refresh_rebuilds_past_the_limit(self):
+        for i in range(11):
+            self.write(f'Cats {i + 3}', self.TOPICS['cats'])
+        with mock.patch('blog.related.build') as build:
+            related.refresh([self.posts['cats'][0].pk])
+        build.assert_called_once_with()
+
+
+class CountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='counter', password='test')
+        for i in range(3):
+            Post.objects.create(title=f'Counted {i}', content='Body', author=cls.author, status='published')
+
+    def setUp(self):
+        cache.clear()
+        self.published = Post.objects.filter(status='published')
+
+    def test_estimate_above_threshold(self):
+        estimate = counts.estimate_count(self.published)
+        with self.settings(COUNT_ESTIMATE_THRESHOLD=0):
+            self.assertEqual(counts.cached_count(self.published), (estimate, True))
+            self.assertEqual(counts.cached_count(self.published.filter(pk__gt=0), allow_estimate=False), (3, False))
+        cache.clear()
+        with self.settings(COUNT_ESTIMATE_THRESHOLD=10_000):
+            self.assertEqual(counts.cached_count(self.published), (3, False))
+
+    def test_unfiltered_table_is_estimated_from_pg_class(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Post._meta.db_table}')
+        self.assertEqual(counts.estimate_count(Post.objects.all()), 3)
+
+    def test_cached_until_a_post_is_saved_or_deleted(self):
+        self.assertEqual(counts.cached_count(self.published), (3, False))
+        with self.assertNumQueries(0):
+            self.assertEqual(counts.cached_count(self.published), (3, False))
+
+        post = Post.objects.create(title='Counted 3', content='Body', author=self.author, status='published')
+        self.assertEqual(counts.cached_count(self.published), (4, False))
+        post.status = 'draft'
+        post.save()
+        self.assertEqual(counts.cached_count(self.published), (3, False))
+        Post.objects.filter(status='published').first().delete()
+        self.assertEqual(counts.cached_count(self.published), (2, False))
+
+    def test_lost_generation_starts_above_the_old_one(self):
+        generation = counts.count_generation()
+        cache.delete(counts.GENERATION_KEY)
+        counts.invalidate_counts()
+        self.assertGreater(counts.count_generation(), generation)
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username='keyset', password='test')
+        same = timezone.now() - timedelta(days=1)
+        for i in range(7):
+            # Four posts share a timestamp, so only the id orders them
+            created_at = same if i in (1, 2, 3, 4) else same + timedelta(hours=i - 3)
+            Post.objects.create(title=f'Keyset {i}', content='Body', author=author, status='published',
+                                created_at=created_at)
+        cls.queryset = Post.objects.filter(status='published').order_by('-created_at', '-id')
+        cls.ids = list(cls.queryset.values_list('id', flat=True))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(self.queryset, 2)
+
+    def ids_of(self, page):
+        return [post.pk for post in page]
+
+    def test_walk_forward_and_back(self):
+        first = list(self.queryset[:2])
+        pages = [self.ids_of(first)]
+        page = self.paginator.page(self.paginator.cursor_after(first[-1]))
+        while True:
+            pages.append(self.ids_of(page))
+            self.assertTrue(page.has_previous())
+            if not page.has_next():
+                break
+            page = self.paginator.page(page.next_cursor)
+        self.assertEqual([pk for ids in pages for pk in ids], self.ids)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 2, 1])
+
+        back = []
+        while page.has_previous():
+            page = self.paginator.page(page.previous_cursor)
+            back.insert(0, self.ids_of(page))
+        self.assertEqual(back, pages[:-1])
+
+    def test_cursor_past_a_deleted_row(self):
+        start = self.queryset[1]
+        token = self.paginator.cursor_after(start)
+        start.delete()
+        self.assertEqual(self.ids_of(self.paginator.page(token)), self.ids[2:4])
+
+    def test_tampered_or_foreign_cursor(self):
+        token = self.paginator.cursor_after(self.queryset[1])
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(token[:-2] + ('A' if token[-2] != 'A' else 'B') + token[-1])
+        # A search cursor holds a rank where a date is expected
+        rank_token = CursorPaginator(self.queryset, 2, RANK_KEYS).cursor_after({'rank': 0.5, 'id': 1})
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(rank_token)
+        # The view falls back to the first page
+        page = paginate(RequestFactory().get('/', {'cursor': 'garbage'}), self.queryset, 2)
+        self.assertEqual((page.number, self.ids_of(page)), (1, self.ids[:2]))
+
+
+class ListingProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='lister', password='test')
+        for i in range(4):
+            Post.objects.create(
+                title=f'Projection {i}',
+                content=f'Long body number {i}. ' * 200,
+                author=cls.author,
+                status='published',
+            )
+
+    def assertNoBodies(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Long body number')
+        for query in queries.captured_queries:
+            self.assertNotIn('"blog_post"."content"', query['sql'])
+            self.assertNotIn('"blog_post"."content_html"', query['sql'])
+
+    def test_index(self):
+        self.assertNoBodies(reverse('blog:index'))
+
+    def test_search(self):
+        self.assertNoBodies(reverse('blog:search'))
+        self.assertNoBodies(reverse('blog:search') + '?q=projection')
+
+    def test_profile(self):
+        self.assertNoBodies(reverse('blog:profile', args=[self.author.username]))
+
+    def test_search_with_another_config(self):
+        rows = list(Post.search('projection', config='simple').for_listing())
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0].title, 'Projection 3')
+
+    def test_cursor_page(self):
+        with self.settings(PAGINATION_MAX_PAGE_NUMBER=1):
+            next_url = self.client.get(reverse('blog:index')).context['page_obj'].next_cursor
+            self.assertNoBodies(reverse('blog:index') + f'?cursor={next_url}')
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0, PAGE_CACHE_TIMEOUT=0)
+class AsyncViewTests(TestCase):
+    """
+    The async views through the ASGI handler, where any query left outside
+    sync_to_async raises SynchronousOnlyOperation.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='asyncwriter', password='test')
+        cls.post = Post.objects.create(
+            title='Served asynchronously', content='Body', author=cls.author, status='published'
+        )
+        cls.draft = Post.objects.create(
+            title='Async draft', content='Body', author=cls.author, status='draft'
+        )
+
+    async def assertPagesRender(self):
+        urls = [
+            reverse('blog:index'),
+            reverse('blog:search') + '?q=asynchronously',
+            reverse('blog:post_detail', args=[self.post.slug]),
+        ]
+        for url in urls:
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Served asynchronously')
+        response = await self.async_client.get(reverse('blog:days_with_posts') + '?year=2025')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_anonymous(self):
+        await self.assertPagesRender()
+
+    async def test_logged_in(self):
+        await self.async_client.aforce_login(self.author)
+        await self.assertPagesRender()
+        response = await self.async_client.get(reverse('blog:post_detail', args=[self.draft.slug]))
+        self.assertContains(response, 'Async draft')
+
+    async def test_draft_hidden_from_others(self):
+        response = await self.async_client.get(reverse('blog:post_detail', args=[self.draft.slug]))
+        self.assertRedirects(response, reverse('blog:index'), fetch_redirect_response=False)
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=60)
+    async def test_buffered_view_is_counted_in_the_event_loop(self):
+        self.addCleanup(view_counter._take)
+        with mock.patch('blog.views.sync_to_async', side_effect=AssertionError('thread hop')):
+            response = await self.async_client.get(reverse('blog:post_detail', args=[self.post.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(view_counter.pending(self.post.pk), 1)
+
+    async def test_search_with_invalid_date(self):
+        response = await self.async_client.get(reverse('blog:search') + '?date=2020-13-45')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Served asynchronously')
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    Outside a transaction, since reads inside one stay on the primary.
+    """
+
+    def setUp(self):
+        # Left by the purges of other tests
+        cache.delete(HOLD_KEY)
+        self.router = ReplicaRouter(replicas=['replica1'])
+        self.factory = RequestFactory()
+
+    def read_in_view(self, request):
+        @read_from_replica
+        def view(request):
+            return self.router.db_for_read(Post)
+        return view(request)
+
+    def test_only_decorated_views_read_from_replica(self):
+        with mock.patch.object(self.router, '_check', return_value=True):
+            self.assertEqual(self.read_in_view(self.factory.get('/')), 'replica1')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch.object(self.router, '_check', return_value=False) as check:
+            self.assertEqual(self.read_in_view(self.factory.get('/')), 'default')
+            self.assertEqual(self.read_in_view(self.factory.get('/')), 'default')
+        # Checked once per REPLICA_CHECK_INTERVAL, not per query
+        check.assert_called_once_with('replica1')
+
+    def test_pinned_visitor_reads_from_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        with mock.patch.object(self.router, '_check', return_value=True):
+            self.assertEqual(self.read_in_view(request), 'default')
+
+    def test_purged_pages_are_rebuilt_from_the_primary(self):
+        # Within REPLICA_MAX_LAG, so usable, but without the commit yet
+        with mock.patch.object(self.router, '_check', return_value=True):
+            for purge in (lambda: purge_post('slug', 'author'), lambda: caching.invalidate('search')):
+                cache.delete(HOLD_KEY)
+                self.assertEqual(self.read_in_view(self.factory.get('/')), 'replica1')
+                purge()
+                self.assertEqual(self.read_in_view(self.factory.get('/')), 'default')
+            # Once any usable replica has caught up
+            with self.settings(REPLICA_MAX_LAG=0, REPLICA_CHECK_INTERVAL=0):
+                caching.invalidate('search')
+            self.assertEqual(self.read_in_view(self.factory.get('/')), 'replica1')
+
+    def test_hold_is_looked_up_once_per_request(self):
+        @read_from_replica
+        def view(request):
+            return [self.router.db_for_read(Post) for _ in range(3)]
+
+        with mock.patch.object(self.router, '_check', return_value=True), \
+                mock.patch('app.db_router.replica_reads_held', return_value=False) as held:
+            self.assertEqual(view(self.factory.get('/')), ['replica1'] * 3)
+        held.assert_called_once_with()
+
+
+class PrimaryPinningTests(TestCase):
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_write_pins_visitor_to_primary(self):
+        self.client.force_login(CustomUser.objects.create_user(username='pinned', password='test'))
+        with mock.patch('app.db_router.replica_aliases', return_value=['replica1']):
+            response = self.client.get(reverse('blog:index'))
+            self.assertNotIn(PIN_COOKIE, response.cookies)
+            response = self.client.post(
+                reverse('blog:create_post'), {'title': 'Pinned', 'content': 'Body', 'status': 'published'}
+            )
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 15)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    async def test_write_pins_visitor_to_primary_under_asgi(self):
+        user = await CustomUser.objects.acreate(username='pinned')
+        await self.async_client.aforce_login(user)
+        with mock.patch('app.db_router.replica_aliases', return_value=['replica1']):
+            response = await self.async_client.post(
+                reverse('blog:create_post'), {'title': 'Pinned', 'content': 'Body', 'status': 'published'}
+            )
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 15)
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    @override_settings(QUERY_INSPECTOR=True)
+    def test_asgi_chain_has_no_thread_hops(self):
+        # A sync-only middleware would be wrapped in an adapter running the
+        # rest of the chain, async views included, in a thread
+        link = ASGIHandler()._middleware_chain
+        chain = []
+        while hasattr(link, 'get_response'):
+            self.assertTrue(iscoroutinefunction(link), link)
+            chain.append(type(getattr(link, '__wrapped__', link)).__name__)
+            link = link.get_response
+        for name in ('MetricsMiddleware', 'QueryInspectorMiddleware', 'PrimaryPinningMiddleware',
+                     'XFrameOptionsMiddleware'):
+            self.assertIn(name, chain)
+
+
+class AppCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caching.local_cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(caching.get_or_compute('tests', 'hot', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_value_is_refreshed_early_by_one_caller(self):
+        values = iter(['first', 'second'])
+        compute = lambda: next(values)
+        self.assertEqual(caching.get_or_compute('tests', 'key', compute), 'first')
+        with mock.patch('blog.caching._expires_early', return_value=True):
+            # Another process holds the refresh lock: keep serving the value
+            with mock.patch.object(caching.cache, 'add', return_value=False):
+                self.assertEqual(caching.get_or_compute('tests', 'key', compute), 'first')
+            self.assertEqual(caching.get_or_compute('tests', 'key', compute), 'second')
+
+    def test_calendar_invalidated_on_publish(self):
+        author = CustomUser.objects.create_user(username='calendar', password='test')
+        post = Post.objects.create(title='Calendar', content='Body', author=author, status='draft')
+        day = timezone.localdate(post.created_at)
+        self.assertEqual(Post.get_days_with_posts(day.year, day.month), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'published'
+            post.save()
+        self.assertEqual(Post.get_days_with_posts(day.year, day.month), {day.day})
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ConnectionPoolTests(SimpleTestCase):
+    def patch_pools(self, pools):
+        wrapper = connections['default']
+        return mock.patch.multiple(
+            type(wrapper), _connection_pools=pools,
+        ), mock.patch.dict(wrapper.settings_dict['OPTIONS'], {'pool': True})
+
+    def test_close_pools(self):
+        # Run at exit, so that no process waits on the pool threads
+        pool = mock.Mock()
+        pools = {'default': pool}
+        patch_class, patch_options = self.patch_pools(pools)
+        with patch_class, patch_options:
+            close_pools()
+        self.assertEqual(pools, {})
+        pool.close.assert_called_once_with()
+
+    def test_close_pools_creates_none(self):
+        pools = {}
+        patch_class, patch_options = self.patch_pools(pools)
+        with patch_class, patch_options:
+            close_pools()
+        self.assertEqual(pools, {})
+
+    def test_pool_stats_are_hidden_from_the_public(self):
+        self.assertEqual(self.client.get(reverse('blog:db_pool_stats')).status_code, 200)
+        response = self.client.get(reverse('blog:db_pool_stats'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsTests(TestCase):
+    def test_request_is_timed_per_view(self):
+        response = self.client.get(reverse('blog:authors_list'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+')
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('django_request_duration_seconds_count{view="blog:authors_list"}', metrics)
+        self.assertIn('django_request_db_queries_count{view="blog:authors_list"}', metrics)
+        self.assertIn('django_requests_total{method="GET",status="200",view="blog:authors_list"}', metrics)
+
+    def test_metrics_are_hidden_from_the_public(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 404)
+        # Through nginx, which connects from an internal address
+        response = self.client.get(reverse('metrics'), headers={'X-Forwarded-For': '203.0.113.7'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MONITORING_TOKEN='scrape-me')
+    def test_metrics_are_served_with_the_monitoring_token(self):
+        url = reverse('metrics')
+        headers = {'X-Forwarded-For': '203.0.113.7'}
+        self.assertEqual(self.client.get(url, headers={**headers, 'Authorization': 'Bearer wrong'}).status_code, 404)
+        self.assertEqual(self.client.get(url, headers={**headers, 'Authorization': 'Bearer scrape-me'}).status_code, 200)
+
+    async def test_async_request_is_timed(self):
+        response = await self.async_client.get(reverse('blog:index'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+')
+
+
+class QueryInspectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='inspected', password='test')
+        for i in range(4):
+            Post.objects.create(title=f'Inspected {i}', content='Body', author=cls.author, status='published')
+
+    def setUp(self):
+        log = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        log.close()
+        self.addCleanup(os.remove, log.name)
+        self.settings = override_settings(QUERY_INSPECTOR_LOG=log.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.log = log.name
+
+    def events(self):
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            query_inspector.fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x' AND k IN (%s, %s)"),
+            query_inspector.fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'it''s' AND k IN (%s)"),
+        )
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=10_000)
+    def test_query_per_row_is_reported(self):
+        with self.assertLogs('app.query_inspector', 'WARNING'), connection.execute_wrapper(query_inspector._inspect):
+            with query_inspector.inspect_queries('test'):
+                for post in Post.objects.all():
+                    post.author.username
+        [event] = self.events()
+        self.assertEqual(event['type'], 'n+1')
+        self.assertEqual(event['count'], 4)
+        self.assertIn('blog/tests.py', event['site'])
+        self.assertIn('account_customuser', event['sql'])
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=0)
+    def test_slow_query_is_explained(self):
+        with self.assertLogs('app.query_inspector', 'WARNING'), connection.execute_wrapper(query_inspector._inspect):
+            list(Post.objects.filter(status='published'))
+        [event] = self.events()
+        self.assertEqual(event['type'], 'slow')
+        self.assertIn('blog_post', event['plan'])
+        self.assertIn('actual time', event['plan'])
+
+
+class QueryBudgetMixin:
+    """
+    Seeds authors with published and draft posts spread over several days,
+    with related posts, and asserts the exact number of queries a request
+    runs and a cap on the rows they fetch. Caches are emptied before every
+    request, so budgets hold for the slowest path. Each test checks its
+    budgets, adds pages more data (grow(), also for cls.author, set by the
+    test class) and checks them again: a query per row or a listing
+    fetching whole tables fails the second time.
+    """
+
+    @classmethod
+    def write_posts(cls, author, count):
+        # Noon, so that the minutes taken off below never reach yesterday
+        now = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        first = Post.objects.filter(author=author).count()
+        for j in range(first, first + count):
+            Post.objects.create(
+                title=f'Query budgets {author.username} {j}',
+                excerpt=f'Excerpt {j}',
+                content=f'Paragraph {j} of a post by {author.username}.\n\n' * 20,
+                author=author,
+                status='published',
+                created_at=now - timedelta(days=j % 10, minutes=author.pk),
+            )
+
+    @classmethod
+    def seed(cls, authors, posts_per_author):
+        users = []
+        start = CustomUser.objects.count()
+        for i in range(start, start + authors):
+            user = CustomUser.objects.create_user(username=f'author{i}', password='test', bio=f'Writer {i}')
+            cls.write_posts(user, posts_per_author)
+            Post.objects.create(title=f'Draft {i}', content='Unfinished', author=user)
+            users.append(user)
+        published = list(Post.objects.filter(status='published').order_by('id').values_list('id', flat=True))
+        RelatedPost.objects.bulk_create([
+            RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=1.0 / rank)
+            for n, post_id in enumerate(published)
+            for rank, related_id in enumerate(published[n + 1:n + 6], 1)
+        ], ignore_conflicts=True)
+        return users
+
+    def grow(self):
+        # More authors, and more posts of self.author, than fit on a page
+        with self.captureOnCommitCallbacks(execute=True):
+            self.write_posts(self.author, 10)
+            self.seed(authors=10, posts_per_author=3)
+
+    def assertQueryBudget(self, url, queries, rows):
+        cache.clear()
+        caching.local_cache.clear()
+        fetched = []
+
+        def count_rows(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if context['cursor'].description is not None:
+                fetched.append(context['cursor'].rowcount)
+            return result
+
+        with CaptureQueriesContext(connection) as captured, connection.execute_wrapper(count_rows):
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+        self.assertEqual(
+            len(captured), queries,
+            f'{url} ran {len(captured)} queries:\n' + '\n'.join(q['sql'] for q in captured.captured_queries),
+        )
+        self.assertLessEqual(sum(fetched), rows, f'{url} fetched {sum(fetched)} rows ({fetched})')
+
+    def assertBudgets(self, budgets, user=None):
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+        for url, queries, rows in budgets:
+            with self.subTest(url=url, logged_in=user is not None):
+                self.assertQueryBudget(url, queries, rows)
+
+    def assertBudgetsHold(self, budgets, user=None):
+        self.assertBudgets(budgets, user)
+        self.grow()
+        self.assertBudgets(budgets, user)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, *_ = cls.seed(authors=4, posts_per_author=6)
+        cls.post = Post.objects.filter(author=cls.author, status='published').earliest('id')
+        cls.draft = Post.objects.get(author=cls.author, status='draft')
+        cls.today = timezone.localdate()
+
+    def listings(self, session):
+        # Queries and rows on top of the page's own: the session and the
+        # user for a logged-in visitor
+        extra = 2 if session else 0
+        today = self.today
+        return [
+            # Validators, count estimate, exact count, a page of 3 posts
+            (reverse('blog:index'), 4 + extra, 6 + extra),
+            (reverse('blog:index') + '?page=2', 4 + extra, 6 + extra),
+            # Validators, count estimate, exact count, a page of 12 authors
+            (reverse('blog:authors_list'), 4 + extra, 15 + extra),
+            # Validators, author, count estimate, exact count, a page of 5 posts
+            (reverse('blog:profile', args=[self.author.username]), 5 + extra, 9 + extra),
+            (reverse('blog:profile', args=[self.author.username]) + '?page=2', 5 + extra, 9 + extra),
+            (reverse('blog:search'), 4 + extra, 8 + extra),
+            (reverse('blog:search') + '?q=budgets', 4 + extra, 8 + extra),
+            (reverse('blog:search') + '?q=budgets&page=2', 4 + extra, 8 + extra),
+            (reverse('blog:search') + f'?date={today.isoformat()}', 4 + extra, 8 + extra),
+            # Validators, the post with its author, 3 related posts
+            (reverse('blog:post_detail', args=[self.post.slug]), 3 + extra, 5 + extra),
+            # One row per day with posts; the API never needs the session
+            (reverse('blog:days_with_posts') + f'?year={today.year}&month={today.month}', 1, 31),
+            (reverse('blog:days_with_posts') + f'?year={today.year}', 1, 366),
+        ]
+
+    def test_anonymous_budgets(self):
+        self.assertBudgetsHold(self.listings(session=False) + [
+            (reverse('blog:health_check'), 1, 1),
+            (reverse('blog:db_pool_stats'), 0, 0),
+            (reverse('blog:create_post'), 0, 0),
+            (reverse('blog:privacy_policy'), 0, 0),
+            (reverse('blog:terms_of_service'), 0, 0),
+            (reverse('blog:contact'), 0, 0),
+        ])
+
+    def test_logged_in_budgets(self):
+        self.assertBudgetsHold(self.listings(session=True) + [
+            # Validators, the draft, session and user, no related posts
+            (reverse('blog:post_detail', args=[self.draft.slug]), 5, 4),
+            (reverse('blog:create_post'), 2, 2),
+            (reverse('blog:contact'), 2, 2),
+        ], user=self.author)
+
+
+class DatagenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='writer', password='test')
+        cls.spec = {
+            'seed': 1, 'author_ids': [cls.author.pk], 'cum_weights': datagen.author_weights(1),
+            'images': [], 'image_chance': 0, 'end': timezone.now(), 'days': 30,
+        }
+
+    def test_derived_fields_match_save(self):
+        # Assembled from pre-rendered blocks, as Post.save() renders them
+        for post in datagen.build_posts(0, 50, self.spec):
+            saved = Post(title=post.title, excerpt=post.excerpt, content=post.content)
+            saved.refresh_word_count()
+            saved.refresh_content_html(force=True)
+            saved.refresh_summary()
+            for name in ('word_count', 'reading_time', 'content_html', 'content_html_key', 'summary'):
+                self.assertEqual(getattr(post, name), getattr(saved, name), name)
+
+    def test_same_seed_same_posts(self):
+        first = datagen.build_posts(0, 3, self.spec)
+        self.assertEqual(
+            [(post.slug, post.content) for post in first],
+            [(post.slug, post.content) for post in datagen.build_posts(0, 5, self.spec)[:3]],
+        )
+        self.assertEqual(datagen.first_slug(self.spec), first[0].slug)
+
+    def test_copy_posts(self):
+        posts = datagen.build_posts(0, 20, self.spec)
+        ids = datagen.copy_posts(posts)
+        self.assertEqual(sorted(ids), sorted(Post.objects.values_list('pk', flat=True)))
+        self.assertFalse(Post.objects.filter(search_vector=None).exists())
+        stored = Post.objects.get(pk=ids[0])
+        self.assertEqual((stored.slug, stored.content_html), (posts[0].slug, posts[0].content_html))
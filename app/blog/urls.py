@@ -6,6 +6,7 @@ app_name = 'blog'
 urlpatterns = [
     path('', views.index, name='index'),
     path('health/', views.health_check, name='health_check'),
+    path('health/db/', views.db_pool_stats, name='db_pool_stats'),
     path('create/', views.create_post, name='create_post'),
     path('search/', views.search, name='search'),
     path('@<str:username>/', views.profile, name='profile'),
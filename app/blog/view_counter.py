@@ -0,0 +1,206 @@
+"""
+Write-behind view counting for posts.
+
+Views are collected in a per-process buffer and written with a single
+``UPDATE ... SET views = views + CASE ...`` statement per flush, instead of
+one row-locking UPDATE per page view. A background thread flushes every
+VIEW_COUNTER_FLUSH_INTERVAL seconds (or sooner once VIEW_COUNTER_MAX_PENDING
+views are buffered), and the buffer is flushed again when the worker exits,
+so recycling a worker loses at most one interval of counts even if the exit
+flush cannot reach the database: those counts are spooled to disk and picked
+up by ``manage.py flush_views``.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+
+def write_view_counts(counts):
+    """
+    Add the given {post_id: views} increments in one UPDATE statement.
+    """
+    from .models import Post
+
+    counts = {post_id: n for post_id, n in counts.items() if n}
+    if not counts:
+        return 0
+    increment = Case(
+        *[When(pk=post_id, then=Value(n)) for post_id, n in counts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Post.objects.filter(pk__in=list(counts)).update(views=F('views') + increment)
+
+
+class ViewCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._pending_total = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        # When False every view is written immediately, as before buffering.
+        self.buffered = True
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 5.0)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'VIEW_COUNTER_MAX_PENDING', 1000)
+
+    @property
+    def spool_dir(self):
+        return getattr(settings, 'VIEW_COUNTER_SPOOL_DIR', None)
+
+    @property
+    def writes_through(self):
+        """
+        Whether record() writes to the database at once instead of buffering.
+        """
+        return not self.buffered or self.flush_interval <= 0
+
+    def record(self, post_id, n=1):
+        """
+        Count n views of the given post.
+        """
+        if self.writes_through:
+            write_view_counts({post_id: n})
+            return
+
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[post_id] += n
+            self._pending_total += n
+            full = self._pending_total >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def pending(self, post_id=None):
+        """
+        Returns the number of buffered views for a post, or for all posts.
+        """
+        with self._lock:
+            if post_id is None:
+                return self._pending_total
+            return self._pending.get(post_id, 0)
+
+    def _take(self):
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            self._pending_total = 0
+        return counts
+
+    def _restore(self, counts):
+        with self._lock:
+            self._pending.update(counts)
+            self._pending_total += sum(counts.values())
+
+    def flush(self):
+        """
+        Write all buffered views to the database. On failure the views stay
+        buffered for the next flush. Returns the number of views written.
+        """
+        counts = self._take()
+        if not counts:
+            return 0
+        try:
+            write_view_counts(counts)
+        except DatabaseError:
+            logger.exception('Failed to flush %d buffered post views', sum(counts.values()))
+            self._restore(counts)
+            return 0
+        return sum(counts.values())
+
+    def flush_or_spool(self):
+        """
+        Flush on shutdown, spooling the views to disk if the database is
+        unreachable so that ``manage.py flush_views`` can replay them.
+        """
+        if self.flush():
+            return
+        counts = self._take()
+        if counts:
+            spool_views(counts, self.spool_dir)
+
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so (re)start the flusher lazily in each
+        # worker process rather than in the preloaded master.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, name='view-counter-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('View counter flusher failed')
+            finally:
+                # This thread owns its own connection; do not let it go stale.
+                connection.close_if_unusable_or_obsolete()
+
+
+def spool_views(counts, spool_dir):
+    """
+    Write buffered views to a spool file. Returns the file path.
+    """
+    if not spool_dir:
+        logger.error('Dropping %d post views: VIEW_COUNTER_SPOOL_DIR is not set', sum(counts.values()))
+        return None
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f'views-{os.getpid()}-{uuid.uuid4().hex}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({str(post_id): n for post_id, n in counts.items()}, f)
+    os.replace(tmp_path, path)
+    logger.warning('Spooled %d post views to %s', sum(counts.values()), path)
+    return path
+
+
+def replay_spool(spool_dir):
+    """
+    Write spooled views to the database and remove the spool files.
+    Returns the number of views written.
+    """
+    if not spool_dir or not os.path.isdir(spool_dir):
+        return 0
+    written = 0
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(spool_dir, name)
+        with open(path) as f:
+            counts = {int(post_id): n for post_id, n in json.load(f).items()}
+        write_view_counts(counts)
+        os.remove(path)
+        written += sum(counts.values())
+    return written
+
+
+view_counter = ViewCounter()
+
+atexit.register(view_counter.flush_or_spool)
@@ -1,49 +1,85 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import calendar
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, aget_object_or_404, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db import DatabaseError, connection
 from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from app.db_router import read_from_replica
+from app.dbpool import pool_stats
+from app.metrics import monitoring_only
 from .models import Post
+from .conditional import (
+    authors_validators, conditional_content, conditional_page,
+    post_detail_validators, profile_validators, published_posts_validators,
+)
+from .page_cache import cache_anonymous_page
+from .pagination import DATE_KEYS, RANK_KEYS, CachedCountPaginator, acached_page, apaginate, paginate
+from .view_counter import view_counter
 
 User = get_user_model()
 
+# The read views below are async: under ASGI (app.uvicorn_worker) a worker
+# keeps serving other connections while one waits on the database or a slow
+# client. Templates read request.user and the session lazily, which are
+# synchronous queries, so pages are rendered through sync_to_async.
+arender = sync_to_async(render)
+
 def health_check(request):
     """
-    Health check endpoint for monitoring
+    Health check endpoint for monitoring; unhealthy while the database is unreachable
     """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return HttpResponse("unhealthy", content_type="text/plain", status=503)
     return HttpResponse("healthy", content_type="text/plain")
 
+@monitoring_only
+def db_pool_stats(request):
+    """
+    Connection pool statistics of the worker process that answers (null without DB_POOL)
+    """
+    return JsonResponse({'pool': pool_stats()})
+
 # Create your views here.
-def index(request):
+@read_from_replica
+@cache_anonymous_page('index')
+@conditional_page(published_posts_validators)
+async def index(request):
     """
     Blog main page
     """
     # Get published posts
-    posts = Post.objects.filter(status='published').order_by('-created_at')
+    posts = Post.objects.filter(status='published').order_by('-created_at', '-id')
 
-    # Pagination
-    paginator = Paginator(posts, 3)  # Show 10 posts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination - 3 posts per page
+    page_obj = await apaginate(request, posts.for_listing(), 3)
 
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'blog/index.html', context)
+    return await arender(request, 'blog/index.html', context)
 
+@read_from_replica
+@conditional_page(authors_validators)
 def authors_list(request):
     """
     View for displaying all authors with their post counts
     """
-    # Get all users who have published posts
-    authors = User.objects.annotate(
-        post_count=Count('blog_posts', filter=Q(blog_posts__status='published'))
-    ).filter(post_count__gt=0).order_by('-post_count')
+    # Get all users who have published posts; the maintained count is
+    # served by a partial index in this order
+    authors = User.objects.filter(published_post_count__gt=0).order_by('-published_post_count', 'id')
 
     # Pagination
-    paginator = Paginator(authors, 12)  # Show 12 authors per page
+    paginator = CachedCountPaginator(authors, 12)  # Show 12 authors per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
@@ -52,18 +88,35 @@ def authors_list(request):
     }
     return render(request, 'blog/authors_list.html', context)
 
-def days_with_posts(request):
+@read_from_replica
+async def days_with_posts(request):
     """
-    API endpoint to get days with posts for a given month
+    API endpoint to get days with posts for a given month,
+    or for every month of a year when no month is given
     """
     try:
         year = int(request.GET.get('year'))
-        month = int(request.GET.get('month'))
-        days = Post.get_days_with_posts(year, month)
-        return JsonResponse({'days': list(days)})
+        month = request.GET.get('month')
+        if month is None:
+            months = await Post.aget_days_with_posts_in_year(year)
+            response = JsonResponse({'year': year, 'months': months})
+            last_day = datetime.date(year, 12, 31)
+        else:
+            month = int(month)
+            days = await Post.aget_days_with_posts(year, month)
+            response = JsonResponse({'days': sorted(days)})
+            last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
     except (ValueError, TypeError):
         return JsonResponse({'error': 'Invalid year or month'}, status=400)
 
+    # A finished month rarely changes; the current one changes with every post
+    if last_day < timezone.localdate():
+        max_age = settings.CALENDAR_PAST_MAX_AGE
+    else:
+        max_age = settings.CALENDAR_CURRENT_MAX_AGE
+    patch_cache_control(response, public=True, max_age=max_age)
+    return conditional_content(request, response)
+
 @login_required
 def create_post(request):
     """
@@ -94,79 +147,95 @@ def create_post(request):
     context = {}
     return render(request, 'blog/create_post.html', context)
 
-def post_detail(request, post_slug):
+def _count_cached_view(post_pk):
+    if post_pk is not None:
+        view_counter.record(post_pk)
+
+@cache_anonymous_page('post_detail', scope=lambda post_slug: post_slug, on_hit=_count_cached_view)
+@conditional_page(post_detail_validators)
+async def post_detail(request, post_slug):
     """
     View for displaying a single blog post
     Shows draft posts only to their authors, published posts to everyone
     """
-    post = get_object_or_404(Post, slug=post_slug)
+    post = await aget_object_or_404(Post.objects.select_related('author'), slug=post_slug)
 
-    if post.status == 'draft' and (not request.user.is_authenticated or post.author != request.user):
-        messages.error(request, 'This post is not available.')
-        return redirect('blog:index')
+    if post.status == 'draft':
+        # Reused by the template's request.user, which would query it again
+        request.user = user = await request.auser()
+        if not user.is_authenticated or post.author_id != user.pk:
+            messages.error(request, 'This post is not available.')
+            return redirect('blog:index')
 
     if post.status == 'published':
-        post.views += 1
-        post.save(update_fields=['views'])
+        # A dict update under a lock, unless buffering is off
+        if view_counter.writes_through:
+            await sync_to_async(post.increment_views)()
+        else:
+            post.increment_views()
 
-    related_posts = Post.objects.filter(
-        status='published'
-    ).exclude(
-        id=post.id
-    ).distinct()[:3]
+    related_posts = [related async for related in post.get_related_posts(3)]
 
     context = {
         'post': post,
         'related_posts': related_posts,
     }
-    return render(request, 'blog/post_detail.html', context)
+    response = await arender(request, 'blog/post_detail.html', context)
+    response.page_cache_meta = post.pk if post.status == 'published' else None
+    return response
 
+@read_from_replica
+@cache_anonymous_page('profile', scope=lambda username: username)
+@conditional_page(profile_validators)
 def profile(request, username):
     user_profile = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=user_profile, status='published').order_by('-created_at')
-    published_posts_count = posts.count()
+    posts = Post.objects.filter(author=user_profile, status='published').order_by('-created_at', '-id')
 
     # Pagination - 5 posts per page
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts.for_listing(), 5)
 
     context = {
         'user_profile': user_profile,
         'page_obj': page_obj,
-        'published_posts_count': published_posts_count,
+        'published_posts_count': user_profile.published_post_count,
     }
     return render(request, 'blog/profile.html', context)
 
-def search(request):
+@read_from_replica
+@cache_anonymous_page('search')
+@conditional_page(published_posts_validators)
+async def search(request):
     query = request.GET.get('q', '')
     date = request.GET.get('date', '')
+    keys = DATE_KEYS
     
     if date:
         try:
             # Parse the date string (format: YYYY-MM-DD)
-            from datetime import datetime
-            search_date = datetime.strptime(date, '%Y-%m-%d').date()
+            search_date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
             posts = Post.objects.filter(
                 created_at__date=search_date,
                 status='published'
-            ).order_by('-created_at')
+            ).order_by('-created_at', '-id')
             query = f"Posts from {search_date.strftime('%B %d, %Y')}"
         except ValueError:
             posts = Post.objects.none()
     elif query:
         posts = Post.search(query)
+        keys = RANK_KEYS
     else:
         # Show all published posts when no search parameters
-        posts = Post.objects.filter(status='published').order_by('-created_at')
+        posts = Post.objects.filter(status='published').order_by('-created_at', '-id')
         query = 'All Latest Articles'
     
-    # Pagination - 7 posts per page
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination - 5 posts per page. Ranking every match is the costly part
+    # of a text search, so its pages are shared through the app cache.
+    if keys is RANK_KEYS:
+        page_obj = await acached_page('search', request, posts.for_listing(), 5, keys)
+    else:
+        page_obj = await apaginate(request, posts.for_listing(), 5, keys)
     
-    return render(request, 'blog/search.html', {
+    return await arender(request, 'blog/search.html', {
         'page_obj': page_obj,
         'posts': page_obj,
         'query': query,
@@ -8,7 +8,17 @@ echo "--- STARTED APP --- "
 #python manage.py collectstatic
 #python manage.py runserver 0.0.0.0:8000
 python manage.py collectstatic --no-input --clear
-gunicorn app.wsgi --access-logfile - --workers 4 --max-requests 5000 --max-requests-jitter 100 --preload
-#gunicorn app.asgi:application -b 0.0.0.0:8000 -k app.uvicorn_worker.UvicornWorker
+# Views spooled by workers that exited while the database was down
+python manage.py flush_views
+# Workers share Prometheus metrics through files here (see app/metrics.py)
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+# app.asgi with uvicorn workers (see app/uvicorn_worker.py), as the hot views
+# are async; SERVER_INTERFACE=wsgi falls back to gunicorn sync workers
+if [ "$SERVER_INTERFACE" = "wsgi" ]; then
+    gunicorn app.wsgi --access-logfile - --workers 4 --max-requests 5000 --max-requests-jitter 100 --preload
+else
+    gunicorn app.asgi:application -b 0.0.0.0:8000 -k app.uvicorn_worker.UvicornWorker --access-logfile - --workers 4 --max-requests 5000 --max-requests-jitter 100 --preload
+fi
 echo "--- END APP --- "
 exec "$@"
\ No newline at end of file
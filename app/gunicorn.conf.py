@@ -0,0 +1,27 @@
+"""
+Gunicorn server hooks.
+
+Gunicorn loads this file automatically when started from this directory
+(see entrypoint.sh); command line flags still take precedence.
+"""
+
+
+def worker_exit(server, worker):
+    # Flush buffered post views before a recycled worker goes away.
+    from app.dbpool import close_pools
+    from blog.view_counter import view_counter
+
+    view_counter.flush_or_spool()
+    # Stop the connection pools' threads (see settings.DB_POOL), or the
+    # interpreter waits for them at exit
+    close_pools()
+
+
+def child_exit(server, worker):
+    # Drop the metrics of a dead worker from the live gauges (see app/metrics.py)
+    import os
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
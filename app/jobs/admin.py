@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'finished_at', 'duration')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'duration', 'last_error')
+    ordering = ('-id',)
+    list_per_page = 50
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Show per-job counts, run times and queue waits'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Only count jobs finished in this many past hours (default: 24)'
+        )
+
+    def handle(self, *args, **options):
+        table = Job._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT name, status, count(*) FROM {table} '
+                f'WHERE status IN (%s, %s) GROUP BY name, status',
+                [Job.QUEUED, Job.RUNNING],
+            )
+            pending = {(name, status): count for name, status, count in cursor.fetchall()}
+            cursor.execute(
+                f'SELECT name, '
+                f'count(*) FILTER (WHERE status = %s), '
+                f'count(*) FILTER (WHERE status = %s), '
+                f'avg(duration), '
+                f'percentile_cont(0.95) WITHIN GROUP (ORDER BY duration), '
+                f'max(duration), '
+                f'avg(extract(epoch FROM started_at - run_after)) '
+                f'FROM {table} '
+                f"WHERE finished_at >= now() - %s * interval '1 hour' "
+                f'GROUP BY name ORDER BY name',
+                [Job.DONE, Job.FAILED, options['hours']],
+            )
+            finished = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        names = sorted({name for name, _ in pending} | set(finished))
+        if not names:
+            self.stdout.write(self.style.WARNING('No jobs found'))
+            return
+
+        self.stdout.write(
+            f'{"job":<28} {"queued":>7} {"running":>7} {"done":>7} {"failed":>7} '
+            f'{"avg s":>8} {"p95 s":>8} {"max s":>8} {"wait s":>8}'
+        )
+        for name in names:
+            done, failed, avg, p95, longest, wait = finished.get(name, (0, 0, None, None, None, None))
+            timings = ' '.join(
+                f'{value:>8.3f}' if value is not None else f'{"-":>8}'
+                for value in (avg, p95, longest, wait)
+            )
+            self.stdout.write(
+                f'{name:<28} {pending.get((name, Job.QUEUED), 0):>7} {pending.get((name, Job.RUNNING), 0):>7} '
+                f'{done:>7} {failed:>7} {timings}'
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Timings cover jobs finished in the last {options["hours"]:g} hours')
+        )
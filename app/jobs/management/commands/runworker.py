@@ -0,0 +1,88 @@
+import logging
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from jobs import worker
+
+# Seconds between checks for stalled jobs, and between prunes of old ones
+RECOVER_INTERVAL = 60
+PRUNE_INTERVAL = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Number of jobs run at once, each in its own thread (default: 2)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds between polls of an empty queue (default: 1.0)'
+        )
+        parser.add_argument(
+            '--job',
+            action='append',
+            dest='names',
+            help='Only run jobs of this name (repeatable)'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+
+        if concurrency < 1:
+            self.stdout.write(self.style.ERROR('Concurrency must be positive'))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # Let running jobs finish, then exit
+            signal.signal(signum, lambda *_: stop.set())
+
+        counts = []
+        started = time.perf_counter()
+
+        def target():
+            counts.append(worker.work(stop, options['names'], options['poll_interval'], options['burst']))
+
+        threads = [threading.Thread(target=target, name=f'jobs-{i}') for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Running jobs with {concurrency} threads...')
+
+        if not options['burst']:
+            last_prune = 0
+            while not stop.is_set():
+                try:
+                    worker.recover_stalled()
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                        worker.prune()
+                        last_prune = time.monotonic()
+                except DatabaseError:
+                    logger.exception('Job maintenance failed')
+                finally:
+                    connections.close_all()
+                stop.wait(RECOVER_INTERVAL)
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ran {sum(counts)} jobs in {time.perf_counter() - started:.1f}s'
+            )
+        )
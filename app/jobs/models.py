@@ -0,0 +1,47 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by ``manage.py runworker`` (see jobs.worker).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # At most one queued job per key; see jobs.queue.enqueue
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Seconds spent in the handler by the last attempt
+    duration = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due job
+            models.Index(fields=['run_after', 'id'], name='jobs_job_due', condition=Q(status='queued')),
+            models.Index(fields=['status', 'finished_at'], name='jobs_job_status_finished'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status='queued'), name='jobs_job_queued_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
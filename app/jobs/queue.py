@@ -0,0 +1,65 @@
+"""
+Background jobs stored in PostgreSQL.
+
+Apps register handlers in their tasks module and request handlers only
+enqueue:
+
+    @handler('blog.image_variants')
+    def image_variants(post_id):
+        ...
+
+    enqueue('blog.image_variants', {'post_id': post.pk}, key=f'image-variants:post:{post.pk}')
+
+The job row is inserted in the caller's transaction, so workers see it only
+once the change that caused it has committed, and never if it rolls back.
+Payloads are JSON and passed to the handler as keyword arguments. Handlers
+may run more than once (a retry, a worker lost mid-job) and must be
+idempotent.
+"""
+from datetime import timedelta
+from typing import Callable, NamedTuple
+
+from django.utils import timezone
+
+from .models import Job
+
+
+class Handler(NamedTuple):
+    func: Callable
+    max_attempts: int
+
+
+_handlers = {}
+
+
+def handler(name, max_attempts=5):
+    """
+    Decorator registering func as the handler of jobs called name.
+    """
+    def decorator(func):
+        _handlers[name] = Handler(func, max_attempts)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """
+    Queue a job to run after `delay` seconds. While a job with the same key
+    is still queued (not yet started) another one is not added: the queued
+    job will see the latest data when it runs.
+    """
+    if name not in _handlers:
+        raise LookupError(f'No handler registered for job {name!r}')
+    job = Job(
+        name=name,
+        payload=payload or {},
+        key=key,
+        max_attempts=_handlers[name].max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    # ON CONFLICT DO NOTHING against the queued-key unique index
+    Job.objects.bulk_create([job], ignore_conflicts=True)
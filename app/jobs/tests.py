@@ -0,0 +1,67 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import enqueue, handler
+from .worker import claim, run
+
+calls = []
+
+
+@handler('tests.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+    if value == 'fail':
+        raise RuntimeError('failed on purpose')
+
+
+@override_settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_key_deduplicates_queued_jobs_only(self):
+        enqueue('tests.record', {'value': 1}, key='same')
+        enqueue('tests.record', {'value': 2}, key='same')
+        self.assertEqual(Job.objects.count(), 1)
+
+        claim()
+        enqueue('tests.record', {'value': 3}, key='same')
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+    def test_success_records_timing(self):
+        enqueue('tests.record', {'value': 'ok'})
+        with self.assertLogs('jobs.worker', 'INFO'):
+            self.assertTrue(run(claim()))
+        job = Job.objects.get()
+        self.assertEqual(calls, ['ok'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.duration)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failure_backs_off_then_fails(self):
+        enqueue('tests.record', {'value': 'fail'})
+        with mock.patch('jobs.worker.random.uniform', return_value=1), self.assertLogs('jobs.worker'):
+            self.assertFalse(run(claim()))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('failed on purpose', job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=9))
+        # Not due yet
+        self.assertIsNone(claim())
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('jobs.worker'):
+            self.assertFalse(run(claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, ['fail', 'fail'])
@@ -0,0 +1,171 @@
+"""
+Running queued jobs (see jobs.queue).
+
+A worker claims the oldest due job with ``SELECT ... FOR UPDATE SKIP
+LOCKED``, so any number of threads and processes share the queue without
+waiting on each other, marks it running and commits before calling the
+handler: a long job holds no lock and no transaction open.
+
+A failed attempt is retried after an exponential backoff with jitter
+(JOBS_RETRY_DELAY seconds, doubling per attempt up to JOBS_RETRY_MAX_DELAY)
+until the handler's max_attempts is reached. A job still running after
+JOBS_LEASE_TIMEOUT seconds is taken to belong to a worker that died and is
+queued again, so the timeout must exceed the longest job. Each attempt
+records how long it waited and ran; finished jobs are kept for
+JOBS_RETENTION_DAYS for ``manage.py job_stats``.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import Job
+from .queue import get_handler
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before retrying a job that failed `attempts` times.
+    """
+    delay = min(settings.JOBS_RETRY_MAX_DELAY, settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+    # Jitter spreads out retries of jobs that failed together
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(names=None):
+    """
+    Mark the oldest due job running and return it, or None when no job is
+    due. With names, only jobs of those names are considered.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = Job.objects.select_for_update(skip_locked=True).filter(status=Job.QUEUED, run_after__lte=now)
+        if names:
+            jobs = jobs.filter(name__in=names)
+        job = jobs.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.started_at = now
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+    return job
+
+
+def _attempt(job):
+    # The attempt's row, unless it was recovered and claimed again meanwhile
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, attempts=job.attempts)
+
+
+def _finish(job, status, duration, error=''):
+    _attempt(job).update(status=status, finished_at=timezone.now(), duration=duration, last_error=error)
+
+
+def _retry(job, duration, error):
+    """
+    Queue the job again after a backoff, or fail it after its last attempt.
+    Returns True if it will be retried.
+    """
+    if job.attempts >= job.max_attempts:
+        _finish(job, Job.FAILED, duration, error)
+        return False
+    run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+    try:
+        with transaction.atomic():
+            _attempt(job).update(status=Job.QUEUED, run_after=run_after, duration=duration, last_error=error)
+    except IntegrityError:
+        # A job with the same key was queued meanwhile and will do the work
+        _finish(job, Job.FAILED, duration, f'{error}\nSuperseded by a queued job with the same key')
+        return False
+    return True
+
+
+def run(job):
+    """
+    Run a claimed job and record the outcome. Returns True on success.
+    """
+    handler = get_handler(job.name)
+    waited = (job.started_at - job.run_after).total_seconds()
+    if handler is None:
+        _finish(job, Job.FAILED, None, f'No handler registered for job {job.name!r}')
+        logger.error('Job %s #%s has no handler', job.name, job.pk)
+        return False
+
+    started = time.perf_counter()
+    try:
+        handler.func(**job.payload)
+    except Exception:
+        duration = time.perf_counter() - started
+        retried = _retry(job, duration, traceback.format_exc())
+        logger.exception(
+            'Job %s #%s failed attempt %d/%d after %.3fs%s',
+            job.name, job.pk, job.attempts, job.max_attempts, duration,
+            ', will retry' if retried else '',
+        )
+        return False
+
+    duration = time.perf_counter() - started
+    _finish(job, Job.DONE, duration)
+    logger.info('Job %s #%s done in %.3fs, waited %.3fs', job.name, job.pk, duration, waited)
+    return True
+
+
+def work(stop, names=None, poll_interval=1.0, burst=False):
+    """
+    Run jobs until the `stop` event is set, polling every poll_interval
+    seconds while the queue is empty. In burst mode, return once no job is
+    due. Returns the number of jobs run.
+    """
+    count = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                job = claim(names)
+                if job is not None:
+                    run(job)
+                    count += 1
+            except DatabaseError:
+                # A job whose outcome could not be saved is recovered after
+                # the lease timeout
+                logger.exception('Job queue unavailable')
+                stop.wait(poll_interval)
+                continue
+            if job is None:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+    return count
+
+
+def recover_stalled():
+    """
+    Retry (or fail) jobs running for longer than JOBS_LEASE_TIMEOUT.
+    Returns their number.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LEASE_TIMEOUT)
+    stalled = list(Job.objects.filter(status=Job.RUNNING, started_at__lt=cutoff))
+    for job in stalled:
+        _retry(job, None, f'Still running after {settings.JOBS_LEASE_TIMEOUT}s; worker presumed lost')
+        logger.warning('Job %s #%s stalled, released', job.name, job.pk)
+    return len(stalled)
+
+
+def prune():
+    """
+    Delete finished jobs older than JOBS_RETENTION_DAYS. Returns their number.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
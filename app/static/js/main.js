@@ -20,15 +20,21 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentMonth = currentDate.getMonth();
     let currentYear = currentDate.getFullYear();
     let daysWithPosts = new Set();
+    // Days with posts per year, as {month: [days]}; one request per year
+    const yearCache = new Map();
 
     async function fetchDaysWithPosts(year, month) {
         try {
-            const response = await fetch(`/api/days-with-posts/?year=${year}&month=${month + 1}`);
-            if (response.ok) {
+            if (!yearCache.has(year)) {
+                const response = await fetch(`/api/days-with-posts/?year=${year}`);
+                if (!response.ok) {
+                    return;
+                }
                 const data = await response.json();
-                daysWithPosts = new Set(data.days);
-                updateCalendar();
+                yearCache.set(year, data.months);
             }
+            daysWithPosts = new Set(yearCache.get(year)[month + 1] || []);
+            updateCalendar();
         } catch (error) {
             console.error('Error fetching days with posts:', error);
         }